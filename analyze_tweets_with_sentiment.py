@@ -1,36 +1,93 @@
-import json
-import re
-from collections import defaultdict
-from textblob import TextBlob
+import argparse
+import os
+import sys
+from collections import Counter, defaultdict
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(PROJECT_DIR, "mapreduce"))
+from geo import GeoKeyer, add_geo_arguments, keyer_from_args
+from keywords import DEFAULT_STOP_WORDS, LANGUAGE_STOP_WORDS, KeywordExtractor, normalize_hashtag
+from metrics import Metrics, add_metrics_arguments, profiled
+from sentiment_scorer import SentimentScorer, add_scorer_arguments, create_scorer
+from time_buckets import TimeBucketer, add_time_arguments
+from topk import top_k
+from tweet_record import RecordReader, iter_records
 
 # Constantes
-STOP_WORDS = {"the", "and", "for", "that", "this", "with", "from", "was", "are", "you", "have", "your"}
+STOP_WORDS = DEFAULT_STOP_WORDS
 DATA_PATH = "data/tweets_with_locations.json"
 SENTIMENT_THRESHOLD = 0.1
+SENTIMENT_BATCH_SIZE = 1000
+KEYWORD_BATCH_SIZE = 1000
+SENTIMENT_CACHE_PATH = os.path.join(PROJECT_DIR, ".cache", "sentiment.sqlite3")
+
+class Aggregator:
+    """
+    Analyse incrémentale : `add` reçoit chaque tweet (TweetRecord) lors de
+    l'unique passe sur les données, `report` affiche le résultat et le renvoie.
+    """
+    title = ""
+
+    @classmethod
+    def from_args(cls, args):
+        """Crée l'analyse à partir des options de la ligne de commande."""
+        return cls()
+
+    def add(self, record):
+        raise NotImplementedError
+
+    def report(self):
+        raise NotImplementedError
+
+# Analyses exécutées par main(), dans l'ordre d'affichage
+AGGREGATORS = []
+
+def register_aggregator(cls):
+    """Enregistre une analyse : elle sera alimentée par la même passe que les autres."""
+    AGGREGATORS.append(cls)
+    return cls
+
+def run_aggregators(tweets, aggregators):
+    """
+    Alimente toutes les analyses en une seule passe sur les tweets (TweetRecord ;
+    les dictionnaires au format d'origine sont convertis au passage).
+    """
+    for record in iter_records(tweets):
+        for aggregator in aggregators:
+            aggregator.add(record)
+    return aggregators
 
-def normalize_hashtag(hashtag):
-    """Normalise un hashtag en le mettant en minuscules et en supprimant le # initial."""
-    hashtag = hashtag.lower().strip()
-    return hashtag[1:] if hashtag.startswith('#') else hashtag
+def count_hashtags(record, counts):
+    """Ajoute les hashtags normalisés d'un tweet au dictionnaire de comptes."""
+    for hashtag in record.hashtags or ():
+        hashtag = normalize_hashtag(hashtag)
+        if hashtag:
+            counts[hashtag] += 1
+
+@register_aggregator
+class HashtagAggregator(Aggregator):
+    """Tendances des hashtags sur l'ensemble des tweets."""
+    title = "ANALYSE DES TENDANCES DE HASHTAGS"
+
+    def __init__(self):
+        self.hashtag_counts = defaultdict(int)
+
+    def add(self, record):
+        count_hashtags(record, self.hashtag_counts)
+
+    def report(self):
+        # Top 10 hashtags
+        top_hashtags = top_k(self.hashtag_counts, 10)
+        
+        print("Top 10 hashtags:")
+        for hashtag, count in top_hashtags:
+            print(f"#{hashtag}: {count}")
+        
+        return top_hashtags
 
 def analyze_hashtags(tweets):
     """Analyse les tendances des hashtags dans les tweets."""
-    hashtag_counts = defaultdict(int)
-    
-    for tweet in tweets:
-        for hashtag in tweet.get("hashtags", []):
-            hashtag = normalize_hashtag(hashtag)
-            if hashtag:
-                hashtag_counts[hashtag] += 1
-    
-    # Top 10 hashtags
-    top_hashtags = sorted(hashtag_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-    
-    print("Top 10 hashtags:")
-    for hashtag, count in top_hashtags:
-        print(f"#{hashtag}: {count}")
-    
-    return top_hashtags
+    return run_aggregators(tweets, [HashtagAggregator()])[0].report()
 
 def get_sentiment_label(score):
     """Détermine le label du sentiment basé sur le score."""
@@ -40,108 +97,192 @@ def get_sentiment_label(score):
         return "négatif"
     return "neutre"
 
-def analyze_sentiment(tweets):
-    """Analyse le sentiment des tweets et calcule le score moyen par jour."""
-    daily_sentiment = defaultdict(list)
-    
-    print("\nAnalyse des sentiments des tweets...")
-    for tweet in tweets:
-        text, timestamp = tweet.get("tweet_text", ""), tweet.get("timestamp", "")
+@register_aggregator
+class SentimentAggregator(Aggregator):
+    """
+    Score de sentiment moyen par jour (ou par heure, semaine, mois selon le
+    découpage de `bucketer`). Les textes sont mis en attente et évalués par
+    lots de SENTIMENT_BATCH_SIZE ; seuls (somme, nombre) sont conservés pour
+    chaque période.
+    """
+    title = "ANALYSE DES SENTIMENTS"
+    PERIOD_NAMES = {"hour": "heure", "day": "jour", "week": "semaine", "month": "mois"}
+
+    def __init__(self, scorer=None, bucketer=None):
+        self.scorer = scorer if scorer is not None else SentimentScorer(cache_path=SENTIMENT_CACHE_PATH)
+        self.bucketer = bucketer if bucketer is not None else TimeBucketer("day")
+        self.daily_sums = {}
+        self.pending_dates, self.pending_texts = [], []
+
+    @classmethod
+    def from_args(cls, args):
+        scorer = create_scorer(args.scorer, cache_path=SENTIMENT_CACHE_PATH, lexicon_path=args.lexicon)
+        return cls(scorer, TimeBucketer(args.granularity, args.timezone))
+
+    def add(self, record):
+        text, timestamp = record.text, record.timestamp
         if not text or not timestamp:
-            continue
-            
-        # Extraction de la date et calcul du sentiment
-        date = timestamp.split()[0]
-        sentiment_score = TextBlob(text).sentiment.polarity
-        daily_sentiment[date].append(sentiment_score)
-    
-    # Calcul et affichage des moyennes
-    daily_averages = {day: sum(scores)/len(scores) for day, scores in daily_sentiment.items()}
-    
-    print("\nScore de sentiment moyen par jour:")
-    for day, score in sorted(daily_averages.items()):
-        print(f"{day}: {score:.4f} ({get_sentiment_label(score)})")
-    
-    return daily_averages
+            return
+        
+        # Extraction de la période ; le sentiment est calculé avec le lot
+        try:
+            self.pending_dates.append(self.bucketer.key(timestamp))
+        except ValueError:
+            return
+        self.pending_texts.append(text)
+        if len(self.pending_texts) >= SENTIMENT_BATCH_SIZE:
+            self.flush()
 
-def extract_keywords(text):
-    """Extrait les mots-clés d'un texte en supprimant les hashtags et liens."""
-    clean_text = re.sub(r'#\w+|http\S+', '', text.lower())
-    return [word for word in re.findall(r'\b[a-z]{3,}\b', clean_text) 
-            if word not in STOP_WORDS]
+    def flush(self):
+        scores = self.scorer.score_batch(self.pending_texts)
+        for date, sentiment_score in zip(self.pending_dates, scores):
+            total = self.daily_sums.setdefault(date, [0.0, 0])
+            total[0] += sentiment_score
+            total[1] += 1
+        self.pending_dates, self.pending_texts = [], []
 
-def analyze_geo_distribution(tweets):
-    """Analyse la distribution géographique des tweets et les thèmes par région."""
-    regions = defaultdict(list)
-    region_hashtags = defaultdict(lambda: defaultdict(int))
-    
-    # Classification par région
-    for tweet in tweets:
-        city = tweet.get("location", {}).get("city", "unknown")
-        if city == "unknown":
-            continue
-            
-        regions[city].append(tweet)
+    def report(self):
+        self.flush()
+        print("\nAnalyse des sentiments des tweets...")
         
-        # Comptage des hashtags par région
-        for hashtag in tweet.get("hashtags", []):
-            hashtag = normalize_hashtag(hashtag)
-            if hashtag:
-                region_hashtags[city][hashtag] += 1
-    
-    # Analyse des régions
-    print("\nDistribution géographique des tweets:")
-    for city, city_tweets in regions.items():
-        print(f"\nRégion: {city}")
-        print(f"Nombre de tweets: {len(city_tweets)}")
+        # Calcul et affichage des moyennes
+        daily_averages = {day: total / count for day, (total, count) in self.daily_sums.items()}
         
-        # Top hashtags
-        top_hashtags = sorted(region_hashtags[city].items(), 
-                            key=lambda x: x[1], reverse=True)[:5]
-        print("Top hashtags:")
-        for hashtag, count in top_hashtags:
-            print(f"  #{hashtag}: {count}")
+        print(f"\nScore de sentiment moyen par {self.PERIOD_NAMES[self.bucketer.granularity]}:")
+        for day, score in sorted(daily_averages.items()):
+            print(f"{day}: {score:.4f} ({get_sentiment_label(score)})")
+        print(f"Cache de sentiment : {self.scorer.describe()}")
         
-        # Extraction des mots-clés fréquents
-        all_keywords = []
-        for tweet in city_tweets:
-            all_keywords.extend(extract_keywords(tweet.get("tweet_text", "")))
+        return daily_averages
+
+def analyze_sentiment(tweets, scorer=None):
+    """Analyse le sentiment des tweets et calcule le score moyen par jour."""
+    return run_aggregators(tweets, [SentimentAggregator(scorer)])[0].report()
+
+KEYWORD_EXTRACTOR = KeywordExtractor()
+
+def extract_keywords(text):
+    """Extrait les mots-clés d'un texte en supprimant les hashtags et liens."""
+    return list(KEYWORD_EXTRACTOR.tokens(text))
+
+class RegionStats:
+    """Compteurs d'une région : tweets, hashtags et mots-clés (sans garder les tweets)."""
+    __slots__ = ("tweet_count", "hashtag_counts", "word_counts")
+
+    def __init__(self):
+        self.tweet_count = 0
+        self.hashtag_counts = defaultdict(int)
+        self.word_counts = Counter()
+
+@register_aggregator
+class GeoAggregator(Aggregator):
+    """Distribution géographique des tweets et thèmes par région."""
+    title = "ANALYSE DE LA DISTRIBUTION GÉOGRAPHIQUE"
+
+    def __init__(self, extractor=None, keyer=None):
+        self.regions = {}
+        # Tweets en attente, toutes régions confondues : au plus KEYWORD_BATCH_SIZE
+        # en mémoire, quel que soit le nombre de régions. Leurs clés sont
+        # calculées en masse (GeoKeyer.record_keys) et leurs mots-clés comptés par lots
+        self.pending = []
+        self.extractor = extractor if extractor is not None else KEYWORD_EXTRACTOR
+        # Région : ville déclarée par défaut, ou geohash, cellule, ville la plus proche...
+        self.keyer = keyer if keyer is not None else GeoKeyer("city")
+
+    @classmethod
+    def from_args(cls, args):
+        languages = args.stop_words.split(",") if args.stop_words else None
+        return cls(KeywordExtractor(languages=languages, max_ngram=args.ngrams),
+                   keyer_from_args(args))
+
+    def add(self, record):
+        self.pending.append(record)
+        if len(self.pending) >= KEYWORD_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Traite les tweets en attente : clés du lot, comptes, puis un appel à count_batch par région."""
+        records, self.pending = self.pending, []
+        cities = self.keyer.record_keys(records)
+        batches = {}
+        for city, record in zip(cities, records):
+            if city is None:
+                continue
+            stats = self.regions.get(city)
+            if stats is None:
+                stats = self.regions[city] = RegionStats()
+            stats.tweet_count += 1
+            count_hashtags(record, stats.hashtag_counts)
+            batches.setdefault(city, (stats, []))[1].append(record.text or "")
+        for stats, texts in batches.values():
+            self.extractor.count_batch(texts, stats.word_counts)
+
+    def report(self):
+        self.flush()
+        print("\nDistribution géographique des tweets:")
+        for city, stats in self.regions.items():
+            print(f"\nRégion: {city}")
+            print(f"Nombre de tweets: {stats.tweet_count}")
             
-        # Comptage et affichage des top mots-clés
-        word_counts = defaultdict(int)
-        for word in all_keywords:
-            word_counts[word] += 1
+            # Top hashtags
+            top_hashtags = top_k(stats.hashtag_counts, 5)
+            print("Top hashtags:")
+            for hashtag, count in top_hashtags:
+                print(f"  #{hashtag}: {count}")
             
-        top_words = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-        print("Top mots-clés:")
-        for word, count in top_words:
-            print(f"  {word}: {count}")
-    
-    return regions
-
-def load_tweets(file_path):
-    """Charge les tweets depuis un fichier JSON."""
-    print(f"Lecture des tweets depuis {file_path}...")
-    with open(file_path, 'r', encoding='utf-8') as file:
-        tweets = json.load(file)
-    print(f"Nombre de tweets: {len(tweets)}")
-    return tweets
-
-def main():
-    # Chargement des données
-    tweets = load_tweets(DATA_PATH)
-    
-    # Analyses
-    print("\n=== ANALYSE DES TENDANCES DE HASHTAGS ===")
-    analyze_hashtags(tweets)
+            # Top mots-clés
+            top_words = top_k(stats.word_counts, 5)
+            print("Top mots-clés:")
+            for word, count in top_words:
+                print(f"  {word}: {count}")
+        
+        return self.regions
+
+def analyze_geo_distribution(tweets, keyer=None):
+    """Analyse la distribution géographique des tweets et les thèmes par région."""
+    return run_aggregators(tweets, [GeoAggregator(keyer=keyer)])[0].report()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse des tweets (hashtags, sentiments, régions)")
+    parser.add_argument("--input", default=DATA_PATH,
+                        help="fichier JSON/JSONL/gzip ou dossier Parquet produit par prepare_tweets.py")
+    add_time_arguments(parser, granularity="day")
+    parser.add_argument("--stop-words", default=None,
+                        help="langues des mots vides, ex. en,fr "
+                             f"(choix : {', '.join(sorted(LANGUAGE_STOP_WORDS))} ; liste historique par défaut)")
+    parser.add_argument("--ngrams", type=int, default=1,
+                        help="taille maximale des n-grammes de mots-clés (1 = mots seuls)")
+    add_geo_arguments(parser, option="--geo-key")
+    add_scorer_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    metrics = Metrics("analyzer")
     
-    print("\n=== ANALYSE DES SENTIMENTS ===")
-    analyze_sentiment(tweets)
+    # Lecture en flux de TweetRecord : les tweets ne sont pas conservés en mémoire
+    print(f"Lecture des tweets depuis {args.input}...")
+    tweets = RecordReader(args.input)
     
-    print("\n=== ANALYSE DE LA DISTRIBUTION GÉOGRAPHIQUE ===")
-    analyze_geo_distribution(tweets)
+    with profiled(args.profile):
+        # Une seule passe alimente toutes les analyses enregistrées
+        with metrics.phase("read+aggregate"):
+            aggregators = run_aggregators(tweets, [cls.from_args(args) for cls in AGGREGATORS])
+        print(f"Nombre de tweets: {tweets.count}")
+        metrics.set("tweets_in", tweets.count)
+        metrics.set("malformed", tweets.errors)
+        
+        for aggregator in aggregators:
+            print(f"\n=== {aggregator.title} ===")
+            with metrics.phase(f"report_{type(aggregator).__name__}"):
+                aggregator.report()
+            scorer = getattr(aggregator, "scorer", None)
+            if scorer is not None:
+                metrics.set("cache_hits", scorer.hits)
+                metrics.set("cache_disk_hits", scorer.disk_hits)
+                metrics.set("cache_misses", scorer.misses)
     
     print("\nAnalyses terminées !")
+    if args.metrics:
+        metrics.write(args.metrics, args.metrics_format)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Compare les formats des fichiers de tweets sur des données synthétiques
+(200 k tweets par défaut) :
+- json : tableau indenté actuel (tweets_by_month/AAAA/MM/tweets.json) ;
+- json.gz (flux) : le même compressé d'un seul tenant (non découpable) ;
+- json.gz / json.bz2 (blocs) : sortie de prepare_tweets.py --compress,
+  compressée par blocs indépendants avec index ;
+- jsonl, jsonl.gz (blocs) : un tweet par ligne, sans indentation.
+
+Pour chaque format : taille sur disque, durée d'écriture, débit de décodage
+complet par TweetReader (tweets/s et Mo/s de texte JSON), et pour les
+formats par blocs, durée du décodage des splits en parallèle.
+
+    python benchmarks/bench_compression.py --count 200000 --workers 4
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_DIR, "mapreduce"))
+sys.path.insert(0, os.path.join(PROJECT_DIR, "scripts"))
+from block_compression import DEFAULT_BLOCK_SIZE, BlockWriter, block_splits, split_reader
+from generate_tweets import generate_tweets
+from local_executor import parallel_map
+from prepare_tweets import MonthWriter
+from tweet_reader import TweetReader
+
+WRITE_CHUNK = 1000
+
+def write_month(tweets, path, codec=None, block_size=DEFAULT_BLOCK_SIZE):
+    """Écrit le fichier comme prepare_tweets.py (tableau JSON indenté)."""
+    writer = MonthWriter(path, codec, block_size)
+    for start in range(0, len(tweets), WRITE_CHUNK):
+        writer.add(tweets[start:start + WRITE_CHUNK])
+    writer.seal()
+    writer.publish()
+
+def write_stream_gzip(tweets, path):
+    with gzip.open(path, "wb", compresslevel=6) as file:
+        file.write(json.dumps(tweets, ensure_ascii=False, indent=2).encode("utf-8"))
+
+def write_jsonl(tweets, path, codec=None, block_size=DEFAULT_BLOCK_SIZE):
+    lines = [json.dumps(tweet, ensure_ascii=False) + "\n" for tweet in tweets]
+    if codec is None:
+        with open(path, "w", encoding="utf-8") as file:
+            file.writelines(lines)
+        return
+    writer = BlockWriter(path, codec, block_size)
+    for start in range(0, len(lines), 100):
+        writer.write("".join(lines[start:start + 100]).encode("utf-8"))
+    writer.close()
+
+def count_split(split):
+    return sum(1 for _ in split_reader(split))
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def benchmark(tweets, directory, workers, block_size):
+    formats = [
+        ("json", "tweets.json", write_month, ()),
+        ("json.gz (flux)", "stream.json.gz", write_stream_gzip, ()),
+        ("json.gz (blocs)", "tweets.json.gz", write_month, ("gzip", block_size)),
+        ("json.bz2 (blocs)", "tweets.json.bz2", write_month, ("bz2", block_size)),
+        ("jsonl", "tweets.jsonl", write_jsonl, ()),
+        ("jsonl.gz (blocs)", "tweets.jsonl.gz", write_jsonl, ("gzip", block_size)),
+    ]
+    text_size = None
+    results = {}
+    for name, file_name, writer, options in formats:
+        path = os.path.join(directory, file_name)
+        _, write_seconds = measure(writer, tweets, path, *options)
+        reader = TweetReader(path)
+        count, decode_seconds = measure(lambda: sum(1 for _ in reader))
+        assert count == len(tweets), (name, count)
+        if name == "json":
+            text_size = os.path.getsize(path)
+        result = {
+            "bytes": os.path.getsize(path),
+            "write_seconds": round(write_seconds, 3),
+            "decode_seconds": round(decode_seconds, 3),
+            "tweets_per_second": round(count / decode_seconds),
+        }
+        if options:
+            splits = block_splits(path)
+            counts, split_seconds = measure(parallel_map, count_split, splits, workers)
+            assert sum(counts) == len(tweets), name
+            result.update(splits=len(splits), parallel_decode_seconds=round(split_seconds, 3))
+        results[name] = result
+    for result in results.values():
+        result["ratio"] = round(result["bytes"] / text_size, 3)
+        result["json_mb_per_second"] = round(text_size / 1e6 / result["decode_seconds"], 1)
+    return results
+
+def print_results(results, workers):
+    print("  {0:<18} {1:>12} {2:>7} {3:>10} {4:>10} {5:>11} {6:>10} {7:>7} {8:>12}".format(
+        "format", "octets", "ratio", "écriture", "décodage", "tweets/s", "Mo JSON/s",
+        "splits", "{0} processus".format(workers)))
+    for name, result in results.items():
+        print("  {0:<18} {1:>12} {2:>7.3f} {3:>9.2f}s {4:>9.2f}s {5:>11} {6:>10} {7:>7} {8:>12}".format(
+            name, result["bytes"], result["ratio"], result["write_seconds"], result["decode_seconds"],
+            result["tweets_per_second"], result["json_mb_per_second"], result.get("splits", "-"),
+            "{0:.2f}s".format(result["parallel_decode_seconds"]) if "splits" in result else "-"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Taille et débit de décodage des formats de fichiers de tweets")
+    parser.add_argument("--count", type=int, default=200000, help="nombre de tweets synthétiques")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processus du décodage parallèle des splits")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE,
+                        help="taille des blocs avant compression, en octets")
+    parser.add_argument("--output", help="fichier JSON des résultats")
+    args = parser.parse_args(argv)
+
+    print("Génération de {0} tweets...".format(args.count))
+    tweets = list(generate_tweets(args.count, seed=args.seed))
+    directory = tempfile.mkdtemp(prefix="bench-compression-")
+    try:
+        results = benchmark(tweets, directory, args.workers, args.block_size)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    print("\n{0} tweets, blocs de {1} octets".format(args.count, args.block_size))
+    print_results(results, args.workers)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"count": args.count, "block_size": args.block_size, "workers": args.workers,
+                       "results": results}, file, indent=2)
+        print("\nRésultats enregistrés dans {0}".format(args.output))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Banc d'essai de bout en bout sur des tweets synthétiques reproductibles
+(scripts/generate_tweets.py), pour 10 k, 1 M et 10 M tweets par défaut.
+
+Étapes chronométrées :
+- load : décodage en flux du fichier (TweetReader) ;
+- map, shuffle, reduce : simulation MapReduce des hashtags ;
+- sentiment, sentiment_lexicon : calcul du sentiment de tous les textes
+  (SentimentScorer sans cache disque, avec TextBlob puis le lexique binaire) ;
+- analyzer_hashtags, analyzer_sentiment, analyzer_geo : agrégateurs de
+  analyze_tweets_with_sentiment.py.
+
+Les étapes lisent le fichier en flux : sauf load, leur durée inclut la
+lecture (colonne "hors lecture" = durée - load). Chaque groupe d'étapes
+s'exécute dans un processus neuf, dont le pic de mémoire résidente est
+relevé (module resource, indisponible sous Windows).
+
+Les résultats sont enregistrés en JSON (commit, paramètres, durées, débits,
+mémoire) ; --compare affiche le rapport avec un résultat précédent.
+
+    python benchmarks/bench_pipeline.py --sizes 10000,1000000
+    python benchmarks/bench_pipeline.py --sizes 10000 --compare benchmarks/results/ancien.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_DIR, "mapreduce"))
+sys.path.insert(0, os.path.join(PROJECT_DIR, "scripts"))
+sys.path.insert(0, PROJECT_DIR)
+import analyze_tweets_with_sentiment as analyzer
+import mapreduce_hashtag_simulation as hashtag_simulation
+from generate_tweets import generate_tweets, write_tweets
+from metrics import peak_rss_mb
+from sentiment_scorer import SentimentScorer, create_scorer
+from tweet_reader import TweetReader
+
+DATA_DIR = os.path.join(PROJECT_DIR, ".cache", "bench")
+RESULTS_DIR = os.path.join(PROJECT_DIR, "benchmarks", "results")
+DEFAULT_SIZES = "10000,1000000,10000000"
+SENTIMENT_BATCH_SIZE = 1000
+
+def stage_load(path, timings):
+    start = time.perf_counter()
+    for _ in TweetReader(path):
+        pass
+    timings["load"] = time.perf_counter() - start
+
+def stage_mapreduce(path, timings):
+    start = time.perf_counter()
+    mapped_data = hashtag_simulation.map_phase(TweetReader(path))
+    timings["map"] = time.perf_counter() - start
+    start = time.perf_counter()
+    shuffled_data = hashtag_simulation.shuffle_sort_phase(mapped_data)
+    timings["shuffle"] = time.perf_counter() - start
+    start = time.perf_counter()
+    hashtag_simulation.reduce_phase(shuffled_data)
+    timings["reduce"] = time.perf_counter() - start
+
+def stage_sentiment(path, timings, name="sentiment", scorer_name="textblob"):
+    scorer = create_scorer(scorer_name)
+    start = time.perf_counter()
+    batch = []
+    for tweet in TweetReader(path):
+        batch.append(tweet.get("tweet_text", ""))
+        if len(batch) >= SENTIMENT_BATCH_SIZE:
+            scorer.score_batch(batch)
+            batch = []
+    scorer.score_batch(batch)
+    timings[name] = time.perf_counter() - start
+
+def stage_analyzer(name, aggregator, path, timings):
+    start = time.perf_counter()
+    analyzer.run_aggregators(TweetReader(path), [aggregator])
+    # Les rapports sont calculés mais pas affichés
+    with contextlib.redirect_stdout(io.StringIO()):
+        aggregator.report()
+    timings[name] = time.perf_counter() - start
+
+def run_group(group, path):
+    """Exécute un groupe d'étapes (dans un processus dédié) : (durées, pic de mémoire)."""
+    timings = {}
+    if group == "load":
+        stage_load(path, timings)
+    elif group == "mapreduce":
+        stage_mapreduce(path, timings)
+    elif group == "sentiment":
+        stage_sentiment(path, timings)
+    elif group == "sentiment_lexicon":
+        stage_sentiment(path, timings, group, "lexicon")
+    elif group == "analyzer_hashtags":
+        stage_analyzer(group, analyzer.HashtagAggregator(), path, timings)
+    elif group == "analyzer_sentiment":
+        stage_analyzer(group, analyzer.SentimentAggregator(SentimentScorer()), path, timings)
+    elif group == "analyzer_geo":
+        stage_analyzer(group, analyzer.GeoAggregator(), path, timings)
+    return timings, peak_rss_mb()
+
+GROUPS = ["load", "mapreduce", "sentiment", "sentiment_lexicon", "analyzer_hashtags", "analyzer_sentiment", "analyzer_geo"]
+
+def dataset_path(size, args):
+    """Fichier de tweets synthétiques, généré une seule fois par jeu de paramètres."""
+    name = "tweets-{0}-s{1}-v{2}-k{3}.jsonl".format(size, args.seed, args.vocabulary, args.skew)
+    path = os.path.join(DATA_DIR, name)
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print("Génération de {0} tweets dans {1}...".format(size, path))
+        temporary = path + ".tmp"
+        write_tweets(generate_tweets(size, seed=args.seed, vocabulary=args.vocabulary,
+                                     skew=args.skew), temporary)
+        os.replace(temporary, path)
+    return path
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark_size(size, args):
+    path = dataset_path(size, args)
+    stages, peaks = {}, {}
+    for group in GROUPS:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            timings, peak = pool.submit(run_group, group, path).result()
+        stages.update(timings)
+        peaks[group] = peak
+        for stage in timings:
+            peaks[stage] = peak
+
+    load = stages["load"]
+    results = {}
+    for stage, seconds in stages.items():
+        net = seconds if stage == "load" or stage in ("shuffle", "reduce") else max(0.0, seconds - load)
+        results[stage] = {
+            "seconds": round(seconds, 4),
+            "seconds_without_load": round(net, 4),
+            "tweets_per_second": round(size / seconds) if seconds else None,
+            "peak_rss_mb": round(peaks[stage], 1) if peaks[stage] is not None else None,
+        }
+    return results
+
+def print_results(size, results, previous=None):
+    print("\n{0} tweets".format(size))
+    header = "  {0:<20} {1:>10} {2:>14} {3:>14} {4:>12}".format(
+        "étape", "durée (s)", "hors lecture", "tweets/s", "pic RSS (Mo)")
+    if previous:
+        header += " {0:>10}".format("vs préc.")
+    print(header)
+    for stage, result in results.items():
+        line = "  {0:<20} {1:>10.3f} {2:>14.3f} {3:>14} {4:>12}".format(
+            stage, result["seconds"], result["seconds_without_load"],
+            result["tweets_per_second"] or "-",
+            "-" if result["peak_rss_mb"] is None else "{0:.1f}".format(result["peak_rss_mb"]))
+        old = (previous or {}).get(stage)
+        if old and old["seconds"]:
+            line += " {0:>9.2f}x".format(result["seconds"] / old["seconds"])
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai des étapes du pipeline de tweets")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="nombres de tweets, séparés par des virgules")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--vocabulary", type=int, default=1000, help="nombre de hashtags distincts")
+    parser.add_argument("--skew", type=float, default=1.0, help="exposant de Zipf des hashtags et des villes")
+    parser.add_argument("--output", help="fichier JSON des résultats (défaut : benchmarks/results/<date>-<commit>.json)")
+    parser.add_argument("--compare", help="résultats JSON précédents à comparer")
+    args = parser.parse_args(argv)
+
+    previous = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            previous = json.load(file)["results"]
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"seed": args.seed, "vocabulary": args.vocabulary, "skew": args.skew},
+        "results": {},
+    }
+    for size in [int(size) for size in args.sizes.split(",")]:
+        results = benchmark_size(size, args)
+        report["results"][str(size)] = results
+        print_results(size, results, previous.get(str(size)))
+
+    output = args.output or os.path.join(RESULTS_DIR, "{0}-{1}.json".format(
+        datetime.datetime.now().strftime("%Y%m%d-%H%M%S"), commit or "sans-commit"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print("\nRésultats enregistrés dans {0}".format(output))
+
+if __name__ == "__main__":
+    main()
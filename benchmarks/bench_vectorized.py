@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compare les phases Shuffle & Reduce Python et NumPy des simulations sur des
+données synthétiques (1 M et 10 M tweets par défaut) :
+- python : dictionnaires et listes, à partir des paires émises par la phase Map ;
+- numpy : entrée déjà en colonnes (comme la phase Map en colonnes ou une
+  lecture Parquet), regroupement par np.bincount ; la conversion des paires
+  en colonnes n'est pas chronométrée.
+
+    python benchmarks/bench_vectorized.py --sizes 1000000,10000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mapreduce"))
+import mapreduce_hashtag_simulation as hashtag_simulation
+import mapreduce_sentiment_simulation as sentiment_simulation
+import numpy as np
+
+CITIES = ["Berlin", "Dubai", "London", "Mumbai", "New York", "Paris",
+          "San Francisco", "Sydney", "São Paulo", "Tokyo"]
+MONTHS = ["2024-{0:02d}".format(month) for month in range(1, 13)]
+
+def synthetic_hashtag_pairs(size, vocabulary, rng):
+    """Paires ((mois, hashtag), 1), hashtags tirés selon une loi de Zipf."""
+    hashtags = ["tag{0}".format(i) for i in range(vocabulary)]
+    weights = [1.0 / (rank + 1) for rank in range(vocabulary)]
+    months = rng.choices(MONTHS, k=size)
+    tags = rng.choices(hashtags, weights=weights, k=size)
+    return [((month, tag), 1) for month, tag in zip(months, tags)]
+
+def synthetic_sentiment_pairs(size, rng):
+    """Paires (ville, sentiment) avec un sentiment uniforme dans [-1, 1]."""
+    cities = rng.choices(CITIES, k=size)
+    return [(city, rng.uniform(-1.0, 1.0)) for city in cities]
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def to_columns(pairs, key_columns):
+    """Convertit les paires en colonnes NumPy (hors chronométrage)."""
+    if key_columns == 2:
+        keys = [key for key, _ in pairs]
+        return (np.array([month for month, _ in keys], dtype=object),
+                np.array([hashtag for _, hashtag in keys], dtype=object))
+    return (np.array([key for key, _ in pairs], dtype=object),
+            np.array([value for _, value in pairs], dtype=np.float64))
+
+def report(name, mode, seconds, reference, same):
+    status = "identique" if same else "DIFFÉRENT"
+    print(f"  {name:<10} {mode:<7} {seconds:7.3f} s | accélération x{reference / seconds:5.1f} | résultat {status}")
+
+def run(size, vocabulary, seed):
+    rng = random.Random(seed)
+    print(f"\n{size} tweets")
+    
+    jobs = [
+        ("hashtags", hashtag_simulation, 2, synthetic_hashtag_pairs(size, vocabulary, rng)),
+        ("sentiment", sentiment_simulation, 1, synthetic_sentiment_pairs(size, rng)),
+    ]
+    for name, simulation, key_columns, pairs in jobs:
+        expected, python_time = measure(simulation.shuffle_reduce, pairs)
+        report(name, "python", python_time, python_time, True)
+        columns = to_columns(pairs, key_columns)
+        result, numpy_time = measure(simulation.shuffle_reduce_columns, columns)
+        report(name, "numpy", numpy_time, python_time, result == expected)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du backend vectorisé")
+    parser.add_argument("--sizes", default="1000000,10000000",
+                        help="tailles à mesurer, séparées par des virgules")
+    parser.add_argument("--vocabulary", type=int, default=10000,
+                        help="nombre de hashtags distincts")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    
+    for size in (int(value) for value in args.sizes.split(",")):
+        run(size, args.vocabulary, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Fichiers compressés par blocs, découpables en splits.
+
+Un fichier gzip classique ne se lit qu'à partir du début : une seule tâche
+Map peut le traiter. Ici le texte est coupé en blocs d'environ `block_size`
+octets, toujours entre deux enregistrements, et chaque bloc est compressé
+indépendamment (un membre gzip ou un flux bzip2), les blocs étant mis bout
+à bout :
+- le fichier reste un .gz / .bz2 valide : zcat, TweetReader ou Hadoop lisent
+  les blocs à la suite et retrouvent le texte d'origine ;
+- un index (`<fichier>.idx`, JSON) donne la position de chaque bloc : un
+  split (plage de blocs consécutifs) se décompresse sans lire le reste du
+  fichier, et commence sur un enregistrement complet.
+
+Sur le cluster, Hadoop découpe lui-même les fichiers bzip2 (BZip2Codec) ;
+gzip n'y est pas découpable (un fichier = un mappeur), l'index sert alors au
+lanceur local : local_runner.py fait lire à chaque tâche Map son propre split
+(--split-size).
+
+    writer = BlockWriter("tweets.json.gz", "gzip")
+    writer.write(b"..."); writer.close()
+    for split in block_splits("tweets.json.gz"):
+        tweets = split_reader(split)
+
+Conversion d'un fichier existant :
+
+    python mapreduce/block_compression.py data/tweets_with_locations.json tweets.jsonl.gz
+"""
+
+import argparse
+import bz2
+import gzip
+import io
+import json
+import os
+import zlib
+from collections import namedtuple
+
+from tweet_reader import TweetReader
+
+CODECS = ("gzip", "bz2")
+EXTENSIONS = {"gzip": ".gz", "bz2": ".bz2"}
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+DEFAULT_BLOCK_SIZE = 1 << 20
+DEFAULT_LEVELS = {"gzip": 6, "bz2": 9}
+
+# Plage de blocs d'un fichier : octets [start, start + length[ du fichier compressé
+InputSplit = namedtuple("InputSplit", ["path", "codec", "start", "length"])
+
+
+def compress_block(data, codec, level=None):
+    """Un bloc compressé indépendamment (membre gzip sans date : sortie reproductible)."""
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    if codec == "gzip":
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    if codec == "bz2":
+        return bz2.compress(data, level)
+    raise ValueError("Compression inconnue : {0} (choix : {1})".format(codec, ", ".join(CODECS)))
+
+
+def copy_head(path, target, size, chunk_size=1 << 20):
+    """Copie les `size` premiers octets du fichier `path` dans le fichier ouvert `target` ; renvoie le nombre copié."""
+    copied = 0
+    with open(path, "rb") as source:
+        while copied < size:
+            data = source.read(min(chunk_size, size - copied))
+            if not data:
+                break
+            target.write(data)
+            copied += len(data)
+    return copied
+
+
+def codec_for_path(path):
+    """Compression d'après l'extension (None si le fichier n'est pas compressé)."""
+    for codec, extension in EXTENSIONS.items():
+        if path.endswith(extension):
+            return codec
+    return None
+
+
+class BlockWriter:
+    """
+    Écrit un fichier compressé par blocs et son index. Chaque appel à `write`
+    doit se terminer sur une frontière d'enregistrement : un bloc n'est
+    fermé qu'entre deux appels, une fois `block_size` octets atteints.
+    """
+
+    def __init__(self, path, codec="gzip", block_size=DEFAULT_BLOCK_SIZE, level=None):
+        if codec not in CODECS:
+            raise ValueError("Compression inconnue : {0} (choix : {1})".format(codec, ", ".join(CODECS)))
+        self.path = path
+        self.codec = codec
+        self.block_size = block_size
+        self.level = level
+        self.blocks = []
+        self.pending = bytearray()
+        self.position = 0
+        self.uncompressed = 0
+        # Octets écrits sur le disque, réécritures comprises
+        self.written = 0
+        self.last_block_open = False
+        self.file = open(path, "wb")
+
+    def write(self, data):
+        self.pending += data
+        if len(self.pending) >= self.block_size:
+            self._write_block(bytes(self.pending))
+            self.pending = bytearray()
+
+    def _write_block(self, data):
+        compressed = compress_block(data, self.codec, self.level)
+        self.file.write(compressed)
+        self.blocks.append([self.position, len(compressed), self.uncompressed, len(data)])
+        self.position += len(compressed)
+        self.uncompressed += len(data)
+        self.written += len(compressed)
+
+    def close(self, tail=b""):
+        """
+        Écrit le dernier bloc (données en attente suivies de `tail`), puis
+        l'index. Le fichier peut être rouvert par `reopen`.
+        """
+        self.last_block_open = bool(self.pending or tail)
+        if self.last_block_open:
+            self._write_block(bytes(self.pending) + tail)
+        self.file.close()
+        self.file = None
+        write_index(self.path, self.codec, self.block_size, self.blocks)
+
+    def reopen(self, path=None):
+        """
+        Annule `close` : le dernier bloc est retiré et ses données redeviennent
+        en attente. Avec un autre `path`, le fichier fermé n'est pas modifié :
+        les blocs conservés sont recopiés dans `path`, où l'écriture reprend.
+        """
+        if self.last_block_open:
+            offset, _, uncompressed_offset, _ = self.blocks.pop()
+            self.position, self.uncompressed = offset, uncompressed_offset
+        if path is None or path == self.path:
+            self.file = open(self.path, "r+b")
+            self.file.seek(self.position)
+            self.file.truncate()
+            return
+        self.file = open(path, "wb")
+        self.written += copy_head(self.path, self.file, self.position)
+        self.path = path
+
+    def rename(self, path):
+        """Déplace le fichier fermé et son index."""
+        os.replace(self.path, path)
+        os.replace(self.path + INDEX_SUFFIX, path + INDEX_SUFFIX)
+        self.path = path
+
+    def remove(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        for path in (self.path, self.path + INDEX_SUFFIX):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def write_index(path, codec, block_size, blocks):
+    index = {"version": INDEX_VERSION, "codec": codec, "block_size": block_size,
+             # [position, taille compressée, position décompressée, taille décompressée]
+             "blocks": blocks}
+    temporary = path + INDEX_SUFFIX + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(index, file)
+    os.replace(temporary, path + INDEX_SUFFIX)
+
+
+def read_index(path):
+    """Index d'un fichier compressé par blocs, ou None s'il n'en a pas."""
+    try:
+        with open(path + INDEX_SUFFIX, "r", encoding="utf-8") as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != INDEX_VERSION or index.get("codec") not in CODECS:
+        return None
+    return index
+
+
+def has_index(path):
+    return isinstance(path, str) and os.path.isfile(path) and read_index(path) is not None
+
+
+def block_splits(path, split_size=None):
+    """
+    Splits d'un fichier indexé : blocs consécutifs regroupés jusqu'à
+    `split_size` octets décompressés (un bloc par split par défaut).
+    """
+    index = read_index(path)
+    if index is None:
+        raise ValueError("{0} n'a pas d'index de blocs ({1})".format(path, path + INDEX_SUFFIX))
+    splits = []
+    start = length = size = 0
+    for offset, compressed, _, uncompressed in index["blocks"]:
+        if length and (split_size is None or size + uncompressed > split_size):
+            splits.append(InputSplit(path, index["codec"], start, length))
+            length = size = 0
+        if not length:
+            start = offset
+        length += compressed
+        size += uncompressed
+    if length:
+        splits.append(InputSplit(path, index["codec"], start, length))
+    return splits
+
+
+def open_split(split):
+    """Flux binaire du texte décompressé d'un split."""
+    with open(split.path, "rb") as file:
+        file.seek(split.start)
+        raw = io.BytesIO(file.read(split.length))
+    if split.codec == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    return bz2.BZ2File(raw, mode="rb")
+
+
+def split_reader(split):
+    """TweetReader sur les tweets d'un split."""
+    return TweetReader(open_split(split))
+
+
+def compress_file(source, target, codec="gzip", block_size=DEFAULT_BLOCK_SIZE, level=None):
+    """
+    Recompresse un fichier de tweets (JSON indenté, JSONL, gzip...) par blocs,
+    au format JSONL. Renvoie le nombre de tweets.
+    """
+    writer = BlockWriter(target, codec, block_size, level)
+    reader = TweetReader(source)
+    lines = []
+    for tweet in reader:
+        lines.append(json.dumps(tweet, ensure_ascii=False) + "\n")
+        if len(lines) >= 100:
+            writer.write("".join(lines).encode("utf-8"))
+            lines = []
+    writer.write("".join(lines).encode("utf-8"))
+    writer.close()
+    return reader.count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompresse un fichier de tweets par blocs (JSONL)")
+    parser.add_argument("source", help="fichier JSON, JSONL ou gzip")
+    parser.add_argument("target", help="fichier compressé (.gz ou .bz2), index écrit à côté")
+    parser.add_argument("--codec", choices=CODECS, default=None,
+                        help="compression (défaut : d'après l'extension, sinon gzip)")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE,
+                        help="taille d'un bloc avant compression, en octets")
+    args = parser.parse_args(argv)
+    codec = args.codec or codec_for_path(args.target) or "gzip"
+    count = compress_file(args.source, args.target, codec, args.block_size)
+    index = read_index(args.target)
+    print("{0} tweets, {1} blocs, {2} octets (index : {3})".format(
+        count, len(index["blocks"]), os.path.getsize(args.target), args.target + INDEX_SUFFIX))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+Clés géographiques des tweets : ville déclarée, ville normalisée, ville connue
+la plus proche des coordonnées, cellule de grille ou geohash.
+
+Le champ `location.city` est du texte libre : il contredit parfois les
+coordonnées (Paris en [2.2048, 5.2708]) ou arrive abîmé par un mauvais
+encodage ("S??o Paulo", "SÃ£o Paulo"). Ce module propose :
+- normalize_city : répare et ramène un nom de ville à celui du gazetteer ;
+- CityIndex : ville du gazetteer la plus proche d'un point (arbre k-d sur
+  les coordonnées projetées sur la sphère unité) ;
+- geohash_encode / grid_cell : découpage des coordonnées en cellules ;
+- GeoKeyer : calcul de la clé choisie pour un tweet, mémoïsé par point.
+
+Les fonctions *_many traitent des colonnes entières avec NumPy (optionnel) :
+plusieurs millions de points par seconde. GeoKeyer.keys s'en sert pour les
+lots de tweets du mappeur et de l'analyse géographique (repli sur le calcul
+point par point si NumPy est absent). scipy, s'il est installé, fournit
+l'arbre k-d des recherches en masse (scipy.spatial.cKDTree). Tous deux ne
+sont importés qu'au premier lot de coordonnées : le mappeur n'en paie pas
+le coût au démarrage, ni avec les clés de ville.
+
+Les coordonnées sont au format [latitude, longitude].
+"""
+
+import csv
+import math
+import re
+import unicodedata
+
+# Importés à la demande par _require_numpy
+np = None
+cKDTree = None
+
+EARTH_RADIUS_KM = 6371.0
+GEO_KEYS = ("city", "city_normalized", "nearest_city", "grid", "geohash")
+# Variables d'environnement des mappeurs (passées par -cmdenv avec Hadoop Streaming)
+GEO_KEY_ENV_VAR = "TWEETS_GEO_KEY"
+GAZETTEER_ENV_VAR = "TWEETS_GAZETTEER"
+# Au-delà de cette distance, un point n'est rattaché à aucune ville
+MAX_DISTANCE_KM = 100.0
+DEFAULT_GEOHASH_PRECISION = 5
+DEFAULT_CELL_SIZE = 1.0
+MAX_CACHE_SIZE = 100000
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Gazetteer local : (nom, latitude, longitude)
+GAZETTEER = [
+    ("Paris", 48.8566, 2.3522),
+    ("London", 51.5074, -0.1278),
+    ("Berlin", 52.5200, 13.4050),
+    ("Madrid", 40.4168, -3.7038),
+    ("Rome", 41.9028, 12.4964),
+    ("Amsterdam", 52.3676, 4.9041),
+    ("Brussels", 50.8503, 4.3517),
+    ("Lyon", 45.7640, 4.8357),
+    ("Marseille", 43.2965, 5.3698),
+    ("Montréal", 45.5017, -73.5673),
+    ("New York", 40.7128, -74.0060),
+    ("San Francisco", 37.7749, -122.4194),
+    ("Los Angeles", 34.0522, -118.2437),
+    ("Chicago", 41.8781, -87.6298),
+    ("Toronto", 43.6532, -79.3832),
+    ("Mexico City", 19.4326, -99.1332),
+    ("São Paulo", -23.5505, -46.6333),
+    ("Rio de Janeiro", -22.9068, -43.1729),
+    ("Buenos Aires", -34.6037, -58.3816),
+    ("Lagos", 6.5244, 3.3792),
+    ("Abidjan", 5.3600, -4.0083),
+    ("Dakar", 14.7167, -17.4677),
+    ("Cairo", 30.0444, 31.2357),
+    ("Casablanca", 33.5731, -7.5898),
+    ("Johannesburg", -26.2041, 28.0473),
+    ("Nairobi", -1.2921, 36.8219),
+    ("Dubai", 25.2048, 55.2708),
+    ("Istanbul", 41.0082, 28.9784),
+    ("Moscow", 55.7558, 37.6173),
+    ("Mumbai", 19.0760, 72.8777),
+    ("Delhi", 28.7041, 77.1025),
+    ("Bangalore", 12.9716, 77.5946),
+    ("Singapore", 1.3521, 103.8198),
+    ("Hong Kong", 22.3193, 114.1694),
+    ("Shanghai", 31.2304, 121.4737),
+    ("Beijing", 39.9042, 116.4074),
+    ("Seoul", 37.5665, 126.9780),
+    ("Tokyo", 35.6895, 139.6917),
+    ("Sydney", -33.8688, 151.2093),
+    ("Melbourne", -37.8136, 144.9631),
+]
+
+
+def _strip_accents(text):
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def fold(text):
+    """Minuscules sans accents ni espaces superflus (comparaison des noms)."""
+    return " ".join(_strip_accents(text).lower().split())
+
+
+def _repair_mojibake(name):
+    # UTF-8 relu en Latin-1 : "SÃ£o Paulo" -> "São Paulo"
+    if "Ã" in name or "Â" in name:
+        try:
+            return name.encode("latin-1").decode("utf-8")
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            pass
+    return name
+
+
+class CityNames:
+    """Correspondance entre noms de villes abîmés ou non accentués et noms du gazetteer."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.by_folded = {fold(name): name for name in self.names}
+        self._cache = {}
+
+    def normalize(self, name):
+        """
+        Nom canonique de la ville : Unicode NFC, espaces réduits, encodage
+        réparé, puis nom du gazetteer si la ville est reconnue (casse et accents
+        ignorés, "?" remplaçant un ou deux caractères perdus).
+        """
+        cached = self._cache.get(name)
+        if cached is not None:
+            return cached
+        cleaned = " ".join(unicodedata.normalize("NFC", _repair_mojibake(name)).split())
+        result = self.by_folded.get(fold(cleaned))
+        if result is None and "?" in cleaned:
+            # Un caractère non ASCII perdu à l'encodage donne un "?" par octet UTF-8
+            parts = re.split(r"(\?)", cleaned.replace("??", "?"))
+            pattern = re.compile("".join("(?:.{1,2})" if part == "?"
+                                         else re.escape(_strip_accents(part).lower())
+                                         for part in parts if part) + r"\Z")
+            matches = [canonical for folded, canonical in self.by_folded.items()
+                       if pattern.match(folded)]
+            if len(matches) == 1:
+                result = matches[0]
+        if result is None:
+            result = cleaned
+        if len(self._cache) >= MAX_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[name] = result
+        return result
+
+
+def _unit_vector(lat, lon):
+    lat, lon = math.radians(lat), math.radians(lon)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+class KDTree:
+    """Arbre k-d minimal (recherche du plus proche voisin) sur des points 3D."""
+
+    def __init__(self, points):
+        self.root = self._build(list(enumerate(points)), 0)
+
+    def _build(self, items, depth):
+        if not items:
+            return None
+        axis = depth % 3
+        items.sort(key=lambda item: item[1][axis])
+        middle = len(items) // 2
+        return (items[middle], axis,
+                self._build(items[:middle], depth + 1),
+                self._build(items[middle + 1:], depth + 1))
+
+    def nearest(self, point):
+        """(indice du point le plus proche, distance euclidienne)."""
+        best = [None, float("inf")]
+
+        def visit(node):
+            if node is None:
+                return
+            (index, candidate), axis, left, right = node
+            distance = math.sqrt(sum((a - b) ** 2 for a, b in zip(point, candidate)))
+            if distance < best[1]:
+                best[0], best[1] = index, distance
+            difference = point[axis] - candidate[axis]
+            near, far = (left, right) if difference < 0 else (right, left)
+            visit(near)
+            if abs(difference) < best[1]:
+                visit(far)
+
+        visit(self.root)
+        return best[0], best[1]
+
+
+class CityIndex:
+    """Ville du gazetteer la plus proche d'un point (latitude, longitude)."""
+
+    def __init__(self, gazetteer=None):
+        gazetteer = GAZETTEER if gazetteer is None else gazetteer
+        self.names = [name for name, _, _ in gazetteer]
+        self.points = [_unit_vector(lat, lon) for _, lat, lon in gazetteer]
+        self.tree = KDTree(self.points)
+        self.city_names = CityNames(self.names)
+
+    def nearest(self, lat, lon):
+        """(nom de la ville la plus proche, distance en km)."""
+        index, chord = self.tree.nearest(_unit_vector(lat, lon))
+        return self.names[index], _chord_to_km(chord)
+
+    def nearest_many(self, lats, lons):
+        """Version NumPy : (indices des villes, distances en km) pour des colonnes de points."""
+        _require_numpy()
+        lats, lons = np.radians(np.asarray(lats, dtype=np.float64)), np.radians(np.asarray(lons, dtype=np.float64))
+        points = np.column_stack((np.cos(lats) * np.cos(lons), np.cos(lats) * np.sin(lons), np.sin(lats)))
+        if cKDTree is not None:
+            chords, indices = cKDTree(np.asarray(self.points)).query(points)
+        else:
+            # Peu de villes : produit scalaire avec toutes les villes, par blocs de
+            # points ; sur la sphère unité, la corde vaut sqrt(2 - 2 * produit scalaire)
+            cities = np.asarray(self.points).T
+            indices = np.empty(len(points), dtype=np.int64)
+            chords = np.empty(len(points))
+            block = max(1, 4000000 // max(1, cities.shape[1]))
+            for start in range(0, len(points), block):
+                dots = points[start:start + block] @ cities
+                indices[start:start + block] = dots.argmax(axis=1)
+                best = dots[np.arange(len(dots)), indices[start:start + block]]
+                chords[start:start + block] = np.sqrt(np.maximum(0.0, 2 - 2 * best))
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, chords / 2))
+        return indices, distances
+
+
+def load_gazetteer(path):
+    """Lit un gazetteer CSV (colonnes nom, latitude, longitude ; une ligne d'en-tête optionnelle)."""
+    gazetteer = []
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        for row in csv.reader(file):
+            try:
+                gazetteer.append((row[0], float(row[1]), float(row[2])))
+            except (IndexError, ValueError):
+                continue
+    return gazetteer
+
+
+def _require_numpy():
+    global np, cKDTree
+    if np is not None:
+        return
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("Les calculs en masse nécessitent numpy (pip install numpy)")
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        pass
+    np = numpy
+
+
+def _numpy_available():
+    try:
+        _require_numpy()
+    except ImportError:
+        return False
+    return True
+
+
+def _quantize(value, low, high, bits):
+    # Équivalent aux bissections successives du geohash
+    cells = 1 << bits
+    return min(cells - 1, max(0, int((value - low) / (high - low) * cells)))
+
+
+def geohash_encode(lat, lon, precision=DEFAULT_GEOHASH_PRECISION):
+    """Geohash de `precision` caractères (5 caractères : cellule d'environ 5 km)."""
+    total_bits = 5 * precision
+    lon_bits, lat_bits = (total_bits + 1) // 2, total_bits // 2
+    lat_code, lon_code = _quantize(lat, -90.0, 90.0, lat_bits), _quantize(lon, -180.0, 180.0, lon_bits)
+    code = 0
+    for bit in range(total_bits):
+        # Bits pairs : longitude, bits impairs : latitude (en partant du bit de poids fort)
+        if bit % 2 == 0:
+            lon_bits -= 1
+            code = (code << 1) | ((lon_code >> lon_bits) & 1)
+        else:
+            lat_bits -= 1
+            code = (code << 1) | ((lat_code >> lat_bits) & 1)
+    return "".join(GEOHASH_ALPHABET[(code >> (5 * (precision - 1 - i))) & 31] for i in range(precision))
+
+
+def geohash_many(lats, lons, precision=DEFAULT_GEOHASH_PRECISION):
+    """Version NumPy de geohash_encode : tableau de chaînes."""
+    _require_numpy()
+    total_bits = 5 * precision
+    lon_bits, lat_bits = (total_bits + 1) // 2, total_bits // 2
+    lats, lons = np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)
+    lat_code = np.clip(((lats + 90.0) / 180.0 * (1 << lat_bits)).astype(np.int64), 0, (1 << lat_bits) - 1)
+    lon_code = np.clip(((lons + 180.0) / 360.0 * (1 << lon_bits)).astype(np.int64), 0, (1 << lon_bits) - 1)
+    code = np.zeros(len(lats), dtype=np.int64)
+    for bit in range(total_bits):
+        if bit % 2 == 0:
+            lon_bits -= 1
+            code = (code << 1) | ((lon_code >> lon_bits) & 1)
+        else:
+            lat_bits -= 1
+            code = (code << 1) | ((lat_code >> lat_bits) & 1)
+    alphabet = np.array(list(GEOHASH_ALPHABET))
+    characters = np.column_stack([alphabet[(code >> (5 * (precision - 1 - i))) & 31]
+                                  for i in range(precision)])
+    return np.ascontiguousarray(characters).view("<U{0}".format(precision)).ravel()
+
+
+def grid_cell(lat, lon, cell_size=DEFAULT_CELL_SIZE):
+    """Coin sud-ouest de la cellule de `cell_size` degrés contenant le point : "lat,lon"."""
+    return "{0:.2f},{1:.2f}".format(math.floor(lat / cell_size) * cell_size,
+                                    math.floor(lon / cell_size) * cell_size)
+
+
+def grid_many(lats, lons, cell_size=DEFAULT_CELL_SIZE):
+    """Version NumPy de grid_cell : (indices de ligne, indices de colonne) des cellules."""
+    _require_numpy()
+    return (np.floor(np.asarray(lats, dtype=np.float64) / cell_size).astype(np.int64),
+            np.floor(np.asarray(lons, dtype=np.float64) / cell_size).astype(np.int64))
+
+
+class GeoKeyer:
+    """
+    Clé géographique d'un tweet (`location` au format JSON d'origine) :
+
+    - "city" : ville déclarée, telle quelle ;
+    - "city_normalized" : ville déclarée, normalisée (normalize_city) ;
+    - "nearest_city" : ville du gazetteer la plus proche des coordonnées
+      (à moins de `max_distance_km`) ;
+    - "grid" : cellule de `cell_size` degrés ;
+    - "geohash" : geohash de `precision` caractères.
+
+    Renvoie None si la clé ne peut pas être calculée (ville inconnue, pas de
+    coordonnées, point trop loin de toute ville).
+    """
+
+    def __init__(self, kind="city", index=None, precision=DEFAULT_GEOHASH_PRECISION,
+                 cell_size=DEFAULT_CELL_SIZE, max_distance_km=MAX_DISTANCE_KM):
+        if kind not in GEO_KEYS:
+            raise ValueError("Clé géographique inconnue : {0} (choix : {1})".format(
+                kind, ", ".join(GEO_KEYS)))
+        self.kind = kind
+        if index is None and kind in ("city_normalized", "nearest_city"):
+            index = CityIndex()
+        self.index = index
+        self.precision = precision
+        self.cell_size = cell_size
+        self.max_distance_km = max_distance_km
+        self._cache = {}
+
+    def _point_key(self, lat, lon):
+        if self.kind == "geohash":
+            return geohash_encode(lat, lon, self.precision)
+        if self.kind == "grid":
+            return grid_cell(lat, lon, self.cell_size)
+        name, distance = self.index.nearest(lat, lon)
+        if self.max_distance_km is not None and distance > self.max_distance_km:
+            return None
+        return name
+
+    @staticmethod
+    def _point(location):
+        """(latitude, longitude) d'une `location`, ou None si les coordonnées manquent."""
+        coordinates = location.get("coordinates")
+        if not coordinates or len(coordinates) < 2:
+            return None
+        lat, lon = coordinates[0], coordinates[1]
+        if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+            return None
+        return (lat, lon)
+
+    @classmethod
+    def _record_point(cls, record):
+        """(latitude, longitude) d'un TweetRecord, y compris si sa localisation est de forme inattendue."""
+        if record.extra and "location" in record.extra:
+            location = record.extra["location"]
+            return cls._point(location) if isinstance(location, dict) else None
+        return None if record.lat is None else (record.lat, record.lon)
+
+    def _city_key(self, city):
+        if city is None or city == "unknown":
+            return None
+        return city if self.kind == "city" else self.index.city_names.normalize(city)
+
+    def key(self, location):
+        if self.kind in ("city", "city_normalized"):
+            return self._city_key(location.get("city", "unknown"))
+        return self._cached_key(self._point(location))
+
+    def _cached_key(self, point):
+        if point is None:
+            return None
+        # Les tweets d'un même lieu partagent souvent les mêmes coordonnées
+        if point in self._cache:
+            return self._cache[point]
+        if len(self._cache) >= MAX_CACHE_SIZE:
+            self._cache.clear()
+        key = self._cache[point] = self._point_key(*point)
+        return key
+
+    def keys(self, locations):
+        """
+        Clés d'un lot de `location` (mêmes résultats que `key`). Pour les clés
+        calculées depuis les coordonnées, les points absents du cache sont
+        traités en une fois par keys_many si NumPy est installé.
+        """
+        if self.kind in ("city", "city_normalized"):
+            return [self.key(location) for location in locations]
+        return self._point_keys([self._point(location) for location in locations])
+
+    def record_keys(self, records):
+        """
+        Clés d'un lot de TweetRecord (tweet_record.py), lues dans leurs
+        attributs `city`, `lat` et `lon` : mêmes résultats que `key` sur la
+        `location` d'origine, sans reconstruire de dictionnaire.
+        """
+        if self.kind in ("city", "city_normalized"):
+            return [self._city_key(record.city) for record in records]
+        return self._point_keys([self._record_point(record) for record in records])
+
+    def _point_keys(self, points):
+        if not _numpy_available():
+            return [self._cached_key(point) for point in points]
+        new_points = [point for point in dict.fromkeys(points)
+                      if point is not None and point not in self._cache]
+        computed = {}
+        if new_points:
+            lats, lons = zip(*new_points)
+            computed = dict(zip(new_points, self.keys_many(lats, lons)))
+        keys = [None if point is None else computed[point] if point in computed else self._cache[point]
+                for point in points]
+        if len(self._cache) + len(computed) > MAX_CACHE_SIZE:
+            self._cache.clear()
+        self._cache.update(computed)
+        return keys
+
+    def keys_many(self, lats, lons):
+        """Clés d'un ensemble de points (NumPy), pour les clés calculées depuis les coordonnées."""
+        if self.kind == "geohash":
+            return geohash_many(lats, lons, self.precision).tolist()
+        if self.kind == "grid":
+            rows, columns = grid_many(lats, lons, self.cell_size)
+            return ["{0:.2f},{1:.2f}".format(row * self.cell_size, column * self.cell_size)
+                    for row, column in zip(rows.tolist(), columns.tolist())]
+        if self.kind == "nearest_city":
+            indices, distances = self.index.nearest_many(lats, lons)
+            names = self.index.names
+            limit = float("inf") if self.max_distance_km is None else self.max_distance_km
+            return [names[index] if distance <= limit else None
+                    for index, distance in zip(indices.tolist(), distances.tolist())]
+        raise ValueError("keys_many ne s'applique qu'aux clés calculées depuis les coordonnées")
+
+
+_default_index = None
+
+
+def normalize_city(name, index=None):
+    """Nom canonique d'une ville (voir CityNames.normalize)."""
+    global _default_index
+    if index is None:
+        if _default_index is None:
+            _default_index = CityIndex()
+        index = _default_index
+    return index.city_names.normalize(name)
+
+
+def add_geo_arguments(parser, option="--key"):
+    """Ajoute les options de la clé géographique à un ArgumentParser."""
+    parser.add_argument(option, dest="geo_key", choices=GEO_KEYS, default="city",
+                        help="clé de regroupement géographique")
+    parser.add_argument("--geohash-precision", type=int, default=DEFAULT_GEOHASH_PRECISION,
+                        help="nombre de caractères du geohash")
+    parser.add_argument("--cell-size", type=float, default=DEFAULT_CELL_SIZE,
+                        help="taille des cellules de la grille, en degrés")
+    parser.add_argument("--max-distance", type=float, default=MAX_DISTANCE_KM,
+                        help="distance maximale (km) à la ville la plus proche")
+    parser.add_argument("--gazetteer", default=None,
+                        help="fichier CSV nom,latitude,longitude (gazetteer intégré par défaut)")
+    return parser
+
+
+def keyer_from_args(args):
+    index = CityIndex(load_gazetteer(args.gazetteer)) if args.gazetteer else None
+    return GeoKeyer(args.geo_key, index=index, precision=args.geohash_precision,
+                    cell_size=args.cell_size, max_distance_km=args.max_distance)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import sys
+
+from metrics import Metrics
+from sketches import SKETCH_MARKER, loads, sketch_line
+
+metrics = Metrics("geo_sentiment_combiner")
+
+def output_city_aggregate(city, sentiment_sum, sentiment_count, summary=None):
+    if sentiment_count:
+        print("{0}\t{1}\t{2}".format(city, sentiment_sum, sentiment_count))
+    if summary is not None:
+        print(sketch_line(city, summary))
+
+def combine(lines):
+    """
+    Les lignes arrivent triées par ville : on cumule (somme, nombre) par ville,
+    et on fusionne les résumés des lignes "ville, @sketch, résumé".
+    """
+    current_city = None
+    sentiment_sum = 0.0
+    sentiment_count = 0
+    summary = None
+    
+    for line in lines:
+        try:
+            # Lignes "ville, sentiment" ou pré-agrégées "ville, somme, nombre"
+            fields = line.strip().split('\t')
+            city = fields[0]
+            if fields[1] == SKETCH_MARKER:
+                sketch = loads(fields[2])
+            else:
+                sketch = None
+                sentiment = float(fields[1])
+                count = int(fields[2]) if len(fields) > 2 else 1
+            
+            if current_city is not None and city != current_city:
+                output_city_aggregate(current_city, sentiment_sum, sentiment_count, summary)
+                sentiment_sum = 0.0
+                sentiment_count = 0
+                summary = None
+            
+            current_city = city
+            if sketch is not None:
+                summary = sketch if summary is None else summary.merge(sketch)
+            else:
+                sentiment_sum += sentiment
+                sentiment_count += count
+                
+        except Exception as e:
+            metrics.malformed(e, "Error combining line")
+    
+    if current_city is not None:
+        output_city_aggregate(current_city, sentiment_sum, sentiment_count, summary)
+
+if __name__ == "__main__":
+    combine(sys.stdin)
+    metrics.finish_task()
@@ -1,43 +1,135 @@
 #!/usr/bin/env python3
 
+import argparse
+import os
 import sys
-import json
-from textblob import TextBlob
+
+from geo import GAZETTEER_ENV_VAR, GEO_KEY_ENV_VAR, GeoKeyer, add_geo_arguments, keyer_from_args
+from metrics import Metrics
+from sentiment_scorer import CACHE_ENV_VAR, SCORER_ENV_VAR, add_scorer_arguments, create_scorer
+from sketches import SKETCHES_ENV_VAR, SentimentSummary, sketch_line, sketches_enabled
+from tweet_reader import TweetReader
+
+# Le cache disque est activé si la variable d'environnement indique un fichier ;
+# TextBlob n'est importé qu'au premier tweet, le lexique binaire est plus rapide
+scorer = create_scorer(os.environ.get(SCORER_ENV_VAR), cache_path=os.environ.get(CACHE_ENV_VAR))
+
+# Clé de regroupement : ville déclarée par défaut (option --key ou variable d'environnement)
+keyer = GeoKeyer(os.environ.get(GEO_KEY_ENV_VAR, "city"))
+
+# Combinaison dans le mappeur : (somme, nombre) cumulés par ville et émis
+# lorsque le dictionnaire atteint MAX_BUFFERED_KEYS clés (et en fin de tâche)
+MAX_BUFFERED_KEYS = 10000
+buffered_sentiments = {}
+
+# Mode résumé (option --sketches ou variable d'environnement) : un résumé
+# fusionnable par ville (moments, quantiles, utilisateurs distincts), plus
+# volumineux qu'un couple (somme, nombre), d'où un tampon plus petit
+sketch_mode = sketches_enabled(os.environ.get(SKETCHES_ENV_VAR))
+MAX_BUFFERED_SKETCHES = 1000
+buffered_summaries = {}
+
+# Les tweets en attente (lieu, texte, utilisateur) sont traités par lots de
+# SCORE_BATCH_SIZE : clés géographiques calculées en masse (GeoKeyer.keys,
+# NumPy pour les clés issues des coordonnées), une requête au cache sqlite et
+# une écriture par lot, au lieu d'un SELECT et d'un commit par tweet
+SCORE_BATCH_SIZE = 1000
+pending_tweets = []
+
+# Compteurs de la tâche (compteurs Hadoop sous Hadoop Streaming)
+metrics = Metrics("geo_sentiment_mapper")
+
+def score_pending():
+    """Calcule les clés et les sentiments des tweets en attente en un lot, puis les cumule."""
+    batch = pending_tweets[:]
+    del pending_tweets[:]
+    if not batch:
+        return
+    cities = keyer.keys([location for location, _, _ in batch])
+    batch = [(city, text, user_id) for city, (_, text, user_id) in zip(cities, batch) if city is not None]
+    sentiments = scorer.score_batch([text for _, text, _ in batch])
+    for (city, _, user_id), sentiment in zip(batch, sentiments):
+        if sketch_mode:
+            emit_summary(city, sentiment, user_id)
+        else:
+            emit(city, sentiment)
+
+def flush():
+    """Note les tweets en attente, émet les agrégats (ville, somme, nombre) et vide le tampon."""
+    score_pending()
+    for city, (sentiment_sum, sentiment_count) in buffered_sentiments.items():
+        print("{0}\t{1}\t{2}".format(city, sentiment_sum, sentiment_count))
+    for city, summary in buffered_summaries.items():
+        print(sketch_line(city, summary))
+    metrics.incr("records_out", len(buffered_sentiments) + len(buffered_summaries))
+    buffered_sentiments.clear()
+    buffered_summaries.clear()
+
+def emit(city, sentiment_sum, sentiment_count=1):
+    aggregate = buffered_sentiments.get(city)
+    if aggregate is None:
+        buffered_sentiments[city] = [sentiment_sum, sentiment_count]
+        if len(buffered_sentiments) >= MAX_BUFFERED_KEYS:
+            flush()
+    else:
+        aggregate[0] += sentiment_sum
+        aggregate[1] += sentiment_count
+
+def emit_summary(city, sentiment, user_id):
+    summary = buffered_summaries.get(city)
+    if summary is None:
+        if len(buffered_summaries) >= MAX_BUFFERED_SKETCHES:
+            flush()
+        summary = buffered_summaries[city] = SentimentSummary()
+    summary.add(sentiment, user_id)
 
 def process_tweet(tweet):
     """
-    Traite un objet tweet et émet les paires (ville, sentiment)
+    Traite un objet tweet et cumule le couple (somme, nombre) de sa ville
+    (ou de sa clé géographique : geohash, cellule, ville la plus proche...) ;
+    clé et sentiment sont calculés par lots (score_pending)
     """
-    location = tweet.get("location", {})
-    city = location.get("city", "unknown")
-    
-    if city == "unknown":
-        return
-    
+    location = tweet.get("location") or {}
     text = tweet.get("tweet_text", "")
     
-    sentiment = 0.0
-    try:
-        blob = TextBlob(text)
-        sentiment = blob.sentiment.polarity
-    except:
-        pass
-    
-    print("{0}\t{1}".format(city, sentiment))
+    pending_tweets.append((location, text, tweet.get("user_id")))
+    if len(pending_tweets) >= SCORE_BATCH_SIZE:
+        score_pending()
 
 if __name__ == "__main__":
-    for line in sys.stdin:
-        line = line.strip()
-        if not line or line == '[' or line == ']':
-            continue
-            
-        # Supprimer les virgules à la fin (pour les éléments du tableau)
-        if line.endswith(','):
-            line = line[:-1]
-            
-        try:
-            # Essayer de parser la ligne comme un objet JSON
-            tweet = json.loads(line)
-            process_tweet(tweet)
-        except Exception as e:
-            sys.stderr.write("Error processing line: {0}\nError: {1}\n".format(line[:50], str(e)))
+    parser = argparse.ArgumentParser(description="Mappeur : sentiment par ville ou par zone")
+    add_geo_arguments(parser)
+    add_scorer_arguments(parser)
+    parser.add_argument("--sketches", action="store_true",
+                        help="émet un résumé fusionnable par ville (quantiles, utilisateurs distincts)")
+    parser.set_defaults(geo_key=keyer.kind, gazetteer=os.environ.get(GAZETTEER_ENV_VAR), scorer=scorer.name)
+    args = parser.parse_args()
+    keyer = keyer_from_args(args)
+    sketch_mode = sketch_mode or args.sketches
+    if args.scorer != scorer.name or args.lexicon:
+        scorer.close()
+        scorer = create_scorer(args.scorer, cache_path=os.environ.get(CACHE_ENV_VAR), lexicon_path=args.lexicon)
+    
+    # L'entrée peut être un tableau JSON indenté, du JSONL ou du gzip :
+    # les objets sont décodés au fil du flux, sans étape de conversion
+    reader = TweetReader(sys.stdin)
+    failed = 0
+    with metrics.phase("map"):
+        for tweet in reader:
+            try:
+                process_tweet(tweet)
+            except Exception:
+                failed += 1
+        flush()
+
+    metrics.set("records_in", reader.count)
+    metrics.set("malformed", reader.errors)
+    metrics.set("failed", failed)
+    metrics.set("cache_hits", scorer.hits)
+    metrics.set("cache_disk_hits", scorer.disk_hits)
+    metrics.set("cache_misses", scorer.misses)
+    metrics.finish_task()
+    sys.stderr.write("Cache de sentiment : {0}\n".format(scorer.describe()))
+    scorer.close()
+    if reader.errors or failed:
+        sys.stderr.write("Enregistrements ignorés: {0} mal formés, {1} en erreur\n".format(reader.errors, failed))
@@ -1,8 +1,18 @@
 #!/usr/bin/env python3
 
+import argparse
 import sys
 
-def output_city_sentiment(city, sentiment_sum, sentiment_count):
+from metrics import Metrics
+from sketches import QUANTILES, SKETCH_MARKER, loads, sketch_line
+
+metrics = Metrics("geo_sentiment_reducer")
+
+def output_city_sentiment(city, sentiment_sum, sentiment_count, summary=None):
+    if summary is not None:
+        # Les moments du résumé sont exacts : moyenne et nombre restent exacts
+        sentiment_sum += summary.moments.total
+        sentiment_count += summary.moments.count
     average_sentiment = sentiment_sum / sentiment_count if sentiment_count > 0 else 0
     
     sentiment_label = "neutre"
@@ -11,32 +21,68 @@ def output_city_sentiment(city, sentiment_sum, sentiment_count):
     elif average_sentiment < -0.1:
         sentiment_label = "négatif"
     
-    print("{0}\t{1:.4f}\t{2}\t{3}".format(city, average_sentiment, sentiment_label, sentiment_count))
+    line = "{0}\t{1:.4f}\t{2}\t{3}".format(city, average_sentiment, sentiment_label, sentiment_count)
+    if summary is not None:
+        # Colonnes supplémentaires : quantiles (p10, médiane, p90) et utilisateurs distincts estimés
+        quantiles = [summary.quantiles.quantile(q) for q in QUANTILES]
+        line += "".join("\t{0:.4f}".format(value) for value in quantiles)
+        line += "\t{0}".format(summary.users.count())
+    print(line)
+
+def output_city_sketch(city, sentiment_sum, sentiment_count, summary=None):
+    """Sortie fusionnable (option --sketch-output) : regroupable ensuite par sketches.py rollup."""
+    if sentiment_count:
+        print("{0}\t{1}\t{2}".format(city, sentiment_sum, sentiment_count))
+    if summary is not None:
+        print(sketch_line(city, summary))
 
-def process_cities():
+def process_cities(lines=None, sketch_output=False):
+    """
+    Lit les lignes triées par ville (entrée standard par défaut) et affiche le
+    sentiment moyen de chaque ville, avec ses quantiles et ses utilisateurs
+    distincts si les lignes portent des résumés (mappeur en mode --sketches).
+    """
+    output = output_city_sketch if sketch_output else output_city_sentiment
     current_city = None
     sentiment_sum = 0.0
     sentiment_count = 0
+    summary = None
     
-    for line in sys.stdin:
+    for line in (sys.stdin if lines is None else lines):
         try:
-            city, sentiment = line.strip().split('\t')
-            sentiment = float(sentiment)
+            # Lignes "ville, sentiment" ou pré-agrégées "ville, somme, nombre"
+            fields = line.strip().split('\t')
+            city = fields[0]
+            if fields[1] == SKETCH_MARKER:
+                sketch = loads(fields[2])
+            else:
+                sketch = None
+                sentiment = float(fields[1])
+                count = int(fields[2]) if len(fields) > 2 else 1
             
             if current_city is not None and city != current_city:
-                output_city_sentiment(current_city, sentiment_sum, sentiment_count)
+                output(current_city, sentiment_sum, sentiment_count, summary)
                 sentiment_sum = 0.0
                 sentiment_count = 0
+                summary = None
             
             current_city = city
-            sentiment_sum += sentiment
-            sentiment_count += 1
+            if sketch is not None:
+                summary = sketch if summary is None else summary.merge(sketch)
+            else:
+                sentiment_sum += sentiment
+                sentiment_count += count
                 
         except Exception as e:
-            sys.stderr.write("Error reducing line: {0}\n".format(e))
+            metrics.malformed(e, "Error reducing line")
     
     if current_city is not None:
-        output_city_sentiment(current_city, sentiment_sum, sentiment_count)
+        output(current_city, sentiment_sum, sentiment_count, summary)
 
 if __name__ == "__main__":
-    process_cities()
+    parser = argparse.ArgumentParser(description="Réducteur : sentiment moyen par ville")
+    parser.add_argument("--sketch-output", action="store_true",
+                        help="écrit les agrégats et résumés fusionnés (regroupement mois -> trimestre)")
+    args = parser.parse_args()
+    process_cities(sketch_output=args.sketch_output)
+    metrics.finish_task()
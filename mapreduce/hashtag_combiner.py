@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+import sys
+
+from metrics import Metrics
+from sketches import SKETCH_MARKER, loads, sketch_line
+
+metrics = Metrics("hashtag_combiner")
+
+def output_count(month_key, hashtag, count):
+    print("{0}\t{1}\t{2}".format(month_key, hashtag, count))
+
+def output_current(current_key, current_count):
+    if current_key[1] == SKETCH_MARKER:
+        print(sketch_line(current_key[0], current_count))
+    else:
+        output_count(current_key[0], current_key[1], current_count)
+
+def combine(lines):
+    """
+    Les lignes arrivent triées : on cumule les comptes des clés (mois, hashtag)
+    consécutives, et on fusionne les Count-Min des lignes "mois, @sketch, résumé".
+    """
+    current_key = None
+    current_count = 0
+    
+    for line in lines:
+        try:
+            month_key, hashtag, count = line.strip().split('\t')
+            count = loads(count) if hashtag == SKETCH_MARKER else int(count)
+            
+            if current_key is not None and (month_key, hashtag) != current_key:
+                output_current(current_key, current_count)
+                current_count = 0
+            
+            if hashtag != SKETCH_MARKER:
+                current_count += count
+            elif (month_key, hashtag) == current_key:
+                current_count.merge(count)
+            else:
+                # Premier Count-Min du mois
+                current_count = count
+            current_key = (month_key, hashtag)
+                
+        except Exception as e:
+            metrics.malformed(e, "Error combining line")
+    
+    if current_key is not None:
+        output_current(current_key, current_count)
+
+if __name__ == "__main__":
+    combine(sys.stdin)
+    metrics.finish_task()
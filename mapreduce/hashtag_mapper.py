@@ -1,19 +1,61 @@
 #!/usr/bin/env python3
 
+import argparse
+import os
 import sys
-import json
-import datetime
+
+from metrics import Metrics
+from sketches import SKETCHES_ENV_VAR, CountMinSketch, sketch_line, sketches_enabled
+from time_buckets import TIMEZONE_ENV_VAR, TimeBucketer
+from tweet_reader import TweetReader
+
+# Mois des tweets (AAAA-MM), mémoïsé par date
+bucketer = TimeBucketer("month", os.environ.get(TIMEZONE_ENV_VAR))
+
+# Combinaison dans le mappeur : les comptes sont cumulés en mémoire et émis
+# lorsque le dictionnaire atteint MAX_BUFFERED_KEYS clés (et en fin de tâche)
+MAX_BUFFERED_KEYS = 10000
+buffered_counts = {}
+
+# Mode résumé (option --sketches ou variable d'environnement) : un Count-Min par mois, de taille
+# fixe quel que soit le nombre de hashtags distincts
+sketch_mode = sketches_enabled(os.environ.get(SKETCHES_ENV_VAR))
+buffered_sketches = {}
+
+# Compteurs de la tâche (compteurs Hadoop sous Hadoop Streaming)
+metrics = Metrics("hashtag_mapper")
+
+def flush():
+    """Émet les comptes cumulés (mois, hashtag, nombre) et vide le tampon."""
+    for (month_key, hashtag), count in buffered_counts.items():
+        print("{0}\t{1}\t{2}".format(month_key, hashtag, count))
+    for month_key, sketch in buffered_sketches.items():
+        print(sketch_line(month_key, sketch))
+    metrics.incr("records_out", len(buffered_counts) + len(buffered_sketches))
+    buffered_counts.clear()
+    buffered_sketches.clear()
+
+def emit(month_key, hashtag, count=1):
+    if sketch_mode:
+        sketch = buffered_sketches.get(month_key)
+        if sketch is None:
+            sketch = buffered_sketches[month_key] = CountMinSketch()
+        sketch.add(hashtag, count)
+        return
+    key = (month_key, hashtag)
+    buffered_counts[key] = buffered_counts.get(key, 0) + count
+    if len(buffered_counts) >= MAX_BUFFERED_KEYS:
+        flush()
 
 def process_tweet(tweet):
     """
-    Traite un objet tweet et émet les paires (mois-hashtag, 1)
+    Traite un objet tweet et émet les paires (mois-hashtag, nombre)
     """
     timestamp = tweet.get("timestamp")
     if not timestamp:
         return
         
-    date = datetime.datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-    month_key = "{0}-{1:02d}".format(date.year, date.month)
+    month_key = bucketer.key(timestamp)
     
     for hashtag in tweet.get("hashtags", []):
         hashtag = hashtag.lower().strip()
@@ -21,21 +63,30 @@ def process_tweet(tweet):
             hashtag = hashtag[1:]
             
         if hashtag:
-            print("{0}\t{1}\t1".format(month_key, hashtag))
+            emit(month_key, hashtag)
 
 if __name__ == "__main__":
-    for line in sys.stdin:
-        line = line.strip()
-        if not line or line == '[' or line == ']':
-            continue
-            
-        # Supprimer les virgules à la fin (pour les éléments du tableau)
-        if line.endswith(','):
-            line = line[:-1]
-            
-        try:
-            # Essayer de parser la ligne comme un objet JSON
-            tweet = json.loads(line)
-            process_tweet(tweet)
-        except Exception as e:
-            sys.stderr.write("Error processing line: {0}\nError: {1}\n".format(line[:50], str(e)))
+    parser = argparse.ArgumentParser(description="Mappeur : hashtags par mois")
+    parser.add_argument("--sketches", action="store_true",
+                        help="émet un Count-Min par mois au lieu des comptes (mois, hashtag)")
+    args = parser.parse_args()
+    sketch_mode = sketch_mode or args.sketches
+    
+    # L'entrée peut être un tableau JSON indenté, du JSONL ou du gzip :
+    # les objets sont décodés au fil du flux, sans étape de conversion
+    reader = TweetReader(sys.stdin)
+    failed = 0
+    with metrics.phase("map"):
+        for tweet in reader:
+            try:
+                process_tweet(tweet)
+            except Exception:
+                failed += 1
+        flush()
+
+    metrics.set("records_in", reader.count)
+    metrics.set("malformed", reader.errors)
+    metrics.set("failed", failed)
+    metrics.finish_task()
+    if reader.errors or failed:
+        sys.stderr.write("Enregistrements ignorés: {0} mal formés, {1} en erreur\n".format(reader.errors, failed))
@@ -1,34 +1,105 @@
 #!/usr/bin/env python3
 
+import argparse
 import sys
 from collections import defaultdict
-from operator import itemgetter
+
+from metrics import Metrics
+from sketches import SKETCH_MARKER, CountMinSketch, loads, sketch_line
+from topk import SpaceSaving, top_k
+
+TOP_N = 10
+DEFAULT_CAPACITY = 10000
+
+metrics = Metrics("hashtag_reducer")
 
 def output_top_hashtags(month, hashtag_counts):
-    top_hashtags = sorted(hashtag_counts.items(), key=itemgetter(1), reverse=True)[:10]
+    top_hashtags = top_k(hashtag_counts, TOP_N)
     print("Top 10 hashtags for {0}:".format(month))
     for hashtag, count in top_hashtags:
         print("#{0}: {1}".format(hashtag, count))
     print("---")
 
-if __name__ == "__main__":
+def output_approximate_top_hashtags(month, summary):
+    # Chaque compte surestime le compte réel d'au plus l'erreur indiquée
+    print("Top 10 hashtags for {0} (approximate, max error {1:.0f}):".format(month, summary.max_error))
+    for hashtag, count, error in summary.top(TOP_N):
+        print("#{0}: {1} (+/-{2})".format(hashtag, count, error))
+    print("---")
+
+def output_sketch_top_hashtags(month, sketch):
+    # Comptes Count-Min : jamais sous-estimés, surestimés d'au plus l'erreur indiquée
+    # (avec une probabilité d'au moins 1 - exp(-depth))
+    print("Top 10 hashtags for {0} (count-min, max error {1:.0f}):".format(month, sketch.max_error))
+    for hashtag, count in sketch.top(TOP_N):
+        print("#{0}: {1}".format(hashtag, count))
+    print("---")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Réducteur : top 10 des hashtags par mois")
+    parser.add_argument("--approximate", action="store_true",
+                        help="résumé Space-Saving en mémoire bornée au lieu de comptes exacts")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY,
+                        help="nombre de hashtags suivis par mois en mode approximatif")
+    parser.add_argument("--sketch-output", action="store_true",
+                        help="écrit un Count-Min fusionnable par mois (regroupement par sketches.py rollup)")
+    return parser.parse_args(argv)
+
+def reduce_hashtags(lines, approximate=False, capacity=DEFAULT_CAPACITY, sketch_output=False):
+    """
+    Lit les lignes (mois, hashtag, nombre) triées par clé et affiche le top 10
+    de chaque mois. Les lignes "mois, @sketch, résumé" (mappeur en mode
+    résumé) sont fusionnées dans un Count-Min, auquel s'ajoutent alors les
+    comptes exacts du mois.
+    """
+    if approximate:
+        new_counts = lambda: SpaceSaving(capacity)
+        output = output_approximate_top_hashtags
+    else:
+        new_counts = lambda: defaultdict(int)
+        output = output_top_hashtags
+    
+    def output_month(month, hashtag_counts, sketch):
+        if sketch is None and not sketch_output:
+            output(month, hashtag_counts)
+            return
+        sketch = CountMinSketch() if sketch is None else sketch
+        for hashtag, count in (hashtag_counts.counts if approximate else hashtag_counts).items():
+            sketch.add(hashtag, count)
+        if sketch_output:
+            print(sketch_line(month, sketch))
+        else:
+            output_sketch_top_hashtags(month, sketch)
+    
     current_month = None
-    hashtag_counts = defaultdict(int)
+    hashtag_counts = new_counts()
+    month_sketch = None
     
-    for line in sys.stdin:
+    for line in lines:
         try:
             month_key, hashtag, count = line.strip().split('\t')
-            count = int(count)
+            count = loads(count) if hashtag == SKETCH_MARKER else int(count)
             
             if current_month is not None and month_key != current_month:
-                output_top_hashtags(current_month, hashtag_counts)
-                hashtag_counts = defaultdict(int)
+                output_month(current_month, hashtag_counts, month_sketch)
+                hashtag_counts = new_counts()
+                month_sketch = None
             
             current_month = month_key
-            hashtag_counts[hashtag] += count
+            if hashtag == SKETCH_MARKER:
+                month_sketch = count if month_sketch is None else month_sketch.merge(count)
+            elif approximate:
+                hashtag_counts.add(hashtag, count)
+            else:
+                hashtag_counts[hashtag] += count
                 
         except Exception as e:
-            sys.stderr.write("Error: {0}\n".format(e))
+            metrics.malformed(e)
     
     if current_month is not None:
-        output_top_hashtags(current_month, hashtag_counts)
+        output_month(current_month, hashtag_counts, month_sketch)
+
+if __name__ == "__main__":
+    args = parse_args()
+    reduce_hashtags(sys.stdin, args.approximate, args.capacity, args.sketch_output)
+    metrics.finish_task()
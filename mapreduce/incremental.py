@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Traitement incrémental des partitions mensuelles (tweets_by_month/AAAA/MM).
+
+Un manifeste garde, pour chaque partition traitée, le hash de son contenu et
+le fichier de ses agrégats :
+- comptes des hashtags du mois,
+- (somme, nombre) des sentiments par ville et par jour.
+
+À chaque exécution, seules les partitions nouvelles ou modifiées sont relues ;
+les résultats globaux sont obtenus en fusionnant les agrégats. Le coût d'une
+exécution quotidienne est donc proportionnel aux nouvelles données.
+
+    python mapreduce/incremental.py --root tweets_by_month --state .cache/incremental
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from collections import defaultdict
+
+from keywords import normalize_hashtag
+from sentiment_scorer import SentimentScorer
+from time_buckets import TimeBucketer
+from topk import top_k
+from tweet_reader import TweetReader
+
+MANIFEST_NAME = "manifest.json"
+SENTIMENT_BATCH_SIZE = 1000
+TOP_N = 10
+
+
+def file_hash(path, block_size=1 << 20):
+    """Hash SHA-256 du contenu d'un fichier, lu par blocs."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_partitions(root):
+    """
+    {"AAAA-MM": chemin} pour chaque fichier de tweets de root/AAAA/MM/.
+
+    Si un mois a changé de format (tweets.json puis tweets.json.gz...),
+    l'ancienne variante peut rester à côté : on retient le fichier modifié le
+    plus récemment, sans l'index de blocs (.idx) ni une écriture en cours (.part).
+    """
+    partitions = {}
+    if not os.path.isdir(root):
+        return partitions
+    for year in sorted(os.listdir(root)):
+        year_dir = os.path.join(root, year)
+        if not (year.isdigit() and os.path.isdir(year_dir)):
+            continue
+        for month in sorted(os.listdir(year_dir)):
+            month_dir = os.path.join(year_dir, month)
+            if not (month.isdigit() and os.path.isdir(month_dir)):
+                continue
+            candidates = [os.path.join(month_dir, name) for name in os.listdir(month_dir)
+                          if name.startswith("tweets.") and not name.endswith((".idx", ".part"))]
+            if candidates:
+                partitions[f"{year}-{month}"] = max(
+                    candidates, key=lambda path: (os.path.getmtime(path), path))
+    return partitions
+
+
+def compute_partition(path, scorer):
+    """Agrégats d'une partition, calculés en une passe en flux."""
+    hashtag_counts = defaultdict(int)
+    sentiment = defaultdict(lambda: defaultdict(lambda: [0.0, 0]))
+    pending = []
+    bucketer = TimeBucketer("day")
+
+    def flush():
+        scores = scorer.score_batch([text for _, _, text in pending])
+        for (city, day, _), score in zip(pending, scores):
+            total = sentiment[city][day]
+            total[0] += score
+            total[1] += 1
+        pending.clear()
+
+    reader = TweetReader(path)
+    for tweet in reader:
+        for hashtag in tweet.get("hashtags", []):
+            hashtag = normalize_hashtag(hashtag)
+            if hashtag:
+                hashtag_counts[hashtag] += 1
+
+        city = tweet.get("location", {}).get("city", "unknown")
+        timestamp = tweet.get("timestamp", "")
+        if city != "unknown" and timestamp:
+            try:
+                day = bucketer.key(timestamp)
+            except ValueError:
+                continue
+            pending.append((city, day, tweet.get("tweet_text", "")))
+            if len(pending) >= SENTIMENT_BATCH_SIZE:
+                flush()
+    flush()
+
+    return {
+        "tweets": reader.count,
+        "hashtags": dict(hashtag_counts),
+        "sentiment": {city: dict(days) for city, days in sentiment.items()},
+    }
+
+
+class IncrementalState:
+    """Manifeste et agrégats par partition, stockés dans `state_dir`."""
+
+    def __init__(self, state_dir):
+        self.state_dir = state_dir
+        self.manifest_path = os.path.join(state_dir, MANIFEST_NAME)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as file:
+                self.manifest = json.load(file)
+
+    def _aggregate_path(self, partition):
+        return os.path.join(self.state_dir, "partitions", f"{partition}.json")
+
+    def save(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+        temporary = self.manifest_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(self.manifest, file, indent=2, sort_keys=True)
+        os.replace(temporary, self.manifest_path)
+
+    def update(self, root, scorer=None):
+        """
+        Met à jour les agrégats depuis les partitions de `root`.
+        Renvoie les listes (traitées, inchangées, supprimées).
+        """
+        scorer = scorer or SentimentScorer()
+        partitions = find_partitions(root)
+        processed, unchanged = [], []
+
+        for partition, path in partitions.items():
+            content_hash = file_hash(path)
+            entry = self.manifest.get(partition)
+            if entry and entry["hash"] == content_hash:
+                unchanged.append(partition)
+                continue
+
+            aggregates = compute_partition(path, scorer)
+            aggregate_path = self._aggregate_path(partition)
+            os.makedirs(os.path.dirname(aggregate_path), exist_ok=True)
+            with open(aggregate_path, "w", encoding="utf-8") as file:
+                json.dump(aggregates, file, ensure_ascii=False)
+            self.manifest[partition] = {"hash": content_hash, "path": path,
+                                        "tweets": aggregates["tweets"]}
+            # Le manifeste est enregistré après chaque partition (point de reprise)
+            self.save()
+            processed.append(partition)
+
+        removed = [partition for partition in self.manifest if partition not in partitions]
+        for partition in removed:
+            del self.manifest[partition]
+            if os.path.exists(self._aggregate_path(partition)):
+                os.remove(self._aggregate_path(partition))
+        if removed:
+            self.save()
+
+        return processed, unchanged, removed
+
+    def aggregates(self):
+        """Itère sur (partition, agrégats) pour toutes les partitions connues."""
+        for partition in sorted(self.manifest):
+            with open(self._aggregate_path(partition), "r", encoding="utf-8") as file:
+                yield partition, json.load(file)
+
+    def merged(self):
+        """
+        Fusionne les agrégats de toutes les partitions :
+        - top des hashtags par mois,
+        - (somme, nombre) des sentiments par ville et par jour.
+        """
+        top_by_month = {}
+        city_totals = defaultdict(lambda: [0.0, 0])
+        daily_totals = defaultdict(lambda: [0.0, 0])
+        for partition, aggregates in self.aggregates():
+            top_by_month[partition] = top_k(aggregates["hashtags"], TOP_N)
+            for city, days in aggregates["sentiment"].items():
+                for day, (total, count) in days.items():
+                    city_totals[city][0] += total
+                    city_totals[city][1] += count
+                    daily_totals[day][0] += total
+                    daily_totals[day][1] += count
+        return top_by_month, dict(city_totals), dict(daily_totals)
+
+
+def main(argv=None):
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Analyse incrémentale des partitions mensuelles")
+    parser.add_argument("--root", default=os.path.join(project_dir, "tweets_by_month"),
+                        help="dossier des partitions AAAA/MM")
+    parser.add_argument("--state", default=os.path.join(project_dir, ".cache", "incremental"),
+                        help="dossier du manifeste et des agrégats")
+    args = parser.parse_args(argv)
+
+    state = IncrementalState(args.state)
+    scorer = SentimentScorer(cache_path=os.path.join(project_dir, ".cache", "sentiment.sqlite3"))
+    processed, unchanged, removed = state.update(args.root, scorer)
+    print(f"Partitions traitées : {len(processed)} {processed}")
+    print(f"Partitions inchangées : {len(unchanged)}")
+    if removed:
+        print(f"Partitions supprimées : {removed}")
+
+    top_by_month, city_totals, daily_totals = state.merged()
+    for month, top_hashtags in top_by_month.items():
+        print(f"\nTop 10 hashtags pour {month} :")
+        for hashtag, count in top_hashtags:
+            print(f"  #{hashtag}: {count}")
+
+    print("\nSentiment moyen par région :")
+    for city, (total, count) in sorted(city_totals.items()):
+        print(f"{city}: {total / count:.4f} - {count} tweets")
+
+    print("\nSentiment moyen par jour :")
+    for day, (total, count) in sorted(daily_totals.items()):
+        print(f"{day}: {total / count:.4f} - {count} tweets")
+
+
+if __name__ == "__main__":
+    main()
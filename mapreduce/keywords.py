@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Extraction des mots-clés et normalisation des hashtags.
+
+- expressions régulières compilées une seule fois ;
+- mots vides configurables (anglais et français) ;
+- n-grammes en option (bigrammes "big data", trigrammes...) ;
+- comptage direct dans un compteur (Counter, defaultdict(int)...), sans
+  liste intermédiaire par tweet ;
+- mode par lots : un lot de textes est mis en minuscules, nettoyé et découpé
+  en un seul appel à chaque expression régulière.
+
+Par défaut, les mots-clés sont identiques à ceux de l'ancienne fonction
+extract_keywords (mots ASCII de 3 lettres ou plus, hors liens et hashtags).
+"""
+
+import re
+from collections import Counter
+
+# Mots vides historiques de l'analyse (comportement par défaut)
+DEFAULT_STOP_WORDS = frozenset({
+    "the", "and", "for", "that", "this", "with", "from", "was", "are", "you", "have", "your",
+})
+
+LANGUAGE_STOP_WORDS = {
+    "en": frozenset(DEFAULT_STOP_WORDS | {
+        "about", "after", "all", "also", "any", "been", "but", "can", "could", "did", "does",
+        "each", "had", "has", "her", "his", "how", "into", "its", "just", "more", "most",
+        "not", "now", "our", "out", "over", "she", "some", "than", "their", "them", "then",
+        "there", "these", "they", "too", "very", "were", "what", "when", "which", "who",
+        "why", "will", "would", "yours", "get", "got", "new", "one", "via",
+    }),
+    "fr": frozenset({
+        "les", "des", "est", "une", "que", "qui", "dans", "pour", "pas", "par", "sur",
+        "avec", "plus", "son", "ses", "mais", "comme", "nous", "vous", "ils", "elle",
+        "elles", "leur", "leurs", "cette", "ces", "aux", "été", "être", "avoir", "tout",
+        "tous", "toute", "toutes", "très", "sans", "sont", "ont", "fait", "entre", "aussi",
+        "donc", "car", "lui", "mon", "ton", "notre", "votre", "nos", "vos", "même", "où",
+        "quand", "alors", "encore", "peu", "peut", "chez", "ici", "moi", "toi",
+        "avait", "était", "sera", "ceci", "cela", "celui", "celle", "dont", "quel", "quelle",
+        "bien", "faire", "sous", "vers", "depuis", "pendant", "avant", "après",
+    }),
+}
+
+# Liens et hashtags retirés avant le découpage en mots
+STRIP_PATTERN = re.compile(r'#\w+|http\S+')
+ASCII_WORD_PATTERN = re.compile(r'\b[a-z]{3,}\b')
+# Lettres Unicode (mots accentués du français)
+UNICODE_WORD_PATTERN = re.compile(r'\b[^\W\d_]{3,}\b')
+
+
+def normalize_hashtag(hashtag):
+    """Normalise un hashtag en le mettant en minuscules et en supprimant le # initial."""
+    hashtag = hashtag.lower().strip()
+    return hashtag[1:] if hashtag.startswith('#') else hashtag
+
+
+def stop_words(languages=None):
+    """Mots vides des langues demandées ("en", "fr"), ou la liste historique par défaut."""
+    if not languages:
+        return DEFAULT_STOP_WORDS
+    words = set()
+    for language in languages:
+        if language not in LANGUAGE_STOP_WORDS:
+            raise ValueError("Langue inconnue : {0} (choix : {1})".format(
+                language, ", ".join(sorted(LANGUAGE_STOP_WORDS))))
+        words |= LANGUAGE_STOP_WORDS[language]
+    return frozenset(words)
+
+
+class KeywordExtractor:
+    """
+    Découpe des textes en mots-clés.
+
+    - `languages` : langues des mots vides (None = liste historique) ;
+    - `max_ngram` : taille maximale des n-grammes (1 = mots seuls) ;
+    - `unicode_words` : accepte les lettres accentuées (sinon a-z seulement).
+    """
+
+    def __init__(self, languages=None, max_ngram=1, unicode_words=None, extra_stop_words=()):
+        self.stop_words = stop_words(languages) | frozenset(extra_stop_words)
+        self.max_ngram = max_ngram
+        if unicode_words is None:
+            unicode_words = bool(languages) and "fr" in languages
+        self.word_pattern = UNICODE_WORD_PATTERN if unicode_words else ASCII_WORD_PATTERN
+
+    def tokens(self, text):
+        """Mots du texte, hors mots vides (générateur)."""
+        stop = self.stop_words
+        for word in self.word_pattern.findall(STRIP_PATTERN.sub('', text.lower())):
+            if word not in stop:
+                yield word
+
+    def keywords(self, text):
+        """Mots, puis n-grammes de mots consécutifs (hors mots vides) jusqu'à max_ngram."""
+        if self.max_ngram == 1:
+            return self.tokens(text)
+        words = list(self.tokens(text))
+        grams = list(words)
+        for size in range(2, self.max_ngram + 1):
+            grams.extend(" ".join(gram) for gram in zip(*(words[start:] for start in range(size))))
+        return grams
+
+    def count(self, text, counts):
+        """Ajoute les mots-clés de `text` au compteur `counts` et le renvoie."""
+        if isinstance(counts, Counter):
+            counts.update(self.keywords(text))
+        else:
+            for word in self.keywords(text):
+                counts[word] += 1
+        return counts
+
+    def count_batch(self, texts, counts):
+        """
+        Ajoute les mots-clés d'un lot de textes à `counts`. Sans n-grammes, les
+        textes sont joints par un saut de ligne (que ni les liens, ni les
+        hashtags, ni les mots ne traversent) et traités en un seul passage ;
+        l'ordre de première apparition des mots est conservé.
+        """
+        if self.max_ngram > 1:
+            for text in texts:
+                self.count(text, counts)
+            return counts
+        stop = self.stop_words
+        words = self.word_pattern.findall(STRIP_PATTERN.sub('', "\n".join(texts).lower()))
+        kept = [word for word in words if word not in stop]
+        if isinstance(counts, Counter):
+            counts.update(kept)
+        else:
+            for word in kept:
+                counts[word] += 1
+        return counts
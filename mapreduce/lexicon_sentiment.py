@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Polarité des textes par lexique, sans TextBlob ni NLTK.
+
+Le lexique (mot -> polarité, intensité, drapeaux) est celui de l'analyseur
+"pattern" de TextBlob (en-sentiment.xml), extrait une fois pour toutes par
+scripts/build_sentiment_lexicon.py dans un petit fichier binaire chargé en
+quelques millisecondes. Le calcul reprend les règles de TextBlob :
+- seuls les mots connus comptent, la polarité est leur moyenne ;
+- un adverbe connu ("very", "really"...) multiplie la polarité du mot suivant ;
+- une négation ("not", "never"...) inverse et atténue le mot qui suit
+  ("not good" = -0.5 × good) ;
+- "!" renforce le mot précédent, les émoticônes comptent comme des mots et
+  "(!)" (ironie) comme un mot neutre.
+
+La tokenisation est une version simplifiée de celle de TextBlob : les scores
+sont identiques sur l'immense majorité des tweets (voir le rapport
+d'accord du script de construction).
+
+Format du fichier (petit-boutiste) : en-tête "TWLX", version (uint16),
+nombre d'entrées n (uint32) ; n polarités (float64) ; n intensités
+(float64) ; n drapeaux (uint8) ; puis les n mots en UTF-8 séparés par "\\n".
+"""
+
+import os
+import re
+import struct
+
+LEXICON_ENV_VAR = "TWEETS_SENTIMENT_LEXICON"
+# Le fichier accompagne le module (copié à côté des mappeurs sur le cluster)
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sentiment_lexicon.bin")
+
+MAGIC = b"TWLX"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHI")
+
+# Drapeaux des entrées
+MODIFIER = 1   # adverbe : modifie le mot suivant
+EMOTICON = 2   # émoticône (reconnue seulement hors des mots du lexique)
+
+NEGATIONS = frozenset(("no", "not", "n't", "never"))
+PUNCTUATION = ".,;:!?()[]{}`''\"@#$^&*+-|=~_"
+LEADING_PUNCTUATION = tuple(PUNCTUATION.replace(".", ""))
+TRAILING_PUNCTUATION = tuple(PUNCTUATION)
+# Abréviations dont le point final n'est pas détaché (en minuscules)
+ABBREVIATIONS = frozenset((
+    "a.", "a.m.", "adj.", "adv.", "al.", "c.", "cf.", "comp.", "conf.", "def.", "e.g.",
+    "ed.", "esp.", "etc.", "ex.", "f.", "fig.", "gen.", "i.e.", "id.", "int.", "l.", "m.",
+    "med.", "mil.", "mr.", "n.", "n.q.", "orig.", "p.m.", "pl.", "pred.", "pres.", "ref.",
+    "v.", "vs.", "w/",
+))
+ABBREVIATION_PATTERN = re.compile(r"^([a-z]\.)+$")
+QUOTE_PATTERN = re.compile("([“”‘’'\"])")
+PARAGRAPH_PATTERN = re.compile(r"\n{2,}")
+END_OF_SENTENCE = " END-OF-SENTENCE "
+SARCASM_PATTERN = re.compile(r"\( ?\! ?\)")
+
+
+def write_lexicon(path, entries):
+    """Écrit les entrées (mot, polarité, intensité, drapeaux) au format binaire."""
+    entries = list(entries)
+    count = len(entries)
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, count))
+        file.write(struct.pack("<{0}d".format(count), *(entry[1] for entry in entries)))
+        file.write(struct.pack("<{0}d".format(count), *(entry[2] for entry in entries)))
+        file.write(bytes(entry[3] for entry in entries))
+        file.write("\n".join(entry[0] for entry in entries).encode("utf-8"))
+    return count
+
+
+def resolve_lexicon_path(path=None):
+    """Chemin du lexique : argument, variable d'environnement ou fichier du module."""
+    return path or os.environ.get(LEXICON_ENV_VAR) or DEFAULT_LEXICON_PATH
+
+
+def load_lexicon(path=None):
+    """
+    Lit un lexique binaire : ({mot: (polarité, intensité, adverbe)},
+    {émoticône en minuscules: polarité}, émoticônes telles qu'écrites).
+    """
+    path = resolve_lexicon_path(path)
+    with open(path, "rb") as file:
+        data = file.read()
+    magic, version, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("{0} n'est pas un lexique de sentiment (version {1})".format(path, FORMAT_VERSION))
+    offset = HEADER.size
+    polarities = struct.unpack_from("<{0}d".format(count), data, offset)
+    offset += 8 * count
+    intensities = struct.unpack_from("<{0}d".format(count), data, offset)
+    offset += 8 * count
+    flags = data[offset:offset + count]
+    words = data[offset + count:].decode("utf-8").split("\n") if count else []
+
+    lexicon, emoticons, spellings = {}, {}, []
+    for word, polarity, intensity, flag in zip(words, polarities, intensities, flags):
+        if flag & EMOTICON:
+            # Une émoticône présente dans deux groupes garde le premier
+            emoticons.setdefault(word.lower(), polarity)
+            spellings.append(word)
+        else:
+            lexicon[word] = (polarity, intensity, bool(flag & MODIFIER))
+    return lexicon, emoticons, spellings
+
+
+def emoticon_pattern(spellings):
+    """
+    Émoticônes coupées par la tokenisation (": )") : caractères séparés d'une
+    espace au plus, suivis d'une espace ou de la fin du texte.
+    """
+    alternatives = sorted(set(spellings), key=lambda spelling: (-len(spelling), spelling))
+    return re.compile(r"({0})($|\s)".format("|".join(
+        r" ?".join(re.escape(character) for character in spelling) for spelling in alternatives)))
+
+
+def _join_emoticon(match):
+    return match.group(1).replace(" ", "") + match.group(2)
+
+
+def tokenize(text):
+    """Découpe un texte en mots et ponctuation, comme TextBlob (casse conservée)."""
+    # "don't" -> "do n ' t" : l'apostrophe est isolée après la contraction
+    text = QUOTE_PATTERN.sub(r" \1 ", text.replace("n't", " n't"))
+    if "\n" in text:
+        text = PARAGRAPH_PATTERN.sub(END_OF_SENTENCE, text.replace("\r\n", "\n"))
+    tokens = []
+    for token in text.split():
+        if token[0].isalnum() and token[-1].isalnum():
+            tokens.append(token)
+            continue
+        tail = []
+        while token.startswith(LEADING_PUNCTUATION):
+            tokens.append(token[0])
+            token = token[1:]
+        while token.endswith(TRAILING_PUNCTUATION):
+            if token.endswith(LEADING_PUNCTUATION):
+                tail.append(token[-1])
+                token = token[:-1]
+            if token.endswith("..."):
+                tail.append("...")
+                token = token[:-3].rstrip(".")
+            if token.endswith("."):
+                if token in ABBREVIATIONS or ABBREVIATION_PATTERN.match(token):
+                    break
+                tail.append(".")
+                token = token[:-1]
+        if token:
+            tokens.append(token)
+        tokens.extend(reversed(tail))
+    return tokens
+
+
+class LexiconSentiment:
+    """Fonction de polarité (texte -> [-1, 1]) fondée sur un lexique binaire."""
+
+    def __init__(self, path=None):
+        self.lexicon, self.emoticons, spellings = load_lexicon(path)
+        self.emoticon_pattern = emoticon_pattern(spellings)
+
+    def words(self, text):
+        """Mots en minuscules, émoticônes et marques d'ironie "(!)" recollées."""
+        text = " ".join(tokenize(text))
+        if "!" in text:
+            text = SARCASM_PATTERN.sub("(!)", text)
+        return self.emoticon_pattern.sub(_join_emoticon, text).lower().split()
+
+    def assessments(self, text):
+        """Mots évalués : listes [polarité, intensité, négation (-1) ou non (1)]."""
+        lexicon, emoticons = self.lexicon, self.emoticons
+        scored = []
+        modifier = None  # adverbe connu précédent ("very good")
+        negation = None  # négation précédente ("not good")
+        for word in self.words(text):
+            entry = lexicon.get(word)
+            if entry is not None:
+                polarity, intensity, is_modifier = entry
+                if modifier is None:
+                    scored.append([polarity, intensity, 1])
+                else:
+                    last = scored[-1]
+                    last[0] = max(-1.0, min(polarity * last[1], 1.0))
+                    last[1] = intensity
+                if negation is not None:
+                    scored[-1][1] = 1.0 / scored[-1][1]
+                    scored[-1][2] = -1
+                modifier = word if is_modifier else None
+                negation = word if word in NEGATIONS else None
+                continue
+            # Mot inconnu : négation, ou petit mot qui ne l'interrompt pas ("not a good")
+            if word in NEGATIONS:
+                negation = word
+            elif negation is not None and len(word.strip("'")) > 1:
+                negation = None
+            # Négation précédée d'un adverbe en -ly ("really not good")
+            if negation is not None and modifier is not None and modifier.endswith("ly"):
+                scored[-1][2] = -1
+                negation = None
+            elif modifier is not None and len(word) > 2:
+                modifier = None
+            if word == "!" and scored:
+                scored[-1][0] = max(-1.0, min(scored[-1][0] * 1.25, 1.0))
+            if word == "(!)":
+                scored.append([0.0, 1.0, 1])
+            if not word.isalpha() and len(word) <= 5 and word not in PUNCTUATION:
+                polarity = emoticons.get(word)
+                if polarity is not None:
+                    scored.append([polarity, 1.0, 1])
+        return scored
+
+    def __call__(self, text):
+        scored = self.assessments(text)
+        if not scored:
+            return 0.0
+        # "not good" = légèrement négatif, "not bad" = légèrement positif
+        return sum(polarity * -0.5 if negated < 0 else polarity
+                   for polarity, _, negated in scored) / len(scored)
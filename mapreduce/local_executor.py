@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Outils d'exécution parallèle pour les simulations MapReduce locales.
+
+- découpage de l'entrée en blocs (splits),
+- phase Map sur un ProcessPoolExecutor,
+- partitionnement des clés par hachage entre N réducteurs (paires ou
+  colonnes, ces dernières pour le backend NumPy),
+- mesure du temps passé dans chaque phase.
+"""
+
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import compress, islice
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def add_parallel_arguments(parser):
+    """Ajoute les options --workers et --chunk-size à un ArgumentParser."""
+    parser.add_argument("--workers", type=int, default=1,
+                        help="nombre de processus pour les phases Map et Reduce (1 = séquentiel)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="nombre de tweets par bloc envoyé à un processus")
+    return parser
+
+
+def chunked(iterable, size):
+    """Découpe un itérable en listes de `size` éléments au plus."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def partition_for(key, num_partitions):
+    """
+    Numéro de réducteur d'une clé. crc32 est stable d'un processus à l'autre,
+    contrairement à hash() dont la graine change à chaque lancement.
+    """
+    return zlib.crc32(str(key).encode("utf-8")) % num_partitions
+
+
+def partition_pairs(mapped_chunks, num_partitions, key=lambda pair: pair[0]):
+    """
+    Répartit les paires (clé, valeur) émises par chaque bloc entre les réducteurs.
+    L'ordre d'émission est conservé dans chaque partition.
+    """
+    partitions = [[] for _ in range(num_partitions)]
+    for pairs in mapped_chunks:
+        for pair in pairs:
+            partitions[partition_for(key(pair), num_partitions)].append(pair)
+    return partitions
+
+
+def partition_columns(mapped_chunks, num_partitions, key_columns=1, width=2):
+    """
+    Répartit entre les réducteurs les lignes de blocs émis en colonnes (tuples
+    de `width` listes alignées). La clé d'une ligne est sa première colonne, ou
+    le tuple des `key_columns` premières : même répartition que partition_pairs
+    sur les paires correspondantes. L'ordre des lignes est conservé.
+    """
+    partitions = [tuple([] for _ in range(width)) for _ in range(num_partitions)]
+    # Peu de clés distinctes par rapport au nombre de lignes : un crc32 par clé
+    assigned = {}
+    for columns in mapped_chunks:
+        keys = columns[0] if key_columns == 1 else zip(*columns[:key_columns])
+        targets = []
+        for key in keys:
+            target = assigned.get(key)
+            if target is None:
+                target = assigned[key] = partition_for(key, num_partitions)
+            targets.append(target)
+        for number, partition in enumerate(partitions):
+            selected = [target == number for target in targets]
+            for column, values in zip(partition, columns):
+                column.extend(compress(values, selected))
+    return partitions
+
+
+def parallel_imap(func, items, workers, initializer=None, initargs=(), window=None):
+    """
+    Applique `func` à chaque élément dans un pool de processus et renvoie les
+    résultats au fil de l'eau, dans l'ordre. Contrairement à `pool.map`, qui
+    soumet d'emblée tous les éléments, au plus `window` tâches (2 × workers
+    par défaut) sont en cours : l'entrée (ex. blocs d'un TweetReader) est lue
+    au rythme du traitement et la mémoire reste bornée.
+    """
+    window = window or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                             initargs=initargs) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def parallel_map(func, items, workers, initializer=None, initargs=()):
+    """Applique `func` à chaque élément dans un pool de processus (ordre conservé, entrée lue en flux)."""
+    return list(parallel_imap(func, items, workers, initializer, initargs))
+
+
+@contextmanager
+def timed(timings, phase):
+    """Ajoute à timings[phase] la durée (en secondes) du bloc exécuté."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+
+def print_timings(timings):
+    """Affiche le temps passé dans chaque phase."""
+    print("\nTemps par phase :")
+    for phase, seconds in timings.items():
+        print(f"  {phase}: {seconds:.3f} s")
+    print(f"  total: {sum(timings.values()):.3f} s")
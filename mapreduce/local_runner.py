@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Exécution locale des vrais mappeurs, combineurs et réducteurs Hadoop Streaming.
+
+Contrairement aux simulations, qui réimplémentent la logique, ce module
+exécute le code qui tourne sur le cluster :
+- l'entrée est découpée en blocs de tweets (un bloc = une tâche Map) ; un
+  fichier compressé par blocs (block_compression.py) est découpé en splits
+  que chaque tâche décompresse et décode elle-même ;
+- chaque tâche appelle `process_tweet` puis `flush` du mappeur dans un
+  processus du pool, la sortie standard étant capturée ;
+- la sortie de chaque tâche est triée, passée au combineur, répartie entre
+  les réducteurs par hachage du premier champ et écrite sur disque ;
+- chaque réducteur fusionne ses fichiers triés (heapq.merge) et reçoit les
+  lignes dans l'ordre, comme après le tri de Hadoop.
+
+Seule la sortie d'une tâche Map est triée en mémoire : le volume total de
+données intermédiaires peut dépasser la mémoire disponible.
+
+    python mapreduce/local_runner.py hashtags --workers 4
+    python mapreduce/local_runner.py sentiment --output sentiment.txt
+"""
+
+import argparse
+import heapq
+import importlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import ExitStack, redirect_stdout
+
+from block_compression import InputSplit, block_splits, has_index, split_reader
+from lexicon_sentiment import LEXICON_ENV_VAR
+from local_executor import (add_parallel_arguments, chunked, parallel_map,
+                            partition_for, print_timings, timed)
+from sentiment_scorer import SCORER_ENV_VAR, SCORERS
+from sketches import SKETCHES_ENV_VAR
+from tweet_store import open_tweets
+
+# Tâches disponibles : modules exécutés et champs lus depuis un stockage Parquet
+JOBS = {
+    "hashtags": {
+        "mapper": "hashtag_mapper",
+        "combiner": "hashtag_combiner",
+        "reducer": ("hashtag_reducer", "reduce_hashtags"),
+        "fields": ["timestamp", "hashtags"],
+    },
+    "sentiment": {
+        "mapper": "geo_sentiment_mapper",
+        "combiner": "geo_sentiment_combiner",
+        "reducer": ("geo_sentiment_reducer", "process_cities"),
+        "fields": ["tweet_text", "location"],
+        # Champs lus en plus en mode résumé (utilisateurs distincts par ville)
+        "sketch_fields": ["user_id"],
+    },
+}
+
+# Nombre maximal de fichiers fusionnés en une passe
+MERGE_FAN_IN = 64
+
+# État d'un processus de la phase Map (initialisé par _init_worker)
+_mapper = None
+_combiner = None
+_spill_dir = None
+_num_reducers = 1
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def capture_output(func, *args):
+    """Exécute `func` en capturant sa sortie standard ; renvoie les lignes émises."""
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        func(*args)
+    return buffer.getvalue().splitlines(keepends=True)
+
+
+def _init_worker(mapper_name, combiner_name, spill_dir, num_reducers):
+    global _mapper, _combiner, _spill_dir, _num_reducers
+    _mapper = importlib.import_module(mapper_name)
+    _combiner = importlib.import_module(combiner_name) if combiner_name else None
+    _spill_dir = spill_dir
+    _num_reducers = num_reducers
+
+
+def _map_tweets(tweets):
+    failed = 0
+    for tweet in tweets:
+        try:
+            _mapper.process_tweet(tweet)
+        except Exception:
+            failed += 1
+    # Fin de la tâche : le mappeur émet ce qu'il a cumulé en mémoire
+    _mapper.flush()
+    return failed
+
+
+def run_map_task(task):
+    """
+    Tâche Map : mappeur, tri, combineur, puis écriture d'un fichier trié par réducteur.
+    Renvoie (fichiers, tweets traités, tweets en erreur, lignes émises).
+    """
+    index, tweets = task
+    if isinstance(tweets, InputSplit):
+        tweets = list(split_reader(tweets))
+    failed = []
+    lines = capture_output(lambda: failed.append(_map_tweets(tweets)))
+    lines.sort()
+    if _combiner is not None:
+        # L'entrée triée donne une sortie du combineur triée elle aussi
+        lines = capture_output(_combiner.combine, lines)
+
+    partitions = [[] for _ in range(_num_reducers)]
+    for line in lines:
+        partitions[partition_for(line.split('\t', 1)[0], _num_reducers)].append(line)
+
+    paths = []
+    for partition, partition_lines in enumerate(partitions):
+        path = os.path.join(_spill_dir, f"map-{index:05d}-r{partition:03d}.txt")
+        with open(path, "w", encoding="utf-8") as file:
+            file.writelines(partition_lines)
+        paths.append(path)
+    return paths, len(tweets), failed[0], len(lines)
+
+
+def merge_files(paths, spill_dir, fan_in=MERGE_FAN_IN):
+    """
+    Réduit la liste de fichiers triés à `fan_in` fichiers au plus, en
+    fusionnant les fichiers par groupes. Renvoie les chemins restants.
+    """
+    level = 0
+    while len(paths) > fan_in:
+        merged = []
+        for group_index, group in enumerate(chunked(paths, fan_in)):
+            path = os.path.join(spill_dir, f"merge-{level}-{group_index:05d}-{os.getpid()}.txt")
+            with ExitStack() as stack, open(path, "w", encoding="utf-8") as output:
+                files = [stack.enter_context(open(p, "r", encoding="utf-8")) for p in group]
+                output.writelines(heapq.merge(*files))
+            merged.append(path)
+        paths = merged
+        level += 1
+    return paths
+
+
+def run_reduce_task(task):
+    """Tâche Reduce : fusion des fichiers triés de la partition et appel du réducteur."""
+    (module_name, function_name), options, paths, spill_dir, output_path = task
+    reducer = getattr(importlib.import_module(module_name), function_name)
+    paths = merge_files(paths, spill_dir)
+    with ExitStack() as stack:
+        files = [stack.enter_context(open(path, "r", encoding="utf-8")) for path in paths]
+        output = stack.enter_context(open(output_path, "w", encoding="utf-8"))
+        with redirect_stdout(output):
+            reducer(heapq.merge(*files), **options)
+    return output_path
+
+
+def run_job(job, tweets, workers=1, chunk_size=500, reducers=1, reducer_options=None,
+            output=None, timings=None, splits=None):
+    """
+    Exécute une tâche de JOBS sur les tweets (ou sur les `splits` d'un fichier
+    compressé par blocs, une tâche Map par split) et écrit la sortie des
+    réducteurs (concaténée dans l'ordre des partitions) dans `output` (sortie
+    standard par défaut).
+    """
+    spec = JOBS[job]
+    timings = {} if timings is None else timings
+    spill_dir = tempfile.mkdtemp(prefix=f"mapreduce-{job}-")
+    try:
+        initargs = (spec["mapper"], spec.get("combiner"), spill_dir, reducers)
+        tasks = enumerate(splits if splits is not None else chunked(tweets, chunk_size))
+
+        log(f"Phase Map : {spec['mapper']} ({workers} processus)...")
+        with timed(timings, "map"):
+            if workers > 1:
+                results = parallel_map(run_map_task, tasks, workers, _init_worker, initargs)
+            else:
+                _init_worker(*initargs)
+                results = [run_map_task(task) for task in tasks]
+        log(f"Tâches Map : {len(results)}, tweets : {sum(r[1] for r in results)}, "
+            f"en erreur : {sum(r[2] for r in results)}, lignes émises : {sum(r[3] for r in results)}")
+
+        log(f"Phases Shuffle & Reduce : {spec['reducer'][0]} ({reducers} réducteurs)...")
+        with timed(timings, "shuffle+reduce"):
+            reduce_tasks = [(spec["reducer"], reducer_options or {},
+                             [paths[partition] for paths, _, _, _ in results],
+                             spill_dir, os.path.join(spill_dir, f"part-{partition:05d}"))
+                            for partition in range(reducers)]
+            if reducers > 1:
+                outputs = parallel_map(run_reduce_task, reduce_tasks, min(workers, reducers) or 1)
+            else:
+                outputs = [run_reduce_task(task) for task in reduce_tasks]
+
+        with ExitStack() as stack:
+            target = sys.stdout if output is None else stack.enter_context(
+                open(output, "w", encoding="utf-8"))
+            for path in outputs:
+                with open(path, "r", encoding="utf-8") as part:
+                    shutil.copyfileobj(part, target)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Exécute localement les mappeurs et réducteurs Hadoop Streaming")
+    parser.add_argument("job", choices=sorted(JOBS), help="analyse à exécuter")
+    parser.add_argument("--input", help="fichier JSON/JSONL/gzip ou dossier Parquet "
+                                        "(par défaut : data/tweets_with_locations.json)")
+    parser.add_argument("--output", help="fichier de sortie (sortie standard par défaut)")
+    parser.add_argument("--reducers", type=int, default=1,
+                        help="nombre de réducteurs (partitionnement sur le premier champ)")
+    parser.add_argument("--approximate", action="store_true",
+                        help="hashtags : résumé Space-Saving dans le réducteur")
+    parser.add_argument("--capacity", type=int, help="hashtags : capacité du résumé approximatif")
+    parser.add_argument("--scorer", choices=SCORERS,
+                        help="sentiment : TextBlob ou lexique binaire rapide (variable {0})".format(SCORER_ENV_VAR))
+    parser.add_argument("--lexicon", help="sentiment : fichier du lexique binaire")
+    parser.add_argument("--split-size", type=int, default=None,
+                        help="fichier compressé par blocs : octets décompressés par tâche Map "
+                             "(défaut : un bloc par tâche)")
+    parser.add_argument("--sketches", action="store_true",
+                        help="les mappeurs émettent des résumés fusionnables (variable {0}) : "
+                             "quantiles et utilisateurs distincts par ville, Count-Min des hashtags".format(SKETCHES_ENV_VAR))
+    parser.add_argument("--sketch-output", action="store_true",
+                        help="les réducteurs écrivent les résumés fusionnés (sketches.py rollup)")
+    args = add_parallel_arguments(parser).parse_args(argv)
+
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    data_path = args.input or os.path.join(project_dir, "data", "tweets_with_locations.json")
+    splits = None
+    if has_index(data_path):
+        # Chaque tâche Map lit son split : la décompression est parallèle elle aussi
+        splits = block_splits(data_path, args.split_size)
+        tweets = None
+    else:
+        fields = JOBS[args.job]["fields"]
+        if args.sketches:
+            fields = fields + JOBS[args.job].get("sketch_fields", [])
+        tweets = open_tweets(data_path, fields=fields)
+
+    # Les mappeurs lisent leur configuration dans l'environnement, hérité par le pool
+    if args.scorer:
+        os.environ[SCORER_ENV_VAR] = args.scorer
+    if args.lexicon:
+        os.environ[LEXICON_ENV_VAR] = os.path.abspath(args.lexicon)
+    if args.sketches:
+        os.environ[SKETCHES_ENV_VAR] = "1"
+
+    reducer_options = {}
+    if args.job == "hashtags" and args.approximate:
+        reducer_options["approximate"] = True
+        if args.capacity:
+            reducer_options["capacity"] = args.capacity
+    if args.sketch_output:
+        reducer_options["sketch_output"] = True
+
+    timings = run_job(args.job, tweets, args.workers, args.chunk_size, args.reducers,
+                      reducer_options, args.output, splits=splits)
+    with redirect_stdout(sys.stderr):
+        print_timings(timings)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,83 @@
 #!/usr/bin/env python3
 
-import json
+import argparse
+import os
 import sys
 from collections import defaultdict
-from operator import itemgetter
+from functools import partial
 
-def map_phase(tweets):
+from keywords import normalize_hashtag
+from local_executor import (add_parallel_arguments, parallel_map, partition_columns, partition_pairs,
+                            print_timings)
+from time_buckets import TimeBucketer, add_time_arguments
+from metrics import Metrics, add_metrics_arguments, profiled
+from topk import top_k
+from tweet_record import RecordReader, TweetBatch, iter_records, record_batches
+from vectorized_backend import hashtag_top_by_month_columns
+
+TOP_N = 10
+
+def top_hashtags_key(item):
+    """Tri par nombre décroissant puis par hashtag (comme le réducteur Hadoop, qui reçoit les clés triées)."""
+    return (-item[1], item[0])
+
+def map_phase(tweets, bucketer=None):
     """Phase Map : extrait les hashtags des tweets."""
-    result = []
-    for tweet in tweets:
-        timestamp = tweet.get("timestamp", "")
+    months, hashtags = map_phase_columns(tweets, bucketer)
+    # Émettre ((mois, hashtag), 1)
+    return [((month, hashtag), 1) for month, hashtag in zip(months, hashtags)]
+
+def map_phase_columns(tweets, bucketer=None):
+    """
+    Phase Map en colonnes : deux listes alignées (mois, hashtag), une ligne par
+    occurrence. C'est l'entrée du backend vectorisé. `tweets` est un
+    TweetBatch (lot envoyé à un processus) ou un itérable de tweets.
+    """
+    bucketer = bucketer or TimeBucketer("month")
+    if isinstance(tweets, TweetBatch):
+        return map_batch_columns(tweets, bucketer)
+    months, hashtags = [], []
+    for record in iter_records(tweets):
+        timestamp = record.timestamp
         if not timestamp:
             continue
             
-        # Format : YYYY-MM
-        month = timestamp[:7]
+        # Format : YYYY-MM (même découpage que hashtag_mapper.py)
+        try:
+            month = bucketer.key(timestamp)
+        except ValueError:
+            continue
         
-        hashtags = tweet.get("hashtags", [])
-        for hashtag in hashtags:
+        for hashtag in record.hashtags or ():
             # Normaliser les hashtags
-            hashtag = hashtag.lower().strip()
-            if hashtag.startswith('#'):
-                hashtag = hashtag[1:]
+            hashtag = normalize_hashtag(hashtag)
             if hashtag:
-                # Émettre (mois-hashtag, 1)
-                result.append((f"{month}-{hashtag}", 1))
+                months.append(month)
+                hashtags.append(hashtag)
     
-    return result
+    return months, hashtags
+
+def map_batch_columns(batch, bucketer):
+    """
+    Phase Map sur les colonnes d'un TweetBatch : chaque hashtag distinct du lot
+    est normalisé une seule fois, les occurrences sont lues par leurs codes.
+    """
+    normalized = [None] + [normalize_hashtag(hashtag) for hashtag in batch.tags.strings[1:]]
+    offsets, codes = batch.hashtag_offsets, batch.hashtag_codes
+    months, hashtags = [], []
+    for index, timestamp in enumerate(batch.timestamps):
+        if not timestamp:
+            continue
+        try:
+            month = bucketer.key(timestamp)
+        except ValueError:
+            continue
+        for code in codes[offsets[index]:offsets[index + 1]]:
+            hashtag = normalized[code]
+            if hashtag:
+                months.append(month)
+                hashtags.append(hashtag)
+    return months, hashtags
 
 def shuffle_sort_phase(mapped_data):
     """Phase Shuffle & Sort : regroupe les clés identiques."""
@@ -39,8 +90,7 @@ def reduce_phase(shuffled_data):
     """Phase Reduce : compte les occurrences de hashtags par mois."""
     # Regrouper par mois
     months = defaultdict(dict)
-    for key, count in shuffled_data.items():
-        month, hashtag = key.split('-', 1)
+    for (month, hashtag), count in shuffled_data.items():
         if hashtag in months[month]:
             months[month][hashtag] += count
         else:
@@ -49,48 +99,134 @@ def reduce_phase(shuffled_data):
     # Calculer le top 10 pour chaque mois
     result = {}
     for month, hashtags in months.items():
-        top_hashtags = sorted(hashtags.items(), key=itemgetter(1), reverse=True)[:10]
+        top_hashtags = top_k(hashtags, TOP_N, key=top_hashtags_key, reverse=False)
         result[month] = top_hashtags
     
     return result
 
-def main():
+def merge_reduced(partial_results):
+    """
+    Fusionne les tops produits par plusieurs réducteurs. Les partitions portent
+    sur la clé (mois, hashtag) et sont donc disjointes : le top 10 global est
+    le top 10 de l'union des tops partiels.
+    """
+    months = defaultdict(list)
+    for partial in partial_results:
+        for month, top_hashtags in partial.items():
+            months[month].extend(top_hashtags)
+    return {month: top_k(candidates, TOP_N, key=top_hashtags_key, reverse=False)
+            for month, candidates in months.items()}
+
+def shuffle_reduce(mapped_data):
+    """Phases Shuffle & Reduce d'un réducteur, sur des paires."""
+    return reduce_phase(shuffle_sort_phase(mapped_data))
+
+def shuffle_reduce_columns(columns):
+    """Phases Shuffle & Reduce vectorisées (NumPy) d'un réducteur, sur les colonnes (mois, hashtag)."""
+    months, hashtags = columns
+    return hashtag_top_by_month_columns(months, hashtags, TOP_N, top_hashtags_key)
+
+def run_serial(tweets, metrics, backend="python", bucketer=None):
+    """Enchaîne les trois phases dans le processus courant."""
+    print("\nPhase Map : extraction des hashtags...")
+    if backend == "numpy":
+        # Map en colonnes, puis regroupement vectorisé sur des codes entiers
+        with metrics.phase("map"):
+            months, hashtags = map_phase_columns(tweets, bucketer)
+        print(f"Nombre de tweets lus : {tweets.count}")
+        metrics.set("pairs_out", len(months))
+        print(f"Paires (clé, valeur) émises : {metrics.counters['pairs_out']}")
+        
+        print("\nPhases Shuffle & Reduce vectorisées (NumPy)...")
+        with metrics.phase("shuffle+reduce"):
+            return hashtag_top_by_month_columns(months, hashtags, TOP_N, top_hashtags_key)
+    
+    with metrics.phase("map"):
+        mapped_data = map_phase(tweets, bucketer)
+    print(f"Nombre de tweets lus : {tweets.count}")
+    metrics.set("pairs_out", len(mapped_data))
+    print(f"Paires (clé, valeur) émises : {metrics.counters['pairs_out']}")
+    
+    print("\nPhase Shuffle & Sort : regroupement par clé...")
+    with metrics.phase("shuffle"):
+        shuffled_data = shuffle_sort_phase(mapped_data)
+    print(f"Clés uniques après regroupement : {len(shuffled_data)}")
+    
+    print("\nPhase Reduce : comptage des hashtags par mois...")
+    with metrics.phase("reduce"):
+        return reduce_phase(shuffled_data)
+
+def run_parallel(tweets, workers, chunk_size, metrics, backend="python", bucketer=None):
+    """
+    Map par blocs dans un pool de processus (chaque bloc est envoyé sous forme
+    de TweetBatch en colonnes), puis `workers` réducteurs. Avec le backend
+    NumPy, les processus Map émettent des colonnes (mois, hashtag), réparties
+    telles quelles et regroupées par hashtag_top_by_month_columns.
+    """
+    columns = backend == "numpy"
+    mapper = map_phase_columns if columns else map_phase
+    print(f"\nPhase Map : extraction des hashtags ({workers} processus)...")
+    with metrics.phase("map"):
+        mapped_chunks = parallel_map(partial(mapper, bucketer=bucketer), record_batches(tweets, chunk_size), workers)
+    print(f"Nombre de tweets lus : {tweets.count}")
+    metrics.set("pairs_out", sum(len(chunk[0] if columns else chunk) for chunk in mapped_chunks))
+    print(f"Paires (clé, valeur) émises : {metrics.counters['pairs_out']}")
+    
+    print(f"\nPhase Shuffle & Sort : partitionnement entre {workers} réducteurs...")
+    with metrics.phase("shuffle"):
+        if columns:
+            partitions = partition_columns(mapped_chunks, workers, key_columns=2)
+        else:
+            partitions = partition_pairs(mapped_chunks, workers)
+    print(f"Paires par réducteur : {[len(partition[0] if columns else partition) for partition in partitions]}")
+    
+    # Chaque réducteur regroupe puis réduit sa partition
+    print("\nPhase Reduce : comptage des hashtags par mois...")
+    with metrics.phase("reduce"):
+        reducer = shuffle_reduce_columns if columns else shuffle_reduce
+        return merge_reduced(parallel_map(reducer, partitions, workers))
+
+def main(argv=None):
     """Exécute le processus MapReduce complet."""
+    parser = argparse.ArgumentParser(description="Simulation MapReduce de l'analyse des hashtags")
+    parser.add_argument("--input", help="fichier JSON/JSONL/gzip ou dossier Parquet (par défaut : data/tweets_with_locations.json)")
+    parser.add_argument("--backend", choices=["python", "numpy"], default="python",
+                        help="implémentation des phases Shuffle & Reduce")
+    add_time_arguments(parser)
+    add_metrics_arguments(parser)
+    args = add_parallel_arguments(parser).parse_args(argv)
+    
     print("Simulation de MapReduce pour l'analyse des hashtags")
     print("==================================================")
     
     # Charger les tweets
     print("Chargement des tweets...")
-    import os
     script_dir = os.path.dirname(os.path.abspath(__file__))
     project_dir = os.path.dirname(script_dir)
-    data_path = os.path.join(project_dir, "data", "tweets_with_locations.json")
-    with open(data_path, 'r', encoding='utf-8') as file:
-        tweets = json.load(file)
-    
-    print(f"Nombre de tweets chargés : {len(tweets)}")
+    data_path = args.input or os.path.join(project_dir, "data", "tweets_with_locations.json")
+    # Seules les colonnes utiles sont lues depuis un stockage Parquet
+    tweets = RecordReader(data_path, fields=["timestamp", "hashtags"])
     
-    # Phase Map
-    print("\nPhase Map : extraction des hashtags...")
-    mapped_data = map_phase(tweets)
-    print(f"Paires (clé, valeur) émises : {len(mapped_data)}")
-    
-    # Phase Shuffle & Sort
-    print("\nPhase Shuffle & Sort : regroupement par clé...")
-    shuffled_data = shuffle_sort_phase(mapped_data)
-    print(f"Clés uniques après regroupement : {len(shuffled_data)}")
-    
-    # Phase Reduce
-    print("\nPhase Reduce : comptage des hashtags par mois...")
-    reduced_data = reduce_phase(shuffled_data)
+    metrics = Metrics("hashtag_simulation")
+    bucketer = TimeBucketer("month", args.timezone)
+    with profiled(args.profile):
+        if args.workers > 1:
+            reduced_data = run_parallel(tweets, args.workers, args.chunk_size, metrics, args.backend, bucketer)
+        else:
+            reduced_data = run_serial(tweets, metrics, args.backend, bucketer)
+    metrics.set("tweets_in", tweets.count)
+    metrics.set("malformed", tweets.errors)
     
     # Afficher les résultats
     print("\nRésultats de l'analyse :")
-    for month, top_hashtags in reduced_data.items():
+    for month, top_hashtags in sorted(reduced_data.items()):
         print(f"\nTop 10 hashtags pour {month} :")
         for hashtag, count in top_hashtags:
             print(f"  #{hashtag}: {count}")
     
+    print_timings(metrics.timers)
+    if args.metrics:
+        metrics.write(args.metrics, args.metrics_format)
     print("\nSimulation MapReduce terminée !")
 
 if __name__ == "__main__":
@@ -1,34 +1,51 @@
 #!/usr/bin/env python3
 
-import json
+import argparse
+import os
 import sys
 from collections import defaultdict
-from textblob import TextBlob
+from functools import partial
 
-def map_phase(tweets):
+from local_executor import (add_parallel_arguments, parallel_map, partition_columns, partition_pairs,
+                            print_timings)
+from metrics import Metrics, add_metrics_arguments, profiled
+from sentiment_scorer import SentimentScorer, add_scorer_arguments, create_scorer
+from tweet_record import RecordReader, TweetBatch, iter_records, record_batches
+from vectorized_backend import city_sentiment_totals_columns
+
+# Scoreur propre à chaque processus du pool (créé par _init_worker)
+_worker_scorer = None
+
+def map_phase(tweets, scorer=None):
     """Phase Map : extrait les sentiments des tweets par région."""
-    result = []
-    for tweet in tweets:
-        location = tweet.get("location", {})
-        city = location.get("city", "unknown")
-        
-        if city == "unknown":
+    cities, sentiments = map_phase_columns(tweets, scorer)
+    
+    # Émettre (ville, sentiment)
+    return list(zip(cities, sentiments))
+
+def map_phase_columns(tweets, scorer=None):
+    """
+    Phase Map en colonnes : listes alignées (ville, sentiment), entrée du
+    backend vectorisé. `tweets` est un TweetBatch (lot envoyé à un processus,
+    lu par colonnes) ou un itérable de tweets.
+    """
+    if scorer is None:
+        scorer = SentimentScorer()
+    
+    if isinstance(tweets, TweetBatch):
+        rows = zip(tweets.city_names(), tweets.texts)
+    else:
+        rows = ((record.city, record.text) for record in iter_records(tweets))
+    cities, texts = [], []
+    for city, text in rows:
+        if city is None or city == "unknown":
             continue
             
-        text = tweet.get("tweet_text", "")
-        
-        # Analyse du sentiment avec TextBlob
-        sentiment = 0.0
-        try:
-            blob = TextBlob(text)
-            sentiment = blob.sentiment.polarity
-        except:
-            pass
-        
-        # Émettre (ville, sentiment)
-        result.append((city, sentiment))
+        cities.append(city)
+        texts.append(text or "")
     
-    return result
+    # Analyse du sentiment par lot (textes dédupliqués et mis en cache)
+    return cities, scorer.score_batch(texts)
 
 def shuffle_sort_phase(mapped_data):
     """Phase Shuffle & Sort : regroupe les sentiments par région."""
@@ -37,58 +54,179 @@ def shuffle_sort_phase(mapped_data):
         regions[city].append(sentiment)
     return regions
 
+def summarize_city(sentiment_sum, sentiment_count):
+    """Renvoie (sentiment moyen, label, nombre de tweets) d'une région."""
+    avg_sentiment = sentiment_sum / sentiment_count if sentiment_count else 0
+    
+    # Déterminer le sentiment global
+    sentiment_label = "neutre"
+    if avg_sentiment > 0.1:
+        sentiment_label = "positif"
+    elif avg_sentiment < -0.1:
+        sentiment_label = "négatif"
+    
+    return (avg_sentiment, sentiment_label, sentiment_count)
+
 def reduce_phase(shuffled_data):
     """Phase Reduce : calcule le sentiment moyen par région."""
     result = {}
     for city, sentiments in shuffled_data.items():
-        avg_sentiment = sum(sentiments) / len(sentiments) if sentiments else 0
-        
-        # Déterminer le sentiment global
-        sentiment_label = "neutre"
-        if avg_sentiment > 0.1:
-            sentiment_label = "positif"
-        elif avg_sentiment < -0.1:
-            sentiment_label = "négatif"
-            
-        result[city] = (avg_sentiment, sentiment_label, len(sentiments))
+        result[city] = summarize_city(sum(sentiments), len(sentiments))
     
     return result
 
-def main():
+def shuffle_reduce(mapped_data):
+    """Phases Shuffle & Reduce d'un réducteur, sur des paires."""
+    return reduce_phase(shuffle_sort_phase(mapped_data))
+
+def shuffle_reduce_columns(columns):
+    """Phases Shuffle & Reduce vectorisées (NumPy) d'un réducteur, sur les colonnes (ville, sentiment)."""
+    return summarize_totals(city_sentiment_totals_columns(*columns))
+
+def summarize_totals(totals):
+    """Résultat final à partir de {ville: (somme, nombre)}."""
+    return {city: summarize_city(total, count) for city, (total, count) in totals.items()}
+
+def record_cache(metrics, scorer):
+    """Reporte les compteurs du cache de sentiment dans les métriques."""
+    metrics.set("cache_hits", scorer.hits)
+    metrics.set("cache_disk_hits", scorer.disk_hits)
+    metrics.set("cache_misses", scorer.misses)
+
+def _init_worker(cache_path, scorer_name=None, lexicon_path=None):
+    global _worker_scorer
+    _worker_scorer = create_scorer(scorer_name, cache_path=cache_path, lexicon_path=lexicon_path)
+
+def _map_chunk(chunk, columns=False):
+    """
+    Phase Map sur un bloc (paires, ou colonnes si `columns`) ; renvoie aussi
+    les compteurs du cache pour ce bloc.
+    """
+    hits, disk_hits, misses = _worker_scorer.hits, _worker_scorer.disk_hits, _worker_scorer.misses
+    pairs = (map_phase_columns if columns else map_phase)(chunk, _worker_scorer)
+    return (pairs, _worker_scorer.hits - hits, _worker_scorer.disk_hits - disk_hits,
+            _worker_scorer.misses - misses)
+
+def run_serial(tweets, cache_path, metrics, backend="python", scorer_name=None, lexicon_path=None):
+    """Enchaîne les trois phases dans le processus courant."""
+    print("\nPhase Map : extraction des sentiments...")
+    scorer = create_scorer(scorer_name, cache_path=cache_path, lexicon_path=lexicon_path)
+    if backend == "numpy":
+        # Map en colonnes, puis regroupement vectorisé sur des codes entiers
+        with metrics.phase("map"):
+            cities, sentiments = map_phase_columns(tweets, scorer)
+        print(f"Nombre de tweets lus : {tweets.count}")
+        metrics.set("pairs_out", len(cities))
+        print(f"Paires (clé, valeur) émises : {metrics.counters['pairs_out']}")
+        record_cache(metrics, scorer)
+        print(f"Cache de sentiment : {scorer.describe()}")
+        
+        print("\nPhases Shuffle & Reduce vectorisées (NumPy)...")
+        with metrics.phase("shuffle+reduce"):
+            return summarize_totals(city_sentiment_totals_columns(cities, sentiments))
+    
+    with metrics.phase("map"):
+        mapped_data = map_phase(tweets, scorer)
+    print(f"Nombre de tweets lus : {tweets.count}")
+    metrics.set("pairs_out", len(mapped_data))
+    print(f"Paires (clé, valeur) émises : {metrics.counters['pairs_out']}")
+    record_cache(metrics, scorer)
+    print(f"Cache de sentiment : {scorer.describe()}")
+    
+    print("\nPhase Shuffle & Sort : regroupement par région...")
+    with metrics.phase("shuffle"):
+        shuffled_data = shuffle_sort_phase(mapped_data)
+    print(f"Régions uniques après regroupement : {len(shuffled_data)}")
+    
+    print("\nPhase Reduce : calcul du sentiment moyen par région...")
+    with metrics.phase("reduce"):
+        return reduce_phase(shuffled_data)
+
+def run_parallel(tweets, workers, chunk_size, cache_path, metrics, backend="python",
+                 scorer_name=None, lexicon_path=None):
+    """
+    Map par blocs dans un pool de processus (chaque bloc est envoyé sous forme
+    de TweetBatch en colonnes), puis `workers` réducteurs. Avec le backend
+    NumPy, les processus Map émettent des colonnes (ville, sentiment),
+    réparties telles quelles et regroupées par city_sentiment_totals_columns.
+    """
+    columns = backend == "numpy"
+    print(f"\nPhase Map : extraction des sentiments ({workers} processus)...")
+    with metrics.phase("map"):
+        results = parallel_map(partial(_map_chunk, columns=columns), record_batches(tweets, chunk_size), workers,
+                               initializer=_init_worker,
+                               initargs=(cache_path, scorer_name, lexicon_path))
+    mapped_chunks = [pairs for pairs, _, _, _ in results]
+    stats = SentimentScorer()
+    for _, stats_hits, stats_disk_hits, stats_misses in results:
+        stats.hits += stats_hits
+        stats.disk_hits += stats_disk_hits
+        stats.misses += stats_misses
+    print(f"Nombre de tweets lus : {tweets.count}")
+    metrics.set("pairs_out", sum(len(chunk[0] if columns else chunk) for chunk in mapped_chunks))
+    print(f"Paires (clé, valeur) émises : {metrics.counters['pairs_out']}")
+    record_cache(metrics, stats)
+    print(f"Cache de sentiment : {stats.describe()}")
+    
+    # Les valeurs d'une ville restent dans l'ordre d'émission : les sommes
+    # flottantes sont donc identiques à celles du mode séquentiel
+    print(f"\nPhase Shuffle & Sort : partitionnement entre {workers} réducteurs...")
+    with metrics.phase("shuffle"):
+        if columns:
+            partitions = partition_columns(mapped_chunks, workers)
+        else:
+            partitions = partition_pairs(mapped_chunks, workers)
+    print(f"Paires par réducteur : {[len(partition[0] if columns else partition) for partition in partitions]}")
+    
+    # Chaque réducteur regroupe puis réduit sa partition (régions disjointes)
+    print("\nPhase Reduce : calcul du sentiment moyen par région...")
+    with metrics.phase("reduce"):
+        reduced_data = {}
+        reducer = shuffle_reduce_columns if columns else shuffle_reduce
+        for partial_result in parallel_map(reducer, partitions, workers):
+            reduced_data.update(partial_result)
+        return reduced_data
+
+def main(argv=None):
     """Exécute le processus MapReduce complet pour l'analyse des sentiments par région."""
+    parser = argparse.ArgumentParser(description="Simulation MapReduce de l'analyse des sentiments par région")
+    parser.add_argument("--input", help="fichier JSON/JSONL/gzip ou dossier Parquet (par défaut : data/tweets_with_locations.json)")
+    parser.add_argument("--backend", choices=["python", "numpy"], default="python",
+                        help="implémentation des phases Shuffle & Reduce")
+    add_scorer_arguments(parser)
+    add_metrics_arguments(parser)
+    args = add_parallel_arguments(parser).parse_args(argv)
+    
     print("Simulation de MapReduce pour l'analyse des sentiments par région")
     print("==============================================================")
     
     # Charger les tweets
     print("Chargement des tweets...")
-    import os
     script_dir = os.path.dirname(os.path.abspath(__file__))
     project_dir = os.path.dirname(script_dir)
-    data_path = os.path.join(project_dir, "data", "tweets_with_locations.json")
-    with open(data_path, 'r', encoding='utf-8') as file:
-        tweets = json.load(file)
-    
-    print(f"Nombre de tweets chargés : {len(tweets)}")
-    
-    # Phase Map
-    print("\nPhase Map : extraction des sentiments...")
-    mapped_data = map_phase(tweets)
-    print(f"Paires (clé, valeur) émises : {len(mapped_data)}")
+    data_path = args.input or os.path.join(project_dir, "data", "tweets_with_locations.json")
+    cache_path = os.path.join(project_dir, ".cache", "sentiment.sqlite3")
+    # Seules les colonnes utiles sont lues depuis un stockage Parquet
+    tweets = RecordReader(data_path, fields=["tweet_text", "location"])
     
-    # Phase Shuffle & Sort
-    print("\nPhase Shuffle & Sort : regroupement par région...")
-    shuffled_data = shuffle_sort_phase(mapped_data)
-    print(f"Régions uniques après regroupement : {len(shuffled_data)}")
-    
-    # Phase Reduce
-    print("\nPhase Reduce : calcul du sentiment moyen par région...")
-    reduced_data = reduce_phase(shuffled_data)
+    metrics = Metrics("sentiment_simulation")
+    with profiled(args.profile):
+        if args.workers > 1:
+            reduced_data = run_parallel(tweets, args.workers, args.chunk_size, cache_path, metrics,
+                                        args.backend, args.scorer, args.lexicon)
+        else:
+            reduced_data = run_serial(tweets, cache_path, metrics, args.backend, args.scorer, args.lexicon)
+    metrics.set("tweets_in", tweets.count)
+    metrics.set("malformed", tweets.errors)
     
     # Afficher les résultats
     print("\nRésultats de l'analyse :")
     for city, (sentiment, label, count) in sorted(reduced_data.items()):
         print(f"{city}: {sentiment:.4f} ({label}) - {count} tweets")
     
+    print_timings(metrics.timers)
+    if args.metrics:
+        metrics.write(args.metrics, args.metrics_format)
     print("\nSimulation MapReduce terminée !")
 
 if __name__ == "__main__":
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Instrumentation légère : chronomètres et pic de mémoire par phase, compteurs
+(tweets lus et émis, enregistrements mal formés, succès du cache...).
+
+Deux modes de sortie :
+- Hadoop Streaming : les compteurs sont écrits sur la sortie d'erreur sous la
+  forme "reporter:counter:<groupe>,<compteur>,<valeur>", que Hadoop agrège et
+  affiche avec les compteurs du job ;
+- local : résumé JSON ou texte Prometheus, dans un fichier ou sur la sortie
+  d'erreur.
+
+Le pic de mémoire est le maximum de mémoire résidente atteint par le
+processus à la fin de chaque phase (module resource, absent sous Windows).
+En option, une phase peut être profilée avec cProfile (fichier .prof lisible
+avec pstats ou snakeviz).
+"""
+
+import cProfile
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Fichier de métriques des mappeurs et réducteurs exécutés hors Hadoop
+METRICS_ENV_VAR = "TWEETS_METRICS_FILE"
+# Variables définies par Hadoop Streaming dans l'environnement des tâches
+HADOOP_TASK_ENV_VARS = ("mapreduce_task_id", "mapred_task_id")
+
+
+def peak_rss_mb(who="self"):
+    """Pic de mémoire résidente du processus (ou de ses fils terminés), en Mo."""
+    if resource is None:
+        return None
+    usage = resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN
+    peak = resource.getrusage(usage).ru_maxrss
+    # Octets sous macOS, kilo-octets sous Linux
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def in_hadoop_streaming():
+    return any(name in os.environ for name in HADOOP_TASK_ENV_VARS)
+
+
+class Metrics:
+    """
+    Compteurs, durées et pics de mémoire d'un job.
+
+        metrics = Metrics("hashtags")
+        with metrics.phase("map"):
+            ...
+        metrics.incr("tweets_in", 1000)
+        metrics.write("metrics.json")
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.counters = {}
+        self.timers = {}
+        self.peaks = {}
+        self.start = time.time()
+        self._reported = {}
+
+    def incr(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name, value):
+        self.counters[name] = value
+
+    def malformed(self, error, prefix="Error"):
+        """
+        Compte une ligne d'entrée mal formée (compteur malformed_lines) ; seule
+        la première est journalisée, le total l'est par finish_task.
+        """
+        if not self.counters.get("malformed_lines"):
+            sys.stderr.write("{0}: {1}\n".format(prefix, error))
+        self.incr("malformed_lines")
+
+    @contextmanager
+    def phase(self, name):
+        """Ajoute la durée du bloc à timers[name] et relève le pic de mémoire."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] = self.timers.get(name, 0.0) + time.perf_counter() - start
+            self.peaks[name] = peak_rss_mb()
+
+    def summary(self):
+        return {
+            "job": self.job,
+            "start": self.start,
+            "counters": dict(self.counters),
+            "timers_seconds": {name: round(seconds, 6) for name, seconds in self.timers.items()},
+            "peak_rss_mb": {name: None if peak is None else round(peak, 1)
+                            for name, peak in self.peaks.items()},
+            "peak_rss_mb_total": peak_rss_mb(),
+            "peak_rss_mb_children": peak_rss_mb("children"),
+        }
+
+    def to_json(self):
+        return json.dumps(self.summary(), indent=2, ensure_ascii=False)
+
+    def to_prometheus(self, prefix="tweets"):
+        """Format texte d'exposition Prometheus."""
+        label = 'job="{0}"'.format(self.job)
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            metric = "{0}_{1}_total".format(prefix, name)
+            lines.append("# TYPE {0} counter".format(metric))
+            lines.append("{0}{{{1}}} {2}".format(metric, label, value))
+        if self.timers:
+            metric = "{0}_phase_seconds".format(prefix)
+            lines.append("# TYPE {0} gauge".format(metric))
+            for name, seconds in self.timers.items():
+                lines.append('{0}{{{1},phase="{2}"}} {3:.6f}'.format(metric, label, name, seconds))
+        peaks = [(name, peak) for name, peak in self.peaks.items() if peak is not None]
+        if peaks:
+            metric = "{0}_phase_peak_rss_bytes".format(prefix)
+            lines.append("# TYPE {0} gauge".format(metric))
+            for name, peak in peaks:
+                lines.append('{0}{{{1},phase="{2}"}} {3:.0f}'.format(metric, label, name, peak * 1024 * 1024))
+        return "\n".join(lines) + "\n"
+
+    def report_counters(self, group=None, stream=None):
+        """
+        Écrit les compteurs au format Hadoop Streaming ("reporter:counter:...").
+        Seuls les incréments depuis l'appel précédent sont envoyés : la fonction
+        peut être appelée périodiquement pendant une longue tâche.
+        """
+        stream = stream or sys.stderr
+        group = group or self.job
+        for name, value in self.counters.items():
+            delta = value - self._reported.get(name, 0)
+            if delta:
+                stream.write("reporter:counter:{0},{1},{2}\n".format(group, name, delta))
+                self._reported[name] = value
+        stream.flush()
+
+    def write(self, path=None, output_format=None):
+        """
+        Écrit le résumé dans `path` (sortie d'erreur si "-") : JSON, ou texte
+        Prometheus si output_format vaut "prometheus" ou si le fichier finit par .prom.
+        """
+        if output_format is None:
+            output_format = "prometheus" if path and path.endswith(".prom") else "json"
+        text = self.to_prometheus() if output_format == "prometheus" else self.to_json() + "\n"
+        if not path or path == "-":
+            sys.stderr.write(text)
+            return
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+
+    def finish_task(self):
+        """
+        Fin d'une tâche de streaming (mappeur, combineur, réducteur) : compteurs
+        Hadoop si la tâche tourne sous Hadoop, fichier $TWEETS_METRICS_FILE sinon,
+        et nombre de lignes mal formées ignorées (au-delà de la première).
+        """
+        malformed = self.counters.get("malformed_lines", 0)
+        if malformed > 1:
+            sys.stderr.write("Lignes mal formées ignorées : {0}\n".format(malformed))
+        if in_hadoop_streaming():
+            self.report_counters()
+        elif os.environ.get(METRICS_ENV_VAR):
+            self.write(os.environ[METRICS_ENV_VAR])
+
+
+@contextmanager
+def profiled(path=None):
+    """Profile le bloc avec cProfile et enregistre les statistiques dans `path` (rien si None)."""
+    if not path:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        sys.stderr.write("Profil cProfile enregistré dans {0}\n".format(path))
+
+
+def add_metrics_arguments(parser):
+    """Ajoute --metrics, --metrics-format et --profile à un ArgumentParser."""
+    parser.add_argument("--metrics", default=None,
+                        help="fichier du résumé des métriques (- : sortie d'erreur)")
+    parser.add_argument("--metrics-format", choices=["json", "prometheus"], default=None,
+                        help="format du résumé (par défaut : selon l'extension, .prom = Prometheus)")
+    parser.add_argument("--profile", default=None,
+                        help="fichier .prof des statistiques cProfile de l'exécution")
+    return parser
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Service de calcul du sentiment avec mémoïsation.
+
+Les textes des tweets se répètent beaucoup (modèles du type
+"How #X is revolutionizing..."). Le service :
+- normalise le texte (espaces),
+- déduplique les textes d'un même lot,
+- garde un cache LRU borné en mémoire,
+- persiste les scores dans un cache sqlite (clé : hash du texte + version du scoreur),
+- ne calcule que les textes absents des deux caches.
+
+Deux fonctions de polarité (option --scorer) :
+- "textblob" : TextBlob, importé au premier calcul seulement (l'import de
+  TextBlob et de NLTK coûte plus d'un dixième de seconde par tâche Map) ;
+- "lexicon" : même lexique et mêmes règles, sans TextBlob, à partir d'un
+  fichier binaire (lexicon_sentiment.py), plus de dix fois plus rapide.
+"""
+
+import hashlib
+import os
+import sqlite3
+import zlib
+from collections import OrderedDict
+
+SCORER_VERSION = "textblob-polarity-1"
+LEXICON_SCORER_VERSION = "lexicon-polarity-1"
+SCORERS = ("textblob", "lexicon")
+DEFAULT_CACHE_SIZE = 100000
+SQLITE_BATCH = 500
+CACHE_ENV_VAR = "TWEETS_SENTIMENT_CACHE"
+# Fonction de polarité des mappeurs (passée par -cmdenv avec Hadoop Streaming)
+SCORER_ENV_VAR = "TWEETS_SENTIMENT_SCORER"
+
+# Importé au premier appel de textblob_polarity
+TextBlob = None
+
+
+def normalize_text(text):
+    """Normalise un texte avant calcul : espaces multiples réduits, bords supprimés."""
+    return " ".join(text.split())
+
+
+def textblob_polarity(text):
+    """Polarité TextBlob d'un texte (0.0 en cas d'erreur)."""
+    global TextBlob
+    if TextBlob is None:
+        from textblob import TextBlob
+    try:
+        return TextBlob(text).sentiment.polarity
+    except Exception:
+        return 0.0
+
+
+def lexicon_polarity_function(lexicon_path=None):
+    """(fonction de polarité par lexique, version de cache liée au contenu du lexique)."""
+    from lexicon_sentiment import LexiconSentiment, resolve_lexicon_path
+
+    path = resolve_lexicon_path(lexicon_path)
+    with open(path, "rb") as file:
+        checksum = zlib.crc32(file.read())
+    return LexiconSentiment(path), "{0}-{1:08x}".format(LEXICON_SCORER_VERSION, checksum)
+
+
+def create_scorer(name=None, cache_path=None, cache_size=DEFAULT_CACHE_SIZE, lexicon_path=None):
+    """SentimentScorer utilisant la fonction de polarité `name` ("textblob" par défaut)."""
+    name = name or "textblob"
+    if name == "textblob":
+        return SentimentScorer(cache_path, cache_size, name=name)
+    if name == "lexicon":
+        scorer, version = lexicon_polarity_function(lexicon_path)
+        return SentimentScorer(cache_path, cache_size, scorer=scorer, version=version, name=name)
+    raise ValueError("Scoreur de sentiment inconnu : {0} (choix : {1})".format(name, ", ".join(SCORERS)))
+
+
+def add_scorer_arguments(parser):
+    """Ajoute --scorer et --lexicon à un ArgumentParser."""
+    parser.add_argument("--scorer", choices=SCORERS, default=None,
+                        help="calcul de la polarité : TextBlob ou lexique binaire rapide (défaut : textblob)")
+    parser.add_argument("--lexicon", default=None,
+                        help="fichier du lexique binaire (défaut : mapreduce/sentiment_lexicon.bin)")
+    return parser
+
+
+class SentimentScorer:
+    """
+    Calcule la polarité des textes en s'appuyant sur un cache mémoire (LRU)
+    et, si `cache_path` est fourni, sur un cache disque sqlite.
+    """
+
+    def __init__(self, cache_path=None, cache_size=DEFAULT_CACHE_SIZE,
+                 scorer=textblob_polarity, version=SCORER_VERSION, name="textblob"):
+        self.name = name
+        self.scorer = scorer
+        self.version = version
+        self.cache_size = cache_size
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.db = None
+        if cache_path:
+            self._open_db(cache_path)
+
+    def _open_db(self, cache_path):
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(cache_path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sentiment ("
+            "text_hash TEXT NOT NULL, version TEXT NOT NULL, polarity REAL NOT NULL, "
+            "PRIMARY KEY (text_hash, version))"
+        )
+        self.db.commit()
+
+    @staticmethod
+    def _hash(text):
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _remember(self, text, polarity):
+        self.memory[text] = polarity
+        self.memory.move_to_end(text)
+        if len(self.memory) > self.cache_size:
+            self.memory.popitem(last=False)
+
+    def _lookup_disk(self, texts):
+        """Retourne {texte: polarité} pour les textes présents dans le cache disque."""
+        found = {}
+        if self.db is None or not texts:
+            return found
+        hashes = {self._hash(text): text for text in texts}
+        keys = list(hashes)
+        for i in range(0, len(keys), SQLITE_BATCH):
+            batch = keys[i:i + SQLITE_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.db.execute(
+                "SELECT text_hash, polarity FROM sentiment "
+                "WHERE version = ? AND text_hash IN ({0})".format(placeholders),
+                [self.version] + batch,
+            )
+            for text_hash, polarity in rows:
+                found[hashes[text_hash]] = polarity
+        return found
+
+    def _store_disk(self, scores):
+        if self.db is None or not scores:
+            return
+        self.db.executemany(
+            "INSERT OR REPLACE INTO sentiment (text_hash, version, polarity) VALUES (?, ?, ?)",
+            [(self._hash(text), self.version, polarity) for text, polarity in scores.items()],
+        )
+        self.db.commit()
+
+    def score(self, text):
+        """Polarité d'un seul texte."""
+        return self.score_batch([text])[0]
+
+    def score_batch(self, texts):
+        """Polarités d'une liste de textes, dans le même ordre."""
+        normalized = [normalize_text(text or "") for text in texts]
+
+        # Recherche dans le cache mémoire, textes uniques uniquement
+        scores = {}
+        pending = []
+        for text in dict.fromkeys(normalized):
+            if text in self.memory:
+                self.memory.move_to_end(text)
+                scores[text] = self.memory[text]
+            else:
+                pending.append(text)
+
+        # Puis dans le cache disque
+        from_disk = self._lookup_disk(pending)
+        self.disk_hits += len(from_disk)
+
+        # Calcul des textes manquants
+        computed = {}
+        for text in pending:
+            if text in from_disk:
+                polarity = from_disk[text]
+            else:
+                polarity = self.scorer(text) if text else 0.0
+                computed[text] = polarity
+            scores[text] = polarity
+            self._remember(text, polarity)
+        self._store_disk(computed)
+
+        self.misses += len(computed)
+        self.hits += len(normalized) - len(computed)
+        return [scores[text] for text in normalized]
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def describe(self):
+        """Résumé lisible des statistiques du cache."""
+        return "taux de succès {0:.1%} ({1} succès dont {2} disque, {3} calculs)".format(
+            self.hit_rate, self.hits, self.disk_hits, self.misses)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
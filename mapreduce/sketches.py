@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+"""
+Résumés fusionnables (sketches) pour les statistiques distribuées.
+
+Chaque résumé occupe une mémoire bornée, se fusionne avec un résumé de même
+paramétrage (`merge`) et se sérialise en une chaîne ASCII sans tabulation
+(`dumps` / `loads`) : les mappeurs et combineurs les émettent comme valeur
+d'une ligne Hadoop Streaming, les réducteurs les fusionnent, et les sorties
+mensuelles se regroupent ensuite par trimestre sans relire les tweets.
+
+- Moments : nombre, somme, somme des carrés, minimum, maximum (exacts) ;
+- DDSketch : quantiles à erreur relative bornée (Masson et al., 2019),
+  valeurs négatives et nulles comprises (polarité dans [-1, 1]) ;
+- HyperLogLog : nombre approximatif d'éléments distincts (utilisateurs) ;
+- CountMinSketch : comptes approximatifs (hashtags), avec les candidats
+  les plus fréquents pour en extraire un top K ;
+- SentimentSummary : moments, quantiles et utilisateurs distincts d'une ville.
+
+    summary = SentimentSummary()
+    summary.add(0.35, "user_12")
+    line = "Paris\\t{0}\\t{1}".format(SKETCH_MARKER, dumps(summary))
+    merged = loads(text_a).merge(loads(text_b))
+
+Le mode résumé s'active par TWEETS_SKETCHES=1, l'option --sketches des deux
+mappeurs ou local_runner.py --sketches : les mappeurs émettent un résumé par
+ville ou par mois, les combineurs et réducteurs les fusionnent, et le
+réducteur des sentiments ajoute p10, médiane, p90 et utilisateurs distincts
+à chaque ville. Avec --sketch-output, les réducteurs écrivent aussi les
+résumés fusionnés (lignes "clé, @sketch, résumé"), à regrouper par trimestre
+ou par année ; les sorties par ville, sans mois dans la clé, ne se
+fusionnent qu'avec --period month :
+
+    python mapreduce/sketches.py rollup --period quarter mois/*.txt
+"""
+
+import argparse
+import array
+import base64
+import hashlib
+import heapq
+import json
+import math
+import re
+import sys
+import zlib
+
+# Deuxième champ des lignes portant un résumé sérialisé (ni une ville, ni un hashtag)
+SKETCH_MARKER = "@sketch"
+SKETCHES_ENV_VAR = "TWEETS_SKETCHES"
+QUANTILES = (0.1, 0.5, 0.9)
+ROLLUP_PERIODS = ("month", "quarter", "year")
+
+_MONTH_KEY = re.compile(r"^(\d{4})-(\d{2})$")
+
+
+def _hash128(value):
+    """Deux entiers de 64 bits, stables d'un processus et d'une machine à l'autre."""
+    digest = hashlib.md5(str(value).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+
+
+def _encode_bytes(data):
+    return base64.b64encode(bytes(data)).decode("ascii")
+
+
+def _decode_bytes(text):
+    return base64.b64decode(text.encode("ascii"))
+
+
+def _check_compatible(sketch, other, *attributes):
+    if type(sketch) is not type(other):
+        raise TypeError("Fusion impossible : {0} et {1}".format(type(sketch).__name__, type(other).__name__))
+    for attribute in attributes:
+        if getattr(sketch, attribute) != getattr(other, attribute):
+            raise ValueError("Fusion impossible : {0} différent ({1} et {2})".format(
+                attribute, getattr(sketch, attribute), getattr(other, attribute)))
+
+
+class Moments:
+    """Nombre, somme, somme des carrés, minimum et maximum : moyenne et écart type exacts."""
+
+    kind = "moments"
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.squares = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value, count=1):
+        self.count += count
+        self.total += value * count
+        self.squares += value * value * count
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def merge(self, other):
+        _check_compatible(self, other)
+        self.count += other.count
+        self.total += other.total
+        self.squares += other.squares
+        for value in (other.minimum, other.maximum):
+            if value is not None:
+                if self.minimum is None or value < self.minimum:
+                    self.minimum = value
+                if self.maximum is None or value > self.maximum:
+                    self.maximum = value
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def variance(self):
+        if not self.count:
+            return 0.0
+        return max(self.squares / self.count - self.mean ** 2, 0.0)
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        return {"count": self.count, "total": self.total, "squares": self.squares,
+                "min": self.minimum, "max": self.maximum}
+
+    @classmethod
+    def from_dict(cls, data):
+        moments = cls()
+        moments.count = data["count"]
+        moments.total = data["total"]
+        moments.squares = data["squares"]
+        moments.minimum = data["min"]
+        moments.maximum = data["max"]
+        return moments
+
+
+class DDSketch:
+    """
+    Quantiles à erreur relative bornée : chaque valeur est rangée dans le
+    compartiment logarithmique ]gamma^(i-1), gamma^i] de sa valeur absolue,
+    avec gamma = (1 + alpha) / (1 - alpha). Le quantile estimé diffère de la
+    valeur exacte d'au plus `relative_accuracy` (en relatif).
+
+    Les valeurs de valeur absolue inférieure à `min_value` sont comptées
+    comme nulles ; au-delà de `max_bins` compartiments d'un signe, les plus
+    petits sont regroupés (seuls les quantiles les plus proches de zéro
+    perdent alors leur garantie). Pour une polarité dans [-1, 1], les
+    réglages par défaut donnent au plus ~700 compartiments par signe.
+    """
+
+    kind = "ddsketch"
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-6, max_bins=2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy doit être dans ]0, 1[")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero = 0
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+
+    def _index(self, magnitude):
+        return int(math.ceil(math.log(magnitude) / self._log_gamma))
+
+    def _value(self, index):
+        # Milieu (en erreur relative) du compartiment ]gamma^(i-1), gamma^i]
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        if value > self.min_value:
+            store = self.positive
+        elif value < -self.min_value:
+            store = self.negative
+        else:
+            store = None
+            self.zero += count
+        if store is not None:
+            index = self._index(abs(value))
+            store[index] = store.get(index, 0) + count
+            if len(store) > self.max_bins:
+                self._collapse(store)
+        self.count += count
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def _collapse(self, store):
+        """Regroupe les plus petits compartiments pour revenir à `max_bins`."""
+        indexes = sorted(store)
+        excess = len(indexes) - self.max_bins
+        target = indexes[excess]
+        store[target] += sum(store.pop(index) for index in indexes[:excess])
+
+    def merge(self, other):
+        _check_compatible(self, other, "relative_accuracy", "min_value")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in other_store.items():
+                store[index] = store.get(index, 0) + count
+            if len(store) > self.max_bins:
+                self._collapse(store)
+        self.zero += other.zero
+        self.count += other.count
+        for value in (other.minimum, other.maximum):
+            if value is not None:
+                if self.minimum is None or value < self.minimum:
+                    self.minimum = value
+                if self.maximum is None or value > self.maximum:
+                    self.maximum = value
+        return self
+
+    def quantile(self, q):
+        """Valeur estimée du quantile `q` (0 <= q <= 1), ou None si le résumé est vide."""
+        if not self.count:
+            return None
+        if not 0 <= q <= 1:
+            raise ValueError("q doit être dans [0, 1]")
+        rank = q * (self.count - 1)
+        seen = 0
+        # Ordre croissant des valeurs : négatives (plus grande valeur absolue
+        # d'abord), zéros, puis positives
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return max(-self._value(index), self.minimum)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return min(self._value(index), self.maximum)
+        return self.maximum
+
+    def to_dict(self):
+        return {"alpha": self.relative_accuracy, "min_value": self.min_value, "max_bins": self.max_bins,
+                "positive": sorted(self.positive.items()), "negative": sorted(self.negative.items()),
+                "zero": self.zero, "count": self.count, "min": self.minimum, "max": self.maximum}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["alpha"], data["min_value"], data["max_bins"])
+        sketch.positive = {index: count for index, count in data["positive"]}
+        sketch.negative = {index: count for index, count in data["negative"]}
+        sketch.zero = data["zero"]
+        sketch.count = data["count"]
+        sketch.minimum = data["min"]
+        sketch.maximum = data["max"]
+        return sketch
+
+
+class HyperLogLog:
+    """
+    Nombre approximatif d'éléments distincts en 2^precision octets
+    (4 Kio par défaut, erreur type 1,04 / sqrt(2^precision), soit 1,6 %).
+    La fusion (maximum registre par registre) donne le résumé de l'union.
+
+    Tant que le résumé compte peu d'éléments (2^(precision - 6), soit 64), il
+    garde leurs empreintes de 64 bits (représentation creuse, comme
+    HyperLogLog++) : les petites villes sont comptées exactement.
+    """
+
+    kind = "hll"
+
+    def __init__(self, precision=12):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision doit être entre 4 et 18")
+        self.precision = precision
+        self.sparse_limit = 1 << max(precision - 6, 0)
+        self.sparse = set()
+        self.registers = None
+
+    def add(self, value):
+        hashed = _hash128(value)[0]
+        if self.registers is None:
+            self.sparse.add(hashed)
+            if len(self.sparse) > self.sparse_limit:
+                self._densify()
+        else:
+            self._add_hash(hashed)
+
+    def _add_hash(self, hashed):
+        index = hashed & ((1 << self.precision) - 1)
+        remaining = hashed >> self.precision
+        rank = 64 - self.precision - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def _densify(self):
+        self.registers = bytearray(1 << self.precision)
+        for hashed in self.sparse:
+            self._add_hash(hashed)
+        self.sparse = set()
+
+    def merge(self, other):
+        _check_compatible(self, other, "precision")
+        if other.registers is None:
+            for hashed in other.sparse:
+                if self.registers is None:
+                    self.sparse.add(hashed)
+                else:
+                    self._add_hash(hashed)
+            if self.registers is None and len(self.sparse) > self.sparse_limit:
+                self._densify()
+            return self
+        if self.registers is None:
+            self._densify()
+        registers = self.registers
+        for index, rank in enumerate(other.registers):
+            if rank > registers[index]:
+                registers[index] = rank
+        return self
+
+    def count(self):
+        if self.registers is None:
+            return len(self.sparse)
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # Petits effectifs : comptage linéaire des registres vides
+            return int(round(size * math.log(size / zeros)))
+        return int(round(estimate))
+
+    def to_dict(self):
+        if self.registers is None:
+            sparse = b"".join(hashed.to_bytes(8, "little") for hashed in sorted(self.sparse))
+            return {"precision": self.precision, "sparse": _encode_bytes(sparse)}
+        return {"precision": self.precision, "registers": _encode_bytes(self.registers)}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["precision"])
+        if "registers" in data:
+            sketch.registers = bytearray(_decode_bytes(data["registers"]))
+        else:
+            sparse = _decode_bytes(data["sparse"])
+            sketch.sparse = {int.from_bytes(sparse[start:start + 8], "little")
+                             for start in range(0, len(sparse), 8)}
+        return sketch
+
+
+class CountMinSketch:
+    """
+    Comptes approximatifs dans un tableau `depth` x `width` : le compte
+    estimé d'une clé ne sous-estime jamais son compte réel, et le surestime
+    d'au plus e / width * N (N : total des comptes) avec une probabilité
+    d'au moins 1 - exp(-depth).
+
+    Un Count-Min ne sait pas énumérer ses clés : les `capacity` clés de plus
+    grand compte estimé sont conservées comme candidats du top K. Au sein
+    d'un même flux d'ajouts (une tâche), une clé dont le compte réel dépasse
+    le compte estimé du `capacity`-ième candidat y figure. Cette garantie ne
+    survit pas à `merge` : les candidats fusionnés sont l'union des candidats
+    de chaque résumé, réestimés sur le tableau fusionné, et une clé fréquente
+    au total mais jamais candidate d'un résumé partiel en est absente (son
+    compte reste estimable par `estimate`).
+    """
+
+    kind = "countmin"
+
+    def __init__(self, width=2048, depth=4, capacity=100):
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+        self.table = array.array("Q", bytes(8 * width * depth))
+        self.total = 0
+        self.candidates = {}
+
+    def _cells(self, key):
+        first, second = _hash128(key)
+        return [row * self.width + (first + row * second) % self.width for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        table = self.table
+        estimate = None
+        for cell in self._cells(key):
+            table[cell] += count
+            if estimate is None or table[cell] < estimate:
+                estimate = table[cell]
+        self.total += count
+        self._offer(key, estimate)
+
+    def _offer(self, key, estimate):
+        self.candidates[key] = estimate
+        if len(self.candidates) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self):
+        self.candidates = dict(self._largest())
+
+    def _largest(self):
+        return heapq.nlargest(self.capacity, self.candidates.items(), key=lambda item: (item[1], item[0]))
+
+    def estimate(self, key):
+        return min(self.table[cell] for cell in self._cells(key))
+
+    @property
+    def max_error(self):
+        """Surestimation maximale (avec probabilité 1 - exp(-depth)) : e / width * N."""
+        return math.e / self.width * self.total
+
+    def merge(self, other):
+        _check_compatible(self, other, "width", "depth")
+        table = self.table
+        for cell, count in enumerate(other.table):
+            if count:
+                table[cell] += count
+        self.total += other.total
+        # Les comptes des candidats sont réestimés sur le tableau fusionné
+        keys = set(self.candidates) | set(other.candidates)
+        self.candidates = {key: self.estimate(key) for key in keys}
+        if len(self.candidates) > self.capacity:
+            self._prune()
+        return self
+
+    def top(self, k):
+        """Les k candidats de plus grand compte estimé : liste de (clé, compte estimé)."""
+        return sorted(((key, self.estimate(key)) for key in self.candidates),
+                      key=lambda item: (-item[1], item[0]))[:k]
+
+    def to_dict(self):
+        table = array.array("Q", self.table)
+        if sys.byteorder == "big":
+            table.byteswap()
+        return {"width": self.width, "depth": self.depth, "capacity": self.capacity,
+                "total": self.total, "table": _encode_bytes(table.tobytes()),
+                "candidates": sorted(key for key, _ in self._largest())}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["width"], data["depth"], data["capacity"])
+        sketch.table = array.array("Q")
+        sketch.table.frombytes(_decode_bytes(data["table"]))
+        if sys.byteorder == "big":
+            sketch.table.byteswap()
+        sketch.total = data["total"]
+        sketch.candidates = {key: sketch.estimate(key) for key in data["candidates"]}
+        return sketch
+
+
+class SentimentSummary:
+    """Polarités d'une ville : moments exacts, quantiles (DDSketch) et utilisateurs distincts (HyperLogLog)."""
+
+    kind = "sentiment"
+
+    def __init__(self, relative_accuracy=0.01, precision=12):
+        self.moments = Moments()
+        self.quantiles = DDSketch(relative_accuracy)
+        self.users = HyperLogLog(precision)
+
+    def add(self, polarity, user_id=None):
+        self.moments.add(polarity)
+        self.quantiles.add(polarity)
+        if user_id is not None:
+            self.users.add(user_id)
+
+    def merge(self, other):
+        _check_compatible(self, other)
+        self.moments.merge(other.moments)
+        self.quantiles.merge(other.quantiles)
+        self.users.merge(other.users)
+        return self
+
+    def describe(self, quantiles=QUANTILES):
+        report = {"count": self.moments.count, "mean": self.moments.mean, "stddev": self.moments.stddev,
+                  "min": self.moments.minimum, "max": self.moments.maximum,
+                  "distinct_users": self.users.count()}
+        for q in quantiles:
+            report["p{0:g}".format(100 * q)] = self.quantiles.quantile(q)
+        return report
+
+    def to_dict(self):
+        return {"moments": self.moments.to_dict(), "quantiles": self.quantiles.to_dict(),
+                "users": self.users.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls.__new__(cls)
+        summary.moments = Moments.from_dict(data["moments"])
+        summary.quantiles = DDSketch.from_dict(data["quantiles"])
+        summary.users = HyperLogLog.from_dict(data["users"])
+        return summary
+
+
+SKETCH_TYPES = {cls.kind: cls for cls in (Moments, DDSketch, HyperLogLog, CountMinSketch, SentimentSummary)}
+
+
+def dumps(sketch):
+    """Résumé sérialisé : JSON compressé (zlib) en base64, sans tabulation ni saut de ligne."""
+    data = {"type": sketch.kind, "data": sketch.to_dict()}
+    text = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    return _encode_bytes(zlib.compress(text.encode("utf-8"), 6))
+
+
+def loads(text):
+    data = json.loads(zlib.decompress(_decode_bytes(text.strip())).decode("utf-8"))
+    try:
+        cls = SKETCH_TYPES[data["type"]]
+    except KeyError:
+        raise ValueError("Type de résumé inconnu : {0}".format(data.get("type")))
+    return cls.from_dict(data["data"])
+
+
+def sketch_line(key, sketch):
+    return "{0}\t{1}\t{2}".format(key, SKETCH_MARKER, dumps(sketch))
+
+
+def sketches_enabled(value):
+    """Mode résumé demandé par la variable d'environnement (1, true, yes, on)."""
+    return (value or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def rollup_key(key, period="quarter"):
+    """
+    Période de regroupement d'une clé mensuelle AAAA-MM ("2024-T2" pour un
+    trimestre, "2024" pour une année). Les clés sans mois (villes des
+    sorties de sentiment) ne se regroupent pas par période : elles ne sont
+    acceptées qu'avec period="month" (fusion par clé), ValueError sinon.
+    """
+    if period == "month":
+        return key
+    match = _MONTH_KEY.match(key)
+    if match is None and period in ROLLUP_PERIODS:
+        raise ValueError("Clé sans mois AAAA-MM : {0!r} ; --period {1} ne s'applique qu'aux "
+                         "sorties mensuelles (hashtags), utiliser --period month".format(key, period))
+    if period == "quarter":
+        return "{0}-T{1}".format(match.group(1), (int(match.group(2)) - 1) // 3 + 1)
+    if period == "year":
+        return match.group(1)
+    raise ValueError("Période inconnue : {0} (choix : {1})".format(period, ", ".join(ROLLUP_PERIODS)))
+
+
+def merge_lines(lines, period="month"):
+    """
+    Fusionne les lignes "clé, @sketch, résumé" (dans un ordre quelconque)
+    par période de regroupement. Renvoie un dictionnaire clé -> résumé ; les
+    autres lignes sont ignorées.
+    """
+    merged = {}
+    for line in lines:
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) != 3 or fields[1] != SKETCH_MARKER:
+            continue
+        key = rollup_key(fields[0], period)
+        sketch = loads(fields[2])
+        if key in merged:
+            merged[key].merge(sketch)
+        else:
+            merged[key] = sketch
+    return merged
+
+
+def describe(sketch, top=10):
+    """Statistiques lisibles d'un résumé (dictionnaire sérialisable en JSON)."""
+    if isinstance(sketch, SentimentSummary):
+        return sketch.describe()
+    if isinstance(sketch, CountMinSketch):
+        return {"total": sketch.total, "max_error": round(sketch.max_error, 1), "top": sketch.top(top)}
+    if isinstance(sketch, HyperLogLog):
+        return {"distinct": sketch.count()}
+    if isinstance(sketch, DDSketch):
+        return {q: sketch.quantile(q) for q in QUANTILES}
+    return sketch.to_dict()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fusionne des sorties de résumés (mois -> trimestre...)")
+    subparsers = parser.add_subparsers(dest="command")
+    rollup = subparsers.add_parser("rollup", help="fusionne les lignes de résumés par clé et période")
+    rollup.add_argument("files", nargs="*", help="sorties des réducteurs (--sketch-output) ; entrée standard par défaut")
+    rollup.add_argument("--period", choices=ROLLUP_PERIODS, default="quarter",
+                        help="regroupement des clés mensuelles AAAA-MM ; les fichiers sans mois "
+                             "(villes) n'acceptent que month, qui fusionne par clé")
+    rollup.add_argument("--sketch-output", action="store_true",
+                        help="écrit les résumés fusionnés (fusionnables à nouveau) au lieu des statistiques")
+    rollup.add_argument("--top", type=int, default=10, help="hashtags affichés par période")
+    args = parser.parse_args(argv)
+    if args.command != "rollup":
+        parser.print_help()
+        return
+
+    merged = {}
+    for path in args.files or ["-"]:
+        try:
+            if path == "-":
+                partial = merge_lines(sys.stdin, args.period)
+            else:
+                with open(path, "r", encoding="utf-8") as file:
+                    partial = merge_lines(file, args.period)
+        except ValueError as error:
+            rollup.error("{0} : {1}".format(path, error))
+        for key, sketch in partial.items():
+            if key in merged:
+                merged[key].merge(sketch)
+            else:
+                merged[key] = sketch
+    for key in sorted(merged):
+        if args.sketch_output:
+            print(sketch_line(key, merged[key]))
+        else:
+            report = {"key": key}
+            report.update(describe(merged[key], args.top))
+            print(json.dumps(report, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Découpage des horodatages des tweets en périodes (heure, jour, semaine, mois).
+
+Les horodatages ont le format fixe "AAAA-MM-JJ HH:MM:SS" (UTC). Au lieu
+d'appeler datetime.strptime pour chaque tweet :
+- le format est vérifié par quelques tests sur la chaîne ;
+- la période est mémoïsée par préfixe (la date, ou l'heure si nécessaire) :
+  la date n'est analysée qu'une fois pour tous les tweets du même jour ;
+- l'heure "HH:MM:SS" est validée une seule fois par valeur distincte.
+
+Les horodatages invalides lèvent ValueError, comme strptime. Avec un fuseau
+horaire, les horodatages sont convertis depuis UTC avant le découpage.
+
+    bucketer = TimeBucketer("month")
+    bucketer.key("2024-04-03 12:34:56")   # "2024-04"
+"""
+
+import datetime
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Fuseau horaire des mappeurs (passé par -cmdenv avec Hadoop Streaming)
+TIMEZONE_ENV_VAR = "TWEETS_TIMEZONE"
+GRANULARITIES = ("hour", "day", "week", "month")
+# Le cache est vidé lorsqu'il atteint cette taille (flux de plusieurs années)
+MAX_CACHE_SIZE = 100000
+
+
+def _hour_label(date):
+    return "{0:%Y-%m-%d %H}".format(date)
+
+
+def _day_label(date):
+    return "{0:%Y-%m-%d}".format(date)
+
+
+def _week_label(date):
+    # Semaine ISO 8601 : 2024-W14
+    return "{0}-W{1:02d}".format(*date.isocalendar()[:2])
+
+
+def _month_label(date):
+    return "{0}-{1:02d}".format(date.year, date.month)
+
+
+# Fonctions de niveau module (et non lambdas) : un TimeBucketer peut être
+# transmis aux processus d'un pool
+_LABELS = {"hour": _hour_label, "day": _day_label, "week": _week_label, "month": _month_label}
+
+
+_DIGITS = frozenset("0123456789")
+
+
+def _is_digits(text):
+    # str.isdigit accepte aussi les chiffres non ASCII ("²", "٣"...)
+    return bool(text) and _DIGITS.issuperset(text)
+
+
+def _valid_layout(timestamp):
+    return (len(timestamp) == 19 and timestamp[4] == "-" and timestamp[7] == "-"
+            and timestamp[10] == " " and timestamp[13] == ":" and timestamp[16] == ":")
+
+
+def parse_timestamp(timestamp):
+    """
+    Équivalent de datetime.strptime(timestamp, TIMESTAMP_FORMAT), sans passer
+    par strptime lorsque la chaîne a exactement le format attendu.
+    """
+    if _valid_layout(timestamp):
+        fields = (timestamp[0:4], timestamp[5:7], timestamp[8:10],
+                  timestamp[11:13], timestamp[14:16], timestamp[17:19])
+        if all(_is_digits(field) for field in fields):
+            # Le constructeur vérifie les bornes (mois 13, 30 février, 24 h...)
+            return datetime.datetime(*map(int, fields))
+    return datetime.datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_day_seconds = {}
+
+
+def epoch_seconds(timestamp):
+    """
+    Secondes écoulées depuis le 1er janvier 1970 (UTC) : la date n'est
+    analysée qu'une fois par jour distinct, l'heure est lue dans la chaîne.
+    """
+    if _valid_layout(timestamp):
+        day = _day_seconds.get(timestamp[:10])
+        time_part = timestamp[11:]
+        if day is not None and _is_digits(time_part.replace(":", "")):
+            hours, minutes, seconds = int(time_part[0:2]), int(time_part[3:5]), int(time_part[6:8])
+            if hours < 24 and minutes < 60 and seconds < 60:
+                return day + hours * 3600 + minutes * 60 + seconds
+    seconds = int((parse_timestamp(timestamp) - _EPOCH).total_seconds())
+    if len(_day_seconds) >= MAX_CACHE_SIZE:
+        _day_seconds.clear()
+    _day_seconds[timestamp[:10]] = seconds - seconds % 86400
+    return seconds
+
+
+class TimeBucketer:
+    """
+    Période d'un horodatage, avec mémoïsation.
+
+    - `granularity` : "hour", "day", "week" ou "month" ;
+    - `timezone` : nom IANA (ex. "Europe/Paris") du fuseau dans lequel les
+      périodes sont découpées ; les horodatages sont supposés en UTC.
+    """
+
+    def __init__(self, granularity="month", timezone=None):
+        if granularity not in GRANULARITIES:
+            raise ValueError("Granularité inconnue : {0} (choix : {1})".format(
+                granularity, ", ".join(GRANULARITIES)))
+        self.granularity = granularity
+        self.label = _LABELS[granularity]
+        self.timezone = None
+        if timezone and timezone.upper() != "UTC":
+            if ZoneInfo is None:
+                raise ImportError("Les fuseaux horaires nécessitent Python 3.9 (zoneinfo)")
+            self.timezone = ZoneInfo(timezone)
+        # Préfixe déterminant la période : la date, l'heure, ou la minute si
+        # le fuseau décale les heures (certains décalages ne sont pas entiers)
+        if self.timezone is not None:
+            self.prefix_length = 16
+        elif granularity == "hour":
+            self.prefix_length = 13
+        else:
+            self.prefix_length = 10
+        self._buckets = {}
+        self._valid_times = set()
+
+    def bucket_start(self, timestamp):
+        """Début de la période (datetime naïf, dans le fuseau choisi)."""
+        date = parse_timestamp(timestamp)
+        if self.timezone is not None:
+            date = date.replace(tzinfo=datetime.timezone.utc).astimezone(self.timezone)
+            date = date.replace(tzinfo=None)
+        if self.granularity == "hour":
+            return date.replace(minute=0, second=0, microsecond=0)
+        date = date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if self.granularity == "week":
+            return date - datetime.timedelta(days=date.weekday())
+        if self.granularity == "month":
+            return date.replace(day=1)
+        return date
+
+    def key(self, timestamp):
+        """Étiquette de la période de `timestamp` (ex. "2024-04" pour un mois)."""
+        if not _valid_layout(timestamp):
+            # Format inattendu : analyse complète (lève ValueError si invalide)
+            return self.label(self.bucket_start(timestamp))
+        time_part = timestamp[11:]
+        if time_part not in self._valid_times:
+            datetime.time(int(time_part[0:2]), int(time_part[3:5]), int(time_part[6:8]))
+            if not _is_digits(time_part.replace(":", "")):
+                raise ValueError("Heure invalide : {0!r}".format(timestamp))
+            self._valid_times.add(time_part)
+        prefix = timestamp[:self.prefix_length]
+        bucket = self._buckets.get(prefix)
+        if bucket is None:
+            if len(self._buckets) >= MAX_CACHE_SIZE:
+                self._buckets.clear()
+            bucket = self._buckets[prefix] = self.label(self.bucket_start(timestamp))
+        return bucket
+
+
+def add_time_arguments(parser, granularity=None):
+    """
+    Ajoute --timezone (et --granularity si `granularity` est la valeur par
+    défaut à proposer) à un ArgumentParser.
+    """
+    if granularity is not None:
+        parser.add_argument("--granularity", choices=GRANULARITIES, default=granularity,
+                            help="période de regroupement des tweets")
+    parser.add_argument("--timezone", default=None,
+                        help="fuseau horaire des périodes, ex. Europe/Paris (UTC par défaut)")
+    return parser
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Sélection des K éléments les plus fréquents.
+
+- top_k : sélection exacte par tas, en O(n log k) au lieu d'un tri complet.
+- SpaceSaving : résumé approximatif en mémoire bornée (algorithme Space-Saving
+  de Metwally et al.) pour les flux comptant des millions de clés distinctes.
+"""
+
+import heapq
+from operator import itemgetter
+
+
+def top_k(items, k, key=itemgetter(1), reverse=True):
+    """
+    Les k premiers éléments de `items`, sans trier toute la liste.
+    Même résultat (ex aequo compris) que sorted(items, key=key, reverse=reverse)[:k].
+    """
+    if isinstance(items, dict):
+        items = items.items()
+    if reverse:
+        return heapq.nlargest(k, items, key=key)
+    return heapq.nsmallest(k, items, key=key)
+
+
+class SpaceSaving:
+    """
+    Compteurs approximatifs des éléments fréquents avec au plus `capacity` clés.
+
+    Garanties, pour un flux de N occurrences :
+    - le compte estimé d'une clé surestime son compte réel d'au plus `error(key)`,
+      et cette erreur est toujours inférieure ou égale à N / capacity ;
+    - toute clé dont la fréquence réelle dépasse N / capacity est présente.
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("capacity doit être >= 1")
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        # Tas (compte, clé) des minimums ; les entrées périmées sont ignorées à la lecture
+        self._heap = []
+
+    def add(self, key, count=1):
+        self.total += count
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0
+        else:
+            # Remplacer la clé de plus petit compte : son compte devient l'erreur de la nouvelle
+            minimum, evicted = self._pop_min()
+            del self.counts[evicted]
+            del self.errors[evicted]
+            self.counts[key] = minimum + count
+            self.errors[key] = minimum
+        heapq.heappush(self._heap, (self.counts[key], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, k) for k, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        while True:
+            count, key = heapq.heappop(self._heap)
+            if self.counts.get(key) == count:
+                return count, key
+
+    def error(self, key):
+        return self.errors.get(key, 0)
+
+    @property
+    def max_error(self):
+        """Borne de l'erreur sur chaque compte : N / capacity."""
+        return self.total / self.capacity
+
+    def top(self, k):
+        """
+        Les k clés de plus grand compte estimé : liste de (clé, compte, erreur).
+        Le compte réel de chaque clé est compris entre compte - erreur et compte.
+        """
+        return [(key, count, self.errors[key])
+                for key, count in top_k(self.counts, k)]
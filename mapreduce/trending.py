@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Hashtags en tendance, en continu, sur des fenêtres glissantes.
+
+Les tweets arrivent un par un (JSONL sur l'entrée standard, ou fichier suivi
+comme avec `tail -f`). Pour chaque fenêtre (5 min, 1 h, 24 h par défaut) :
+- les comptes sont rangés dans un tampon circulaire de tranches de temps
+  (une tranche = `resolution` secondes, 1 min par défaut) ;
+- deux totaux glissants par hashtag sont tenus à jour : la fenêtre courante
+  et la période de référence qui la précède (24 h par défaut) ;
+- score de tendance = (compte courant + 1) / (compte attendu + 1), le compte
+  attendu étant le rythme de la période de référence ramené à la durée de
+  la fenêtre.
+
+Chaque occurrence de hashtag coûte quelques incréments de dictionnaire (un
+par fenêtre) ; une tranche qui sort d'une fenêtre est soustraite une seule
+fois : la mise à jour est en O(1) amorti par hashtag. Le top K est calculé à
+la demande par un tas (O(n log K) sur les hashtags actifs).
+
+Le temps est celui des tweets (champ timestamp, UTC) ; --clock wall utilise
+l'heure d'arrivée. Les tweets en retard sont comptés dans leur tranche tant
+qu'elle est dans le tampon.
+
+Les tweets sont lus sur l'entrée standard, rejoués depuis un fichier
+(--input) ou suivis (--follow, rotation du fichier gérée). Fenêtres
+(--windows) et période de référence (--baseline) se règlent en durées ; le
+top K est affiché périodiquement (--report-every), en texte ou en JSON
+(--format json). Le débit est de plusieurs dizaines de milliers de tweets
+par seconde.
+
+    python mapreduce/trending.py < tweets.jsonl
+    python mapreduce/trending.py --follow flux.jsonl --clock wall --report-every 10s --top 5
+"""
+
+import argparse
+import heapq
+import json
+import os
+import sys
+import time
+
+from keywords import normalize_hashtag
+from time_buckets import epoch_seconds
+
+DEFAULT_WINDOWS = "5m,1h,24h"
+DEFAULT_RESOLUTION = "1m"
+DEFAULT_BASELINE = "24h"
+DEFAULT_TOP = 10
+# Compte minimal dans la fenêtre pour figurer dans les tendances
+DEFAULT_MIN_COUNT = 3
+SMOOTHING = 1.0
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text):
+    """Durée en secondes : "90", "90s", "5m", "1h", "2d"."""
+    text = text.strip().lower()
+    unit = DURATION_UNITS.get(text[-1:])
+    value = text[:-1] if unit else text
+    try:
+        seconds = int(value) * (unit or 1)
+    except ValueError:
+        raise ValueError("Durée invalide : {0!r} (ex. 30s, 5m, 1h, 1d)".format(text))
+    if seconds <= 0:
+        raise ValueError("Durée invalide : {0!r}".format(text))
+    return seconds
+
+
+def format_duration(seconds):
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds % size == 0:
+            return "{0}{1}".format(seconds // size, unit)
+    return "{0}s".format(seconds)
+
+
+def _add(counts, key, amount):
+    value = counts.get(key, 0) + amount
+    if value:
+        counts[key] = value
+    else:
+        del counts[key]
+
+
+class TrendingEngine:
+    """
+    Comptes glissants des hashtags sur plusieurs fenêtres.
+
+    - `windows` : durées des fenêtres en secondes ;
+    - `resolution` : durée d'une tranche (les fenêtres en sont des multiples) ;
+    - `baseline` : durée de la période de référence de chaque fenêtre.
+    """
+
+    def __init__(self, windows=(300, 3600, 86400), resolution=60, baseline=86400):
+        self.resolution = resolution
+        for duration in tuple(windows) + (baseline,):
+            if duration % resolution:
+                raise ValueError("Les fenêtres doivent être des multiples de la résolution ({0} s)".format(resolution))
+        self.windows = tuple(sorted(windows))
+        self.baseline = baseline
+        # Taille des fenêtres et de la période de référence, en tranches
+        self._window_slots = [window // resolution for window in self.windows]
+        self._baseline_slots = baseline // resolution
+        self.size = max(self._window_slots) + self._baseline_slots
+        self.clear()
+
+    def clear(self):
+        self.ring = [None] * self.size
+        self.current = {window: {} for window in self.windows}
+        self.previous = {window: {} for window in self.windows}
+        self.bucket = None
+        self.first_bucket = None
+        self.late = 0
+
+    def advance(self, now):
+        """Fait glisser les fenêtres jusqu'à l'instant `now` (secondes)."""
+        bucket = int(now // self.resolution)
+        if self.bucket is None:
+            self.bucket = self.first_bucket = bucket
+            return
+        if bucket <= self.bucket:
+            return
+        if bucket - self.bucket >= self.size:
+            # Silence plus long que tout l'historique : tout a expiré
+            first_bucket = self.first_bucket
+            self.clear()
+            self.bucket, self.first_bucket = bucket, first_bucket
+            return
+        ring, size = self.ring, self.size
+        for step in range(self.bucket + 1, bucket + 1):
+            for window, slots in zip(self.windows, self._window_slots):
+                # Tranche qui quitte la fenêtre : elle passe dans la référence
+                leaving = ring[(step - slots) % size]
+                if leaving is not None and leaving[0] == step - slots:
+                    current, previous = self.current[window], self.previous[window]
+                    for tag, count in leaving[1].items():
+                        _add(current, tag, -count)
+                        previous[tag] = previous.get(tag, 0) + count
+                # Tranche qui quitte la période de référence
+                expired = ring[(step - slots - self._baseline_slots) % size]
+                if expired is not None and expired[0] == step - slots - self._baseline_slots:
+                    previous = self.previous[window]
+                    for tag, count in expired[1].items():
+                        _add(previous, tag, -count)
+            old = ring[step % size]
+            if old is not None and old[0] <= step - size:
+                ring[step % size] = None
+        self.bucket = bucket
+
+    def add(self, tag, now, count=1):
+        """Compte `count` occurrences du hashtag `tag` à l'instant `now`."""
+        bucket = int(now // self.resolution)
+        if self.bucket is None or bucket > self.bucket:
+            self.advance(now)
+        age = self.bucket - bucket
+        if age >= self.size:
+            self.late += count
+            return
+        slot = self.ring[bucket % self.size]
+        if slot is None or slot[0] != bucket:
+            slot = self.ring[bucket % self.size] = (bucket, {})
+        counts = slot[1]
+        counts[tag] = counts.get(tag, 0) + count
+        if age == 0:
+            for current in self.current.values():
+                current[tag] = current.get(tag, 0) + count
+            return
+        # Tweet en retard : il compte là où se trouve sa tranche
+        for window, slots in zip(self.windows, self._window_slots):
+            if age < slots:
+                _add(self.current[window], tag, count)
+            elif age < slots + self._baseline_slots:
+                _add(self.previous[window], tag, count)
+
+    def add_tweet(self, tweet, now=None):
+        """Compte les hashtags normalisés d'un tweet (instant : son horodatage, ou `now`)."""
+        if now is None:
+            now = epoch_seconds(tweet["timestamp"])
+        for hashtag in tweet.get("hashtags") or ():
+            tag = normalize_hashtag(hashtag)
+            if tag:
+                self.add(tag, now)
+        return now
+
+    def baseline_seconds(self, window):
+        """Durée de référence réellement observée (plus courte au démarrage)."""
+        if self.bucket is None:
+            return 0
+        history = (self.bucket - self.first_bucket + 1) * self.resolution
+        return max(0, min(self.baseline, history - window))
+
+    def expected(self, tag, window):
+        baseline = self.baseline_seconds(window)
+        if not baseline:
+            return 0.0
+        return self.previous[window].get(tag, 0) * window / baseline
+
+    def score(self, tag, window, smoothing=SMOOTHING):
+        current = self.current[window].get(tag, 0)
+        return (current + smoothing) / (self.expected(tag, window) + smoothing)
+
+    def top(self, k=DEFAULT_TOP, window=None, by="trend", min_count=DEFAULT_MIN_COUNT):
+        """
+        Les k hashtags de la fenêtre, par score de tendance ("trend") ou par
+        compte ("count") : liste de (hashtag, compte, compte attendu, score).
+        """
+        window = window or self.windows[0]
+        counts = self.current[window]
+        baseline = self.baseline_seconds(window)
+        previous = self.previous[window]
+        scale = window / baseline if baseline else 0.0
+        rows = []
+        for tag, count in counts.items():
+            if by == "trend" and count < min_count:
+                continue
+            expected = previous.get(tag, 0) * scale
+            rows.append((tag, count, expected, (count + SMOOTHING) / (expected + SMOOTHING)))
+        if by == "count":
+            return heapq.nlargest(k, rows, key=lambda row: (row[1], row[3]))
+        return heapq.nlargest(k, rows, key=lambda row: (row[3], row[1]))
+
+
+def read_lines(stream):
+    """Lignes d'un flux, au fil de leur arrivée (pas de lecture par gros blocs)."""
+    while True:
+        line = stream.readline()
+        if not line:
+            return
+        yield line
+
+
+def follow(path, poll_interval=0.5, on_idle=None):
+    """
+    Lignes ajoutées à un fichier, comme `tail -f` (à partir de la fin du
+    fichier). Le fichier est rouvert s'il est tronqué ou remplacé (rotation).
+    `on_idle` est appelé à chaque attente.
+    """
+    file = open(path, "r", encoding="utf-8")
+    file.seek(0, os.SEEK_END)
+    pending = ""
+    try:
+        while True:
+            line = file.readline()
+            if line:
+                pending += line
+                if pending.endswith("\n"):
+                    yield pending
+                    pending = ""
+                continue
+            if on_idle is not None:
+                on_idle()
+            time.sleep(poll_interval)
+            try:
+                replaced = os.stat(path).st_ino != os.fstat(file.fileno()).st_ino
+                truncated = os.path.getsize(path) < file.tell()
+            except OSError:
+                continue
+            if replaced or truncated:
+                file.close()
+                file = open(path, "r", encoding="utf-8")
+                pending = ""
+    finally:
+        file.close()
+
+
+class TrendingReporter:
+    """Alimente le moteur ligne par ligne et affiche les tendances à intervalle régulier."""
+
+    def __init__(self, engine, top=DEFAULT_TOP, by="trend", min_count=DEFAULT_MIN_COUNT,
+                 report_every=300, clock="event", output_format="text", stream=None):
+        self.engine = engine
+        self.top = top
+        self.by = by
+        self.min_count = min_count
+        self.report_every = report_every
+        self.clock = clock
+        self.output_format = output_format
+        self.stream = stream or sys.stdout
+        self.tweets = 0
+        self.errors = 0
+        self.next_report = None
+        self.now = None
+
+    def feed(self, line):
+        line = line.strip()
+        if not line or line in ("[", "]"):
+            return
+        try:
+            tweet = json.loads(line.rstrip(","))
+            now = time.time() if self.clock == "wall" else None
+            self.now = self.engine.add_tweet(tweet, now)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.errors += 1
+            return
+        self.tweets += 1
+        self.tick(self.now)
+
+    def tick(self, now=None):
+        """Rapport si l'intervalle est écoulé (appelé aussi pendant les attentes)."""
+        if now is None:
+            if self.clock != "wall":
+                return
+            now = time.time()
+            self.engine.advance(now)
+        if self.next_report is None:
+            self.next_report = now + self.report_every
+        elif now >= self.next_report:
+            self.report(now)
+            self.next_report = now + self.report_every
+
+    def report(self, now=None):
+        now = self.now if now is None else now
+        if now is None:
+            return
+        windows = {format_duration(window): self.engine.top(self.top, window, self.by, self.min_count)
+                   for window in self.engine.windows}
+        moment = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now))
+        if self.output_format == "json":
+            self.stream.write(json.dumps({
+                "time": moment,
+                "windows": {name: [{"hashtag": tag, "count": count, "expected": round(expected, 3),
+                                    "score": round(score, 3)}
+                                   for tag, count, expected, score in rows]
+                            for name, rows in windows.items()},
+            }, ensure_ascii=False) + "\n")
+        else:
+            self.stream.write("Tendances à {0} (UTC)\n".format(moment))
+            for name, rows in windows.items():
+                self.stream.write("  Fenêtre {0} :\n".format(name))
+                for tag, count, expected, score in rows:
+                    self.stream.write("    #{0}: {1} (attendu {2:.1f}, score {3:.2f})\n".format(
+                        tag, count, expected, score))
+        self.stream.flush()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Hashtags en tendance sur des fenêtres glissantes")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--input", help="fichier JSONL à rejouer (entrée standard par défaut)")
+    source.add_argument("--follow", help="fichier JSONL suivi en continu, comme tail -f")
+    parser.add_argument("--windows", default=DEFAULT_WINDOWS, help="durées des fenêtres, ex. 5m,1h,24h")
+    parser.add_argument("--resolution", default=DEFAULT_RESOLUTION, help="durée d'une tranche du tampon")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="période de référence des scores")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="nombre de hashtags par fenêtre")
+    parser.add_argument("--by", choices=["trend", "count"], default="trend",
+                        help="classement par score de tendance ou par compte")
+    parser.add_argument("--min-count", type=int, default=DEFAULT_MIN_COUNT,
+                        help="compte minimal pour figurer dans les tendances")
+    parser.add_argument("--report-every", default="5m",
+                        help="intervalle entre deux rapports (temps des tweets, ou réel avec --clock wall)")
+    parser.add_argument("--clock", choices=["event", "wall"], default="event",
+                        help="temps des tweets (timestamp) ou heure d'arrivée")
+    parser.add_argument("--format", choices=["text", "json"], default="text", help="format des rapports")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        engine = TrendingEngine([parse_duration(window) for window in args.windows.split(",")],
+                                parse_duration(args.resolution), parse_duration(args.baseline))
+        report_every = parse_duration(args.report_every)
+    except ValueError as error:
+        sys.exit(str(error))
+    reporter = TrendingReporter(engine, args.top, args.by, args.min_count, report_every,
+                                args.clock, args.format)
+
+    start = time.perf_counter()
+    try:
+        if args.follow:
+            lines = follow(args.follow, on_idle=reporter.tick)
+        elif args.input:
+            lines = open(args.input, "r", encoding="utf-8")
+        else:
+            lines = read_lines(sys.stdin)
+        for line in lines:
+            reporter.feed(line)
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.perf_counter() - start
+    reporter.report()
+
+    sys.stderr.write("{0} tweets en {1:.2f} s ({2:.0f} tweets/s), {3} lignes ignorées, {4} hashtags en retard\n".format(
+        reporter.tweets, elapsed, reporter.tweets / elapsed if elapsed else 0.0, reporter.errors, engine.late))
+
+
+if __name__ == "__main__":
+    main()
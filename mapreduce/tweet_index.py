@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Index inversé des tweets par hashtag, ville et jour, avec le sentiment
+précalculé.
+
+Les tweets sont numérotés dans l'ordre de lecture (0, 1, 2...). L'index
+contient :
+- une liste de postings par terme (hashtag normalisé, ville, jour
+  "AAAA-MM-JJ") : numéros des tweets, triés, codés en écarts successifs
+  (varint, 1 octet par tweet le plus souvent) ;
+- la colonne des sentiments (float64 par tweet, NaN sans texte) ;
+- les hashtags de chaque tweet (index direct), pour le top des hashtags
+  d'une sélection.
+
+Une requête ("#hadoop à London la semaine dernière") intersecte les postings
+puis ne lit que les tweets retenus : comptes, sentiment moyen et top hashtags
+en quelques millisecondes, sans relire les données.
+
+Format du fichier (ordre des octets de la machine, vérifié au chargement) :
+en-tête "TWIX", version (uint16), nombre de tweets (uint32), taille des
+métadonnées (uint32) ; métadonnées JSON (termes, positions des postings et
+des colonnes) ; puis les données, lues par mmap.
+
+    python mapreduce/tweet_index.py build --input data/tweets_with_locations.json
+    python mapreduce/tweet_index.py query --hashtag hadoop --city London --last-days 7
+"""
+
+import argparse
+import bisect
+import datetime
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+from geo import GeoKeyer, add_geo_arguments, keyer_from_args
+from keywords import normalize_hashtag
+from sentiment_scorer import add_scorer_arguments, create_scorer
+from time_buckets import TimeBucketer
+from topk import top_k
+from tweet_store import open_tweets
+
+MAGIC = b"TWIX"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHII")
+KINDS = ("hashtag", "city", "day")
+SENTIMENT_BATCH_SIZE = 1000
+SENTIMENT_THRESHOLD = 0.1
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_INDEX_PATH = os.path.join(PROJECT_DIR, ".cache", "tweets.idx")
+SENTIMENT_CACHE_PATH = os.path.join(PROJECT_DIR, ".cache", "sentiment.sqlite3")
+
+
+def encode_postings(ids):
+    """Numéros triés -> écarts successifs en varint (7 bits par octet)."""
+    data = bytearray()
+    previous = 0
+    for tweet_id in ids:
+        gap = tweet_id - previous
+        previous = tweet_id
+        while gap >= 0x80:
+            data.append((gap & 0x7F) | 0x80)
+            gap >>= 7
+        data.append(gap)
+    return bytes(data)
+
+
+def decode_postings(data):
+    """Inverse de encode_postings : array('I') des numéros."""
+    ids = array("I")
+    append = ids.append
+    current = gap = shift = 0
+    for byte in data:
+        if byte & 0x80:
+            gap |= (byte & 0x7F) << shift
+            shift += 7
+            continue
+        current += gap | (byte << shift)
+        append(current)
+        gap = shift = 0
+    return ids
+
+
+def intersect(lists):
+    """Intersection de listes triées de numéros (la plus courte sert de base)."""
+    lists = sorted(lists, key=len)
+    result = list(lists[0]) if lists else []
+    for other in lists[1:]:
+        if not result:
+            break
+        if len(other) > 16 * len(result):
+            # Liste beaucoup plus longue : recherche dichotomique
+            found = []
+            low = 0
+            for tweet_id in result:
+                low = bisect.bisect_left(other, tweet_id, low)
+                if low == len(other):
+                    break
+                if other[low] == tweet_id:
+                    found.append(tweet_id)
+            result = found
+        else:
+            members = set(other)
+            result = [tweet_id for tweet_id in result if tweet_id in members]
+    return result
+
+
+def sentiment_label(score):
+    if score > SENTIMENT_THRESHOLD:
+        return "positif"
+    if score < -SENTIMENT_THRESHOLD:
+        return "négatif"
+    return "neutre"
+
+
+class IndexBuilder:
+    """
+    Construit l'index en une passe : `add` reçoit chaque tweet, `write`
+    enregistre le fichier. Les sentiments sont calculés par lots.
+    """
+
+    def __init__(self, scorer=None, bucketer=None, keyer=None):
+        self.scorer = scorer if scorer is not None else create_scorer(cache_path=SENTIMENT_CACHE_PATH)
+        self.bucketer = bucketer if bucketer is not None else TimeBucketer("day")
+        self.keyer = keyer if keyer is not None else GeoKeyer("city")
+        self.postings = {kind: {} for kind in KINDS}
+        self.tag_ids = {}
+        self.sentiments = array("d")
+        self.forward_offsets = array("I", [0])
+        self.forward_codes = array("I")
+        self.pending_ids, self.pending_texts = [], []
+        self.count = 0
+
+    def _post(self, kind, term, tweet_id):
+        ids = self.postings[kind].get(term)
+        if ids is None:
+            ids = self.postings[kind][term] = array("I")
+        # Un même hashtag répété dans un tweet n'est posté qu'une fois
+        if not ids or ids[-1] != tweet_id:
+            ids.append(tweet_id)
+
+    def add(self, tweet):
+        tweet_id = self.count
+        self.count += 1
+        for hashtag in tweet.get("hashtags") or ():
+            tag = normalize_hashtag(hashtag)
+            if not tag:
+                continue
+            self._post("hashtag", tag, tweet_id)
+            code = self.tag_ids.get(tag)
+            if code is None:
+                code = self.tag_ids[tag] = len(self.tag_ids)
+            self.forward_codes.append(code)
+        self.forward_offsets.append(len(self.forward_codes))
+
+        city = self.keyer.key(tweet.get("location") or {})
+        if city is not None:
+            self._post("city", city, tweet_id)
+        timestamp = tweet.get("timestamp")
+        if timestamp:
+            try:
+                self._post("day", self.bucketer.key(timestamp), tweet_id)
+            except ValueError:
+                pass
+
+        self.sentiments.append(math.nan)
+        text = tweet.get("tweet_text")
+        if text:
+            self.pending_ids.append(tweet_id)
+            self.pending_texts.append(text)
+            if len(self.pending_texts) >= SENTIMENT_BATCH_SIZE:
+                self.flush()
+
+    def flush(self):
+        for tweet_id, score in zip(self.pending_ids, self.scorer.score_batch(self.pending_texts)):
+            self.sentiments[tweet_id] = score
+        self.pending_ids, self.pending_texts = [], []
+
+    def write(self, path, source=None):
+        """Écrit l'index (fichier temporaire puis renommage) ; renvoie sa taille en octets."""
+        self.flush()
+        blobs = []
+        position = 0
+
+        def place(data):
+            nonlocal position
+            # Colonnes alignées sur 8 octets pour être lues sans copie (memoryview.cast)
+            padding = -position % 8
+            if padding:
+                blobs.append(b"\0" * padding)
+                position += padding
+            start = position
+            blobs.append(data)
+            position += len(data)
+            return start, len(data)
+
+        terms = {}
+        for kind in KINDS:
+            entries = []
+            if kind == "hashtag":
+                # Ordre des codes de l'index direct
+                names = sorted(self.tag_ids, key=self.tag_ids.get)
+            else:
+                names = sorted(self.postings[kind])
+            for name in names:
+                ids = self.postings[kind][name]
+                data = encode_postings(ids)
+                entries.append([name, position, len(data), len(ids)])
+                blobs.append(data)
+                position += len(data)
+            terms[kind] = entries
+        meta = {
+            "source": source,
+            "created": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            "byteorder": sys.byteorder,
+            "scorer": self.scorer.version,
+            "geo_key": self.keyer.kind,
+            "timezone": str(self.bucketer.timezone or "UTC"),
+            "terms": terms,
+            "sentiments": place(self.sentiments.tobytes()),
+            "forward_offsets": place(self.forward_offsets.tobytes()),
+            "forward_codes": place(self.forward_codes.tobytes()),
+        }
+        encoded = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        temporary = path + ".tmp"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(temporary, "wb") as file:
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, self.count, len(encoded)))
+            file.write(encoded)
+            # Début des données aligné sur 8 octets
+            file.write(b"\0" * (-(HEADER.size + len(encoded)) % 8))
+            for blob in blobs:
+                file.write(blob)
+        os.replace(temporary, path)
+        return os.path.getsize(path)
+
+
+def build_index(source, path=DEFAULT_INDEX_PATH, scorer=None, bucketer=None, keyer=None):
+    """Indexe les tweets d'un fichier JSON/JSONL/gzip ou d'un stockage Parquet."""
+    builder = IndexBuilder(scorer, bucketer, keyer)
+    tweets = open_tweets(source)
+    for tweet in tweets:
+        builder.add(tweet)
+    size = builder.write(path, source=source)
+    return builder, tweets, size
+
+
+class QueryResult:
+    """Résultat d'une requête : numéros des tweets et statistiques calculées à la demande."""
+
+    def __init__(self, index, ids):
+        self.index = index
+        self.ids = ids
+
+    @property
+    def count(self):
+        return len(self.ids)
+
+    def sentiment(self):
+        """(moyenne, nombre de tweets notés, répartition positif/neutre/négatif)."""
+        column = self.index.sentiments
+        total = 0.0
+        labels = {"positif": 0, "neutre": 0, "négatif": 0}
+        scored = 0
+        for tweet_id in self.ids:
+            score = column[tweet_id]
+            if score == score:  # NaN : tweet sans texte
+                total += score
+                scored += 1
+                labels[sentiment_label(score)] += 1
+        return (total / scored if scored else None), scored, labels
+
+    def top_hashtags(self, k=10):
+        offsets, codes = self.index.forward_offsets, self.index.forward_codes
+        counts = {}
+        for tweet_id in self.ids:
+            for code in codes[offsets[tweet_id]:offsets[tweet_id + 1]]:
+                counts[code] = counts.get(code, 0) + 1
+        names = self.index.names["hashtag"]
+        return [(names[code], count) for code, count in top_k(counts, k)]
+
+    def to_dict(self, k=10):
+        average, scored, labels = self.sentiment()
+        return {
+            "tweets": self.count,
+            "sentiment": {"average": average, "scored": scored, "labels": labels},
+            "top_hashtags": [{"hashtag": tag, "count": count} for tag, count in self.top_hashtags(k)],
+        }
+
+
+class TweetIndex:
+    """Index chargé par mmap : les postings ne sont décodés qu'à la première requête."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, meta_size = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError("{0} n'est pas un index de tweets (version {1})".format(path, FORMAT_VERSION))
+        start = HEADER.size + meta_size
+        self.meta = json.loads(self._map[HEADER.size:start].decode("utf-8"))
+        if self.meta["byteorder"] != sys.byteorder:
+            self.close()
+            raise ValueError("{0} a été écrit sur une machine d'un autre boutisme".format(path))
+        self._data = memoryview(self._map)[start + (-start % 8):]
+        self.terms = {kind: {entry[0]: entry[1:] for entry in self.meta["terms"][kind]} for kind in KINDS}
+        self.names = {kind: [entry[0] for entry in self.meta["terms"][kind]] for kind in KINDS}
+        self.days = self.names["day"]
+        self.sentiments = self._column("sentiments", "d")
+        self.forward_offsets = self._column("forward_offsets", "I")
+        self.forward_codes = self._column("forward_codes", "I")
+        self._cache = {}
+
+    def _column(self, name, typecode):
+        start, length = self.meta[name]
+        return self._data[start:start + length].cast(typecode)
+
+    def close(self):
+        for name in ("sentiments", "forward_offsets", "forward_codes", "_data"):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def find(self, kind, term):
+        """Terme tel qu'indexé : hashtag normalisé, ville sans tenir compte de la casse."""
+        if kind == "hashtag":
+            return normalize_hashtag(term)
+        if term in self.terms[kind] or kind != "city":
+            return term
+        lowered = term.lower()
+        return next((name for name in self.names[kind] if name.lower() == lowered), term)
+
+    def postings(self, kind, term):
+        """Numéros triés des tweets du terme (liste vide s'il est inconnu)."""
+        key = (kind, term)
+        ids = self._cache.get(key)
+        if ids is None:
+            entry = self.terms[kind].get(term)
+            ids = array("I") if entry is None else decode_postings(self._data[entry[0]:entry[0] + entry[1]])
+            self._cache[key] = ids
+        return ids
+
+    def day_range(self, since=None, until=None):
+        """Jours indexés entre `since` et `until` (inclus, "AAAA-MM-JJ")."""
+        low = bisect.bisect_left(self.days, since) if since else 0
+        high = bisect.bisect_right(self.days, until) if until else len(self.days)
+        return self.days[low:high]
+
+    def query(self, hashtags=(), cities=(), since=None, until=None):
+        """
+        Tweets ayant tous les `hashtags`, situés dans l'une des `cities` et
+        datés entre `since` et `until` (jours inclus). Sans critère : tous.
+        """
+        lists = [self.postings("hashtag", self.find("hashtag", tag)) for tag in hashtags]
+        if cities:
+            lists.append(list(heapq.merge(*(self.postings("city", self.find("city", city))
+                                             for city in cities))))
+        if since or until:
+            lists.append(list(heapq.merge(*(self.postings("day", day)
+                                            for day in self.day_range(since, until)))))
+        ids = intersect(lists) if lists else range(self.count)
+        return QueryResult(self, ids)
+
+    def describe(self):
+        return "{0} tweets, {1} hashtags, {2} {3}, {4} jours ({5} → {6})".format(
+            self.count, len(self.terms["hashtag"]), len(self.terms["city"]),
+            "villes" if "city" in self.meta["geo_key"] else "régions",
+            len(self.days), self.days[0] if self.days else "-", self.days[-1] if self.days else "-")
+
+
+def _shift_day(day, days):
+    date = datetime.date(*map(int, day.split("-"))) + datetime.timedelta(days=days)
+    return date.isoformat()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index inversé des tweets (hashtags, villes, jours)")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    build = commands.add_parser("build", help="construire l'index")
+    build.add_argument("--input", default=os.path.join(PROJECT_DIR, "data", "tweets_with_locations.json"),
+                       help="fichier JSON/JSONL/gzip ou dossier Parquet")
+    build.add_argument("--index", default=DEFAULT_INDEX_PATH, help="fichier de l'index")
+    build.add_argument("--timezone", default=None,
+                       help="fuseau horaire des jours, ex. Europe/Paris (UTC par défaut)")
+    add_geo_arguments(build, option="--geo-key")
+    add_scorer_arguments(build)
+
+    query = commands.add_parser("query", help="interroger l'index")
+    query.add_argument("--index", default=DEFAULT_INDEX_PATH, help="fichier de l'index")
+    query.add_argument("--hashtag", action="append", default=[],
+                       help="hashtag (répétable : tous requis)")
+    query.add_argument("--city", action="append", default=[],
+                       help="ville ou région (répétable : l'une d'elles)")
+    query.add_argument("--since", help="premier jour inclus, AAAA-MM-JJ")
+    query.add_argument("--until", help="dernier jour inclus, AAAA-MM-JJ")
+    query.add_argument("--last-days", type=int, default=None,
+                       help="les N derniers jours présents dans l'index")
+    query.add_argument("--top", type=int, default=10, help="nombre de hashtags du top")
+    query.add_argument("--json", action="store_true", help="résultat en JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        scorer = create_scorer(args.scorer, cache_path=SENTIMENT_CACHE_PATH, lexicon_path=args.lexicon)
+        builder, tweets, size = build_index(args.input, args.index, scorer,
+                                            TimeBucketer("day", args.timezone), keyer_from_args(args))
+        print(f"{builder.count} tweets indexés en {time.perf_counter() - start:.2f} s "
+              f"({tweets.errors} enregistrements ignorés)")
+        print(f"Index : {args.index} ({size / 1024:.1f} Ko)")
+        print(f"Cache de sentiment : {scorer.describe()}")
+        return
+
+    with TweetIndex(args.index) as index:
+        since, until = args.since, args.until
+        if args.last_days and index.days:
+            until = until or index.days[-1]
+            since = _shift_day(until, 1 - args.last_days)
+        start = time.perf_counter()
+        result = index.query(args.hashtag, args.city, since, until)
+        summary = result.to_dict(args.top)
+        elapsed = time.perf_counter() - start
+        if args.json:
+            summary["milliseconds"] = round(elapsed * 1000, 3)
+            print(json.dumps(summary, ensure_ascii=False, indent=2))
+            return
+        print(f"Index : {index.describe()}")
+        print(f"Tweets : {summary['tweets']}")
+        average = summary["sentiment"]["average"]
+        if average is not None:
+            labels = ", ".join(f"{label} {count}" for label, count in summary["sentiment"]["labels"].items())
+            print(f"Sentiment moyen : {average:.4f} ({sentiment_label(average)}) ; {labels}")
+        print("Top hashtags :")
+        for row in summary["top_hashtags"]:
+            print(f"  #{row['hashtag']}: {row['count']}")
+        print(f"Requête : {elapsed * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Lecture en flux des tweets.
+
+Décode les tweets un par un, en mémoire bornée, depuis :
+- un tableau JSON (indenté ou non),
+- un fichier JSONL (un objet par ligne),
+- l'une de ces deux formes compressée en gzip ou en bzip2 (y compris par
+  blocs, cf. block_compression.py).
+
+Le décodage se fait par blocs avec json.JSONDecoder.raw_decode : seul le
+bloc courant est conservé en mémoire, quelle que soit la taille du fichier.
+"""
+
+import bz2
+import gzip
+import io
+import json
+import re
+import sys
+
+CHUNK_SIZE = 1 << 16
+MAX_RECORD_SIZE = 1 << 20
+GZIP_MAGIC = b"\x1f\x8b"
+BZIP2_MAGIC = b"BZh"
+
+# Séparateurs ignorés entre deux objets : blancs, virgules et crochets du tableau
+_SEPARATORS = re.compile(r"[\s,\[\]]*")
+# Début probable du prochain objet de premier niveau (utilisé pour se resynchroniser)
+_NEXT_RECORD = re.compile(r"\n\s*\{")
+
+
+def open_text(source):
+    """
+    Ouvre une source en mode texte UTF-8, en détectant la compression gzip
+    ou bzip2.
+    `source` est un chemin ou un flux binaire/texte déjà ouvert.
+    """
+    if isinstance(source, str):
+        raw = open(source, "rb")
+    elif isinstance(source, io.TextIOBase):
+        buffer = getattr(source, "buffer", None)
+        if buffer is None:
+            return source
+        raw = buffer
+    else:
+        raw = source
+
+    if not hasattr(raw, "peek"):
+        raw = io.BufferedReader(raw)
+    magic = raw.peek(3)[:3]
+    if magic[:2] == GZIP_MAGIC:
+        raw = gzip.GzipFile(fileobj=raw, mode="rb")
+    elif magic == BZIP2_MAGIC:
+        raw = bz2.BZ2File(raw, mode="rb")
+    return io.TextIOWrapper(raw, encoding="utf-8")
+
+
+class TweetReader:
+    """
+    Itère sur les tweets d'une source en mémoire bornée.
+
+    Après (ou pendant) l'itération :
+    - `count` donne le nombre de tweets décodés,
+    - `errors` le nombre d'enregistrements mal formés ignorés.
+    """
+
+    def __init__(self, source, chunk_size=CHUNK_SIZE, max_record_size=MAX_RECORD_SIZE):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.max_record_size = max_record_size
+        self.count = 0
+        self.errors = 0
+
+    def __iter__(self):
+        stream = open_text(self.source)
+        try:
+            for tweet in self._decode(stream):
+                self.count += 1
+                yield tweet
+        finally:
+            if isinstance(self.source, str):
+                stream.close()
+
+    def _decode(self, stream):
+        decoder = json.JSONDecoder()
+        buffer = ""
+        pos = 0
+        eof = False
+
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+
+            # Recharger le tampon lorsqu'il est épuisé
+            if pos >= len(buffer):
+                if eof:
+                    return
+                buffer = stream.read(self.chunk_size)
+                pos = 0
+                eof = not buffer
+                continue
+
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                pending = len(buffer) - pos
+                if not eof and pending <= self.max_record_size:
+                    # Enregistrement probablement coupé par la fin du bloc
+                    data = stream.read(self.chunk_size)
+                    buffer = buffer[pos:] + data
+                    pos = 0
+                    eof = not data
+                    continue
+
+                # Enregistrement mal formé : passer au prochain objet
+                self.errors += 1
+                match = _NEXT_RECORD.search(buffer, pos + 1)
+                pos = match.start() if match else len(buffer)
+                continue
+
+            pos = end
+            if isinstance(obj, dict):
+                yield obj
+            else:
+                self.errors += 1
+
+            # Libérer la partie déjà décodée du tampon
+            if pos > self.chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+def iter_tweets(source):
+    """Générateur de tweets depuis un chemin ou un flux (JSON, JSONL ou gzip)."""
+    return iter(TweetReader(source))
+
+
+if __name__ == "__main__":
+    # Petit utilitaire : convertit n'importe quelle entrée supportée en JSONL
+    reader = TweetReader(sys.argv[1] if len(sys.argv) > 1 else sys.stdin)
+    for tweet in reader:
+        print(json.dumps(tweet, ensure_ascii=False))
+    if reader.errors:
+        sys.stderr.write("Enregistrements ignorés: {0}\n".format(reader.errors))
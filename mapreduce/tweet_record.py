@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Représentations compactes des tweets en mémoire.
+
+Un tweet décodé depuis le JSON est un dictionnaire imbriqué (location, liste
+de coordonnées, liste de hashtags) : environ 1 Ko par tweet, dont la moitié
+en structures (dictionnaires, listes, flottants) et en chaînes répétées
+(user_id, ville, hashtags décodés une fois par tweet). Ce module propose
+(environ 400 octets par TweetRecord et 250 par tweet d'un TweetBatch, contre
+1,4 Ko pour un dictionnaire) :
+- TweetRecord : un tweet en objet à attributs fixes (__slots__), chaînes
+  répétées internées, coordonnées en deux flottants ;
+- TweetBatch : un lot en colonnes (struct of arrays) : codes entiers vers des
+  tables de chaînes pour user_id, ville et hashtags, coordonnées dans des
+  array('d'), hashtags en liste d'adjacence (décalages + codes) ;
+- RecordReader / iter_records / load_batch : chargement direct depuis un
+  fichier JSON, JSONL, gzip ou un stockage Parquet (colonnes lues sans
+  dictionnaire par ligne). Les analyses (analyze_tweets_with_sentiment.py,
+  simulations MapReduce) parcourent des TweetRecord et envoient des
+  TweetBatch aux processus ; prepare_tweets.py --sequential regroupe les
+  mois en TweetBatch et les écrit directement (TweetBatch.write_json), le
+  pipeline en flux par défaut écrivant les tweets au fil de l'eau.
+
+to_dict() reconstruit le tweet au format d'origine (mêmes clés, dans l'ordre
+du jeu de données) : json.dumps produit le même texte. Les champs absents
+restent absents ; les champs inconnus ou de forme inattendue sont conservés
+tels quels. Pour une localisation de forme inattendue, la ville (si c'est une
+chaîne) reste disponible dans `city`.
+"""
+
+import json
+import math
+import sys
+from array import array
+from itertools import islice
+
+from tweet_store import StoreReader, is_store, open_tweets
+
+# Champs du format d'origine, dans l'ordre du fichier de données
+FIELDS = ("user_id", "tweet_text", "timestamp", "hashtags", "location")
+FIELD_SET = frozenset(FIELDS)
+LOCATION_KEYS = frozenset(("city", "coordinates"))
+
+intern = sys.intern
+
+
+def _split_location(location):
+    """(ville, latitude, longitude) d'une localisation {city, coordinates: [lat, lon]}, None si autre forme."""
+    if type(location) is not dict or not location or not LOCATION_KEYS.issuperset(location):
+        return None
+    city = location.get("city")
+    if city is not None and type(city) is not str:
+        return None
+    if "coordinates" not in location:
+        return (None if city is None else intern(city)), None, None
+    coordinates = location["coordinates"]
+    if (type(coordinates) is not list or len(coordinates) != 2
+            or type(coordinates[0]) is not float or type(coordinates[1]) is not float):
+        return None
+    return (None if city is None else intern(city)), coordinates[0], coordinates[1]
+
+
+def _split(tweet):
+    """
+    Décompose un tweet (dictionnaire) : (user_id, texte, horodatage, hashtags,
+    ville, latitude, longitude, champs conservés tels quels ou None).
+    """
+    extra = None
+    user_id = tweet.get("user_id")
+    if type(user_id) is str:
+        user_id = intern(user_id)
+    elif user_id is not None:
+        extra, user_id = {"user_id": user_id}, None
+
+    hashtags = tweet.get("hashtags")
+    if type(hashtags) is list and all(type(hashtag) is str for hashtag in hashtags):
+        hashtags = tuple([intern(hashtag) for hashtag in hashtags])
+    elif hashtags is not None:
+        extra = extra or {}
+        extra["hashtags"], hashtags = hashtags, None
+
+    city = lat = lon = None
+    location = tweet.get("location")
+    if location is not None:
+        parts = _split_location(location)
+        if parts is None:
+            extra = extra or {}
+            extra["location"] = location
+            if type(location) is dict and type(location.get("city")) is str:
+                city = intern(location["city"])
+        else:
+            city, lat, lon = parts
+
+    if not FIELD_SET.issuperset(tweet):
+        extra = extra or {}
+        extra.update((key, value) for key, value in tweet.items() if key not in FIELD_SET)
+    return user_id, tweet.get("tweet_text"), tweet.get("timestamp"), hashtags, city, lat, lon, extra
+
+
+def _join(user_id, text, timestamp, hashtags, city, lat, lon, extra):
+    """Inverse de _split : le tweet au format d'origine."""
+    location = None
+    if city is not None or lat is not None:
+        location = {}
+        if city is not None:
+            location["city"] = city
+        if lat is not None:
+            location["coordinates"] = [lat, lon]
+    values = (user_id, text, timestamp, None if hashtags is None else list(hashtags), location)
+    tweet = {}
+    for key, value in zip(FIELDS, values):
+        if extra and key in extra:
+            tweet[key] = extra[key]
+        elif value is not None:
+            tweet[key] = value
+    if extra:
+        tweet.update((key, value) for key, value in extra.items() if key not in FIELD_SET)
+    return tweet
+
+
+class TweetRecord:
+    """Un tweet à attributs fixes : `record.city` au lieu de `tweet["location"]["city"]`."""
+    __slots__ = ("user_id", "text", "timestamp", "hashtags", "city", "lat", "lon", "extra")
+
+    def __init__(self, user_id=None, text=None, timestamp=None, hashtags=None,
+                 city=None, lat=None, lon=None, extra=None):
+        self.user_id = user_id
+        self.text = text
+        self.timestamp = timestamp
+        self.hashtags = hashtags
+        self.city = city
+        self.lat = lat
+        self.lon = lon
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, tweet):
+        return cls(*_split(tweet))
+
+    def to_dict(self):
+        return _join(self.user_id, self.text, self.timestamp, self.hashtags,
+                     self.city, self.lat, self.lon, self.extra)
+
+    @property
+    def coordinates(self):
+        return None if self.lat is None else (self.lat, self.lon)
+
+    def __eq__(self, other):
+        if not isinstance(other, TweetRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return "TweetRecord(user_id={0!r}, city={1!r}, timestamp={2!r})".format(
+            self.user_id, self.city, self.timestamp)
+
+
+class StringTable:
+    """Table de chaînes : chaque chaîne distincte est stockée une fois (code 0 = absente)."""
+
+    def __init__(self):
+        self.strings = [None]
+        self.codes = {None: 0}
+
+    def code(self, string):
+        code = self.codes.get(string)
+        if code is None:
+            code = self.codes[string] = len(self.strings)
+            self.strings.append(string)
+        return code
+
+    def __len__(self):
+        return len(self.strings) - 1
+
+
+class TweetBatch:
+    """
+    Lot de tweets en colonnes. Les colonnes sont publiques pour les boucles
+    de calcul : `user_codes`, `city_codes` (indices dans `users.strings`,
+    `cities.strings`), `lats`, `lons` (NaN si absentes), `texts`,
+    `timestamps` ; les hashtags du tweet i sont
+    `hashtag_codes[hashtag_offsets[i]:hashtag_offsets[i + 1]]`.
+    """
+
+    def __init__(self):
+        self.users = StringTable()
+        self.cities = StringTable()
+        self.tags = StringTable()
+        self.user_codes = array("I")
+        self.city_codes = array("I")
+        self.lats = array("d")
+        self.lons = array("d")
+        self.texts = []
+        self.timestamps = []
+        self.hashtag_offsets = array("I", [0])
+        self.hashtag_codes = array("I")
+        # Indices des tweets sans liste de hashtags (champ absent)
+        self.missing_hashtags = set()
+        self.extras = {}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _append_fields(self, user_id, text, timestamp, hashtags, city, lat, lon, extra):
+        index = len(self.texts)
+        self.user_codes.append(self.users.code(user_id))
+        self.texts.append(text)
+        self.timestamps.append(timestamp)
+        if hashtags is None:
+            self.missing_hashtags.add(index)
+        else:
+            code = self.tags.code
+            self.hashtag_codes.extend([code(hashtag) for hashtag in hashtags])
+        self.hashtag_offsets.append(len(self.hashtag_codes))
+        self.city_codes.append(self.cities.code(city))
+        self.lats.append(math.nan if lat is None else lat)
+        self.lons.append(math.nan if lon is None else lon)
+        if extra:
+            self.extras[index] = extra
+
+    def append(self, tweet):
+        """Ajoute un tweet (dictionnaire au format d'origine)."""
+        self._append_fields(*_split(tweet))
+
+    def append_record(self, record):
+        self._append_fields(record.user_id, record.text, record.timestamp, record.hashtags,
+                            record.city, record.lat, record.lon, record.extra)
+
+    def append_columns(self, columns):
+        """
+        Ajoute des tweets donnés en colonnes (listes de même longueur) : user_id,
+        tweet_text, timestamp, hashtags, city, latitude, longitude (colonnes
+        absentes = champs absents), par ex. un lot lu depuis Parquet.
+        """
+        size = len(next(iter(columns.values()))) if columns else 0
+        start = len(self.texts)
+        none = [None] * size
+        users, cities, tags = self.users.code, self.cities.code, self.tags.code
+        self.user_codes.extend([users(value) for value in columns.get("user_id", none)])
+        self.texts.extend(columns.get("tweet_text", none))
+        self.timestamps.extend(columns.get("timestamp", none))
+        self.city_codes.extend([cities(value) for value in columns.get("city", none)])
+        self.lats.extend([math.nan if value is None else value for value in columns.get("latitude", none)])
+        self.lons.extend([math.nan if value is None else value for value in columns.get("longitude", none)])
+        offsets, codes = self.hashtag_offsets, self.hashtag_codes
+        for index, hashtags in enumerate(columns.get("hashtags", none), start):
+            if hashtags is None:
+                self.missing_hashtags.add(index)
+            else:
+                codes.extend([tags(hashtag) for hashtag in hashtags])
+            offsets.append(len(codes))
+
+    def hashtags_at(self, index):
+        if index in self.missing_hashtags:
+            return None
+        strings = self.tags.strings
+        return tuple([strings[code] for code in
+                      self.hashtag_codes[self.hashtag_offsets[index]:self.hashtag_offsets[index + 1]]])
+
+    def _fields(self, index):
+        lat, lon = self.lats[index], self.lons[index]
+        return (self.users.strings[self.user_codes[index]], self.texts[index], self.timestamps[index],
+                self.hashtags_at(index), self.cities.strings[self.city_codes[index]],
+                None if math.isnan(lat) else lat, None if math.isnan(lon) else lon,
+                self.extras.get(index))
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("indice hors du lot : {0}".format(index))
+        return TweetRecord(*self._fields(index))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield TweetRecord(*self._fields(index))
+
+    def to_dicts(self):
+        """Tweets au format d'origine (liste de dictionnaires)."""
+        return [_join(*self._fields(index)) for index in range(len(self))]
+
+    def write_json(self, file, chunk_size=1000):
+        """
+        Écrit le lot dans `file` (objet texte), octet pour octet comme
+        json.dumps(self.to_dicts(), ensure_ascii=False, indent=2), par tranches
+        de `chunk_size` tweets : la liste complète des dictionnaires n'est
+        jamais construite.
+        """
+        if not len(self):
+            file.write("[]")
+            return
+        file.write("[")
+        for start in range(0, len(self), chunk_size):
+            chunk = [_join(*self._fields(index)) for index in range(start, min(start + chunk_size, len(self)))]
+            # "[\n  t1,\n  t2\n]" sans les crochets : "  t1,\n  t2"
+            file.write(("\n" if start == 0 else ",\n") + json.dumps(chunk, ensure_ascii=False, indent=2)[2:-2])
+        file.write("\n]")
+
+    def city_names(self):
+        """Ville de chaque tweet (None si absente)."""
+        strings = self.cities.strings
+        return [strings[code] for code in self.city_codes]
+
+    @classmethod
+    def from_records(cls, records):
+        batch = cls()
+        for record in records:
+            batch.append_record(record)
+        return batch
+
+
+def _column_records(columns):
+    """TweetRecord d'un lot de colonnes Parquet (mêmes champs que StoreReader)."""
+    size = len(next(iter(columns.values()))) if columns else 0
+    none = [None] * size
+    rows = zip(columns.get("user_id", none), columns.get("tweet_text", none), columns.get("timestamp", none),
+               columns.get("hashtags", none), columns.get("city", none),
+               columns.get("latitude", none), columns.get("longitude", none))
+    for user_id, text, timestamp, hashtags, city, lat, lon in rows:
+        if lat is None or lon is None:
+            lat = lon = None
+        yield TweetRecord(user_id, text, timestamp, None if hashtags is None else tuple(hashtags), city, lat, lon)
+
+
+class RecordReader:
+    """
+    Itère sur les TweetRecord d'un fichier JSON/JSONL/gzip ou d'un stockage
+    Parquet (lu par colonnes), avec les attributs `count` et `errors` du
+    lecteur sous-jacent.
+    """
+
+    def __init__(self, source, fields=None, **filters):
+        self.reader = open_tweets(source, fields=fields, **filters)
+
+    @property
+    def count(self):
+        return self.reader.count
+
+    @property
+    def errors(self):
+        return self.reader.errors
+
+    def __iter__(self):
+        if isinstance(self.reader, StoreReader):
+            for columns in self.reader.column_batches():
+                yield from _column_records(columns)
+        else:
+            for tweet in self.reader:
+                yield TweetRecord(*_split(tweet))
+
+
+def iter_records(source, fields=None):
+    """
+    TweetRecord de chaque tweet d'un fichier, d'un stockage Parquet ou d'un
+    itérable de dictionnaires (les TweetRecord sont transmis tels quels).
+    """
+    if isinstance(source, str):
+        yield from RecordReader(source, fields=fields)
+        return
+    for tweet in source:
+        yield tweet if type(tweet) is TweetRecord else TweetRecord(*_split(tweet))
+
+
+def record_batches(tweets, size):
+    """
+    Découpe des tweets (TweetRecord, dictionnaires ou chemin d'une source) en
+    TweetBatch de `size` tweets au plus : lots compacts à envoyer aux processus.
+    """
+    records = iter_records(tweets)
+    while True:
+        batch = TweetBatch.from_records(islice(records, size))
+        if not len(batch):
+            return
+        yield batch
+
+
+def load_batch(source, fields=None, **filters):
+    """
+    Charge des tweets dans un TweetBatch. Depuis un stockage Parquet, les
+    colonnes sont copiées directement, sans dictionnaire intermédiaire.
+    """
+    batch = TweetBatch()
+    if isinstance(source, str) and is_store(source):
+        for columns in open_tweets(source, fields=fields, **filters).column_batches():
+            batch.append_columns(columns)
+        return batch
+    tweets = open_tweets(source, fields=fields) if isinstance(source, str) else source
+    for tweet in tweets:
+        batch.append(tweet)
+    return batch
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Stockage colonnaire partitionné des tweets (Parquet, via pyarrow).
+
+Organisation Hive :
+    <racine>/year=2024/month=04/[city=Paris/]part-0.parquet
+
+Colonnes : user_id, tweet_text, timestamp, hashtags (liste de chaînes),
+city, latitude, longitude (flottants). Les analyses ne lisent que les
+colonnes dont elles ont besoin et seules les partitions retenues par les
+filtres sont ouvertes.
+
+pyarrow est optionnel : il n'est importé que par ce module.
+"""
+
+import os
+from itertools import islice
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = ds = None
+
+from time_buckets import TimeBucketer
+from tweet_reader import TweetReader
+
+BATCH_SIZE = 50000
+
+# Champs du format JSON d'origine -> colonnes Parquet correspondantes
+FIELD_COLUMNS = {
+    "user_id": ["user_id"],
+    "tweet_text": ["tweet_text"],
+    "timestamp": ["timestamp"],
+    "hashtags": ["hashtags"],
+    "location": ["city", "latitude", "longitude"],
+}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Le format Parquet nécessite pyarrow (pip install pyarrow)")
+
+
+def _schema():
+    return pa.schema([
+        ("user_id", pa.string()),
+        ("tweet_text", pa.string()),
+        ("timestamp", pa.string()),
+        ("hashtags", pa.list_(pa.string())),
+        ("city", pa.string()),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+        ("year", pa.string()),
+        ("month", pa.string()),
+    ])
+
+
+def _partitioning(partition_by_city):
+    fields = [("year", pa.string()), ("month", pa.string())]
+    if partition_by_city:
+        fields.append(("city", pa.string()))
+    return ds.partitioning(pa.schema(fields), flavor="hive")
+
+
+def _to_batch(tweets, schema):
+    """Convertit une liste de tweets (dictionnaires JSON) en RecordBatch."""
+    columns = {name: [] for name in schema.names}
+    bucketer = TimeBucketer("month")
+    for tweet in tweets:
+        timestamp = tweet.get("timestamp") or ""
+        try:
+            year, month = bucketer.key(timestamp).split("-") if timestamp else (None, None)
+        except ValueError:
+            year = month = None
+        location = tweet.get("location") or {}
+        coordinates = location.get("coordinates") or [None, None]
+        columns["user_id"].append(tweet.get("user_id"))
+        columns["tweet_text"].append(tweet.get("tweet_text"))
+        columns["timestamp"].append(timestamp or None)
+        columns["hashtags"].append(tweet.get("hashtags") or [])
+        columns["city"].append(location.get("city"))
+        columns["latitude"].append(coordinates[0] if len(coordinates) > 0 else None)
+        columns["longitude"].append(coordinates[1] if len(coordinates) > 1 else None)
+        columns["year"].append(year)
+        columns["month"].append(month)
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def write_store(tweets, root, partition_by_city=False, batch_size=BATCH_SIZE):
+    """
+    Écrit les tweets en Parquet partitionné par année/mois (et ville si demandé).
+    Les tweets sont convertis par lots : la mémoire dépend de batch_size, pas du volume.
+    Les partitions réécrites remplacent leur contenu précédent.
+    """
+    _require_pyarrow()
+    schema = _schema()
+    iterator = iter(tweets)
+
+    def batches():
+        while True:
+            chunk = list(islice(iterator, batch_size))
+            if not chunk:
+                return
+            yield _to_batch(chunk, schema)
+
+    ds.write_dataset(
+        batches(), root, schema=schema, format="parquet",
+        partitioning=_partitioning(partition_by_city),
+        existing_data_behavior="delete_matching",
+    )
+
+
+def _filter_expression(filters):
+    expression = None
+    for name, value in filters.items():
+        if value is None:
+            continue
+        if name == "month" and isinstance(value, int):
+            value = "{0:02d}".format(value)
+        elif name == "year":
+            value = str(value)
+        condition = ds.field(name) == value
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _to_tweet(row, fields):
+    """Reconstruit un tweet au format JSON d'origine à partir d'une ligne Parquet."""
+    tweet = {}
+    for field in fields:
+        if field == "location":
+            location = {}
+            if row.get("city") is not None:
+                location["city"] = row["city"]
+            if row.get("latitude") is not None and row.get("longitude") is not None:
+                location["coordinates"] = [row["latitude"], row["longitude"]]
+            tweet["location"] = location
+        elif row.get(field) is not None:
+            tweet[field] = row[field]
+    return tweet
+
+
+class StoreReader:
+    """
+    Itère sur les tweets d'un stockage Parquet, avec la même interface que
+    TweetReader (attributs `count` et `errors`).
+
+    - `fields` : champs JSON à lire (projection), tous par défaut ;
+    - `year`, `month`, `city` : filtres, appliqués aux partitions avant lecture.
+    """
+
+    def __init__(self, root, fields=None, year=None, month=None, city=None,
+                 batch_size=BATCH_SIZE):
+        _require_pyarrow()
+        self.root = root
+        self.fields = list(fields or FIELD_COLUMNS)
+        self.filters = {"year": year, "month": month, "city": city}
+        self.batch_size = batch_size
+        self.count = 0
+        self.errors = 0
+
+    def _dataset(self):
+        # Le partitionnement par ville est détecté à partir des noms de dossiers
+        partition_by_city = any(name.startswith("city=")
+                                for _, directories, _ in os.walk(self.root)
+                                for name in directories)
+        return ds.dataset(self.root, format="parquet",
+                          partitioning=_partitioning(partition_by_city))
+
+    def columns(self):
+        return [column for field in self.fields for column in FIELD_COLUMNS[field]]
+
+    def __iter__(self):
+        dataset = self._dataset()
+        scanner = dataset.scanner(columns=self.columns(),
+                                  filter=_filter_expression(self.filters),
+                                  batch_size=self.batch_size)
+        for batch in scanner.to_batches():
+            for row in batch.to_pylist():
+                self.count += 1
+                yield _to_tweet(row, self.fields)
+
+    def column_batches(self):
+        """Lots de colonnes ({colonne: liste de valeurs}), sans dictionnaire par tweet."""
+        scanner = self._dataset().scanner(columns=self.columns(),
+                                          filter=_filter_expression(self.filters),
+                                          batch_size=self.batch_size)
+        for batch in scanner.to_batches():
+            self.count += batch.num_rows
+            yield {name: batch.column(name).to_pylist() for name in batch.schema.names}
+
+
+def is_store(path):
+    """
+    Vrai si `path` est un dossier de stockage Parquet : il contient des
+    partitions year=AAAA ou des fichiers .parquet (un dossier quelconque ne
+    l'est pas).
+    """
+    if not os.path.isdir(path):
+        return False
+    return any(name.startswith("year=") and os.path.isdir(os.path.join(path, name))
+               or name.endswith(".parquet")
+               for name in os.listdir(path))
+
+
+def open_tweets(path, fields=None, **filters):
+    """
+    Source de tweets pour les analyses : un stockage Parquet (dossier) lu avec
+    projection et filtres, ou un fichier JSON/JSONL/gzip lu en flux.
+    """
+    if is_store(path):
+        return StoreReader(path, fields=fields, **filters)
+    return TweetReader(path)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Backend vectorisé (NumPy, pandas en option) pour les phases Shuffle & Reduce.
+
+Les clés (mois, hashtag, ville) sont remplacées par des codes entiers, puis
+les sommes et les comptes par groupe sont calculés avec np.bincount au lieu
+de boucles Python sur des dictionnaires et des listes.
+
+L'entrée est en colonnes (tableaux de mois, de hashtags, de villes...), telles
+qu'émises par les phases Map en colonnes ou lues depuis le stockage Parquet.
+Regrouper des paires (clé, valeur) demanderait de les reconvertir en colonnes
+en Python, ce qui coûte plus que le regroupement lui-même.
+
+Les fonctions renvoient les mêmes structures que les phases Python. np.bincount
+additionne les poids dans l'ordre du tableau : les sommes flottantes sont donc
+identiques à une addition séquentielle.
+
+NumPy est optionnel pour le reste du projet : seul ce module l'importe. Si
+pandas est installé, pandas.factorize (table de hachage en C) remplace le
+dictionnaire Python pour coder les clés.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Le backend vectorisé nécessite numpy (pip install numpy)")
+
+
+def _object_array(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def factorize(values):
+    """
+    Remplace chaque valeur par un code entier (ordre de première apparition).
+    Renvoie (codes, valeurs uniques). Les valeurs manquantes (None, NaN avec
+    pandas) reçoivent le code -1, comme avec pandas.factorize.
+    """
+    _require_numpy()
+    if pd is not None:
+        codes, uniques = pd.factorize(_object_array(values))
+        return codes, list(uniques)
+    index = {}
+    codes = np.fromiter((-1 if value is None else index.setdefault(value, len(index))
+                         for value in values),
+                        dtype=np.int64, count=len(values))
+    return codes, list(index)
+
+
+def _present(*codes):
+    """Masque des lignes dont aucune clé n'est manquante (code -1)."""
+    mask = codes[0] >= 0
+    for other in codes[1:]:
+        mask &= other >= 0
+    return mask
+
+
+def group_sums(codes, num_groups, weights=None):
+    """Somme des poids (ou nombre d'éléments) de chaque groupe."""
+    return np.bincount(codes, weights=weights, minlength=num_groups)
+
+
+def top_items(totals, names, n, key, codes=None):
+    """
+    Les n meilleurs (nom, total) : np.argpartition réduit les candidats, puis
+    `key` départage les ex aequo sur ces seuls candidats. Si `codes` est
+    donné, le nom de totals[i] est names[codes[i]].
+    """
+    present = np.flatnonzero(totals)
+    if len(present) > n:
+        # Tous les éléments dont le total atteint le n-ième plus grand total
+        threshold = np.partition(totals[present], len(present) - n)[len(present) - n]
+        present = present[totals[present] >= threshold]
+    if codes is None:
+        candidates = [(names[code], int(totals[code])) for code in present]
+    else:
+        candidates = [(names[codes[code]], int(totals[code])) for code in present]
+    return sorted(candidates, key=key)[:n]
+
+
+def hashtag_top_by_month_columns(months, hashtags, n, key, counts=None):
+    """
+    Top n des hashtags par mois à partir de deux colonnes alignées (une ligne
+    par occurrence, avec un poids optionnel) : {mois: [(hashtag, nombre), ...]}.
+    """
+    _require_numpy()
+    if len(months) == 0:
+        return {}
+    month_codes, month_names = factorize(months)
+    hashtag_codes, hashtag_names = factorize(hashtags)
+    weights = None if counts is None else np.asarray(counts, dtype=np.float64)
+    present = _present(month_codes, hashtag_codes)
+    if not present.all():
+        month_codes, hashtag_codes = month_codes[present], hashtag_codes[present]
+        weights = None if weights is None else weights[present]
+
+    # Un code par couple (mois, hashtag), puis un total par couple présent :
+    # pas de matrice dense mois × hashtags, la mémoire suit le nombre de couples
+    num_hashtags = len(hashtag_names)
+    pair_ids, pair_codes = np.unique(month_codes.astype(np.int64) * num_hashtags + hashtag_codes,
+                                     return_inverse=True)
+    totals = group_sums(pair_codes.ravel(), len(pair_ids), weights)
+
+    # Les couples sont triés par code : ceux d'un même mois sont contigus
+    pair_months = pair_ids // num_hashtags
+    pair_hashtags = pair_ids % num_hashtags
+    bounds = np.searchsorted(pair_months, np.arange(len(month_names) + 1))
+    result = {}
+    for code, month in enumerate(month_names):
+        start, end = bounds[code], bounds[code + 1]
+        if start < end:
+            result[month] = top_items(totals[start:end], hashtag_names, n, key,
+                                      codes=pair_hashtags[start:end])
+    return result
+
+
+def city_sentiment_totals_columns(cities, sentiments):
+    """{ville: (somme des sentiments, nombre de tweets)} à partir de deux colonnes alignées."""
+    _require_numpy()
+    if len(cities) == 0:
+        return {}
+    city_codes, city_names = factorize(cities)
+    weights = np.asarray(sentiments, dtype=np.float64)
+    present = _present(city_codes)
+    if not present.all():
+        city_codes, weights = city_codes[present], weights[present]
+    sums = group_sums(city_codes, len(city_names), weights)
+    counts = group_sums(city_codes, len(city_names))
+    return {city: (float(sums[code]), int(counts[code]))
+            for code, city in enumerate(city_names)}
+
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Construit le lexique binaire du scoreur de sentiment rapide
+(mapreduce/sentiment_lexicon.bin) à partir du lexique de TextBlob
+(textblob/en/en-sentiment.xml, chargé par TextBlob lui-même : moyennes des
+sens de chaque mot et adverbes en -ly ajoutés), puis mesure l'accord avec
+TextBlob et la vitesse des deux scoreurs sur un jeu de tweets.
+
+TextBlob n'est nécessaire qu'ici : les mappeurs lisent ensuite le fichier
+binaire sans l'importer.
+
+    python scripts/build_sentiment_lexicon.py
+    python scripts/build_sentiment_lexicon.py --validate-only --input data/synthetic_1m.jsonl.gz --limit 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_DIR, "mapreduce"))
+from lexicon_sentiment import DEFAULT_LEXICON_PATH, EMOTICON, MODIFIER, LexiconSentiment, write_lexicon
+from sentiment_scorer import normalize_text, textblob_polarity
+from tweet_store import open_tweets
+
+# Seuils des étiquettes positif / neutre / négatif des rapports
+LABEL_THRESHOLD = 0.1
+# Écart toléré entre deux scores "identiques"
+TOLERANCE = 1e-9
+
+
+def lexicon_entries():
+    """Entrées (mot, polarité, intensité, drapeaux) du lexique anglais de TextBlob."""
+    from textblob import _text
+    from textblob.en import sentiment
+
+    sentiment.load()
+    entries = []
+    for word, senses in sorted(dict.items(sentiment)):
+        # Les expressions de plusieurs mots ne correspondent jamais à un seul mot
+        if not word or any(character.isspace() for character in word):
+            continue
+        polarity, _, intensity = senses[None]
+        flags = MODIFIER if any(map(senses.__contains__, sentiment.modifiers)) else 0
+        entries.append((word, polarity, intensity, flags))
+    # Émoticônes telles qu'écrites, dans l'ordre des groupes de TextBlob
+    for (_, polarity), emoticons in _text.EMOTICONS.items():
+        for emoticon in sorted(emoticons):
+            entries.append((emoticon, polarity, 1.0, EMOTICON))
+    return entries
+
+
+def label(polarity):
+    if polarity > LABEL_THRESHOLD:
+        return "positif"
+    if polarity < -LABEL_THRESHOLD:
+        return "négatif"
+    return "neutre"
+
+
+def timed_scores(scorer, texts):
+    start = time.perf_counter()
+    scores = [scorer(text) for text in texts]
+    return scores, time.perf_counter() - start
+
+
+def validate(lexicon_path, input_path, limit=None, examples=5):
+    """Compare les polarités du lexique et de TextBlob ; renvoie le taux d'accord exact."""
+    texts = []
+    for tweet in open_tweets(input_path, fields=["tweet_text"]):
+        texts.append(normalize_text(tweet.get("tweet_text") or ""))
+        if limit and len(texts) >= limit:
+            break
+    if not texts:
+        print("Aucun tweet à comparer")
+        return 1.0
+
+    start = time.perf_counter()
+    scorer = LexiconSentiment(lexicon_path)
+    load_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    textblob_polarity("")  # import de TextBlob et de NLTK, hors mesure
+    import_seconds = time.perf_counter() - start
+
+    expected, textblob_seconds = timed_scores(textblob_polarity, texts)
+    actual, lexicon_seconds = timed_scores(scorer, texts)
+
+    differences = [(abs(a - b), text, a, b) for text, a, b in zip(texts, expected, actual)]
+    exact = sum(1 for difference, _, _, _ in differences if difference <= TOLERANCE)
+    labels = sum(1 for a, b in zip(expected, actual) if label(a) == label(b))
+    count = len(texts)
+
+    print("Tweets comparés : {0}".format(count))
+    print("Scores identiques : {0:.2%} ; étiquettes identiques : {1:.2%} ; écart moyen : {2:.6f}".format(
+        exact / count, labels / count, sum(d for d, _, _, _ in differences) / count))
+    print("Chargement : lexique {0:.1f} ms, import de TextBlob {1:.1f} ms".format(
+        load_seconds * 1000, import_seconds * 1000))
+    print("TextBlob : {0:.1f} µs/tweet ; lexique : {1:.1f} µs/tweet (x{2:.1f})".format(
+        textblob_seconds / count * 1e6, lexicon_seconds / count * 1e6,
+        textblob_seconds / lexicon_seconds if lexicon_seconds else float("inf")))
+    disagreements = sorted((d for d in differences if d[0] > TOLERANCE), key=lambda d: -d[0])
+    for _, text, a, b in disagreements[:examples]:
+        print("  TextBlob {0:+.4f} / lexique {1:+.4f} : {2}".format(a, b, text[:100]))
+    return exact / count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construit et valide le lexique du scoreur de sentiment rapide")
+    parser.add_argument("--output", default=DEFAULT_LEXICON_PATH, help="fichier binaire du lexique")
+    parser.add_argument("--input", default=os.path.join(PROJECT_DIR, "data", "tweets_with_locations.json"),
+                        help="tweets de la comparaison avec TextBlob (JSON/JSONL/gzip ou dossier Parquet)")
+    parser.add_argument("--limit", type=int, default=None, help="nombre maximal de tweets comparés")
+    parser.add_argument("--validate-only", action="store_true", help="compare sans reconstruire le lexique")
+    parser.add_argument("--min-agreement", type=float, default=0.99,
+                        help="taux minimal de scores identiques (code de sortie 1 en dessous)")
+    args = parser.parse_args(argv)
+
+    if not args.validate_only:
+        count = write_lexicon(args.output, lexicon_entries())
+        print("Lexique écrit dans {0} : {1} entrées, {2} octets".format(
+            args.output, count, os.path.getsize(args.output)))
+    agreement = validate(args.output, args.input, args.limit)
+    if agreement < args.min_agreement:
+        print("Accord insuffisant : {0:.2%} < {1:.2%}".format(agreement, args.min_agreement))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Générateur déterministe de tweets synthétiques, au format de
+data/tweets_with_locations.json :
+
+    {"user_id": "user_35", "tweet_text": "...", "timestamp": "2024-04-03 10:24:53",
+     "hashtags": ["#AI"], "location": {"city": "Paris", "coordinates": [48.8566, 2.3522]}}
+
+Une même graine et les mêmes paramètres donnent toujours le même fichier.
+Paramètres : nombre de tweets, taille du vocabulaire de hashtags, asymétrie
+(exposant de Zipf des hashtags et des villes), nombre d'utilisateurs,
+période couverte, part de tweets en français et part de coordonnées
+incohérentes avec la ville.
+
+    python scripts/generate_tweets.py --count 1000000 --output data/synthetic_1m.jsonl.gz
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import random
+import sys
+from itertools import accumulate
+
+# Hashtags du jeu de données réel, complétés par #Tag10, #Tag11... au-delà
+BASE_HASHTAGS = ["#Analytics", "#MachineLearning", "#Hadoop", "#CloudComputing", "#IoT",
+                 "#AI", "#BigData", "#DataScience", "#Blockchain", "#MapReduce"]
+
+CITIES = [
+    ("New York", 40.7128, -74.006), ("São Paulo", -23.5505, -46.6333),
+    ("Sydney", -33.8688, 151.2093), ("Dubai", 25.2048, 55.2708),
+    ("Paris", 48.8566, 2.3522), ("London", 51.5074, -0.1278),
+    ("Tokyo", 35.6895, 139.6917), ("San Francisco", 37.7749, -122.4194),
+    ("Mumbai", 19.076, 72.8777), ("Berlin", 52.52, 13.405),
+]
+
+TEMPLATES_EN = [
+    "A beginner's guide to understanding {0}. #Learning",
+    "Breaking down the myths surrounding {0} and its applications.",
+    "Can anyone explain the basics of {0}? Starting my journey.",
+    "Case study: successful implementation of {0} in a startup environment.",
+    "Challenges and opportunities in the adoption of {0}.",
+    "Exploring the potential of {0} in modern industries.",
+    "How {0} is revolutionizing the way we approach problems.",
+    "Just attended a fantastic seminar on {0}! Highly recommend.",
+    "The future is here with {0}. Exciting times ahead!",
+    "The role of {0} in achieving sustainable development goals.",
+]
+
+TEMPLATES_FR = [
+    "Un guide pour débuter avec {0}. #Apprentissage",
+    "Quels sont les vrais enjeux de {0} pour les entreprises ?",
+    "Superbe conférence sur {0} aujourd'hui, je recommande vivement !",
+    "Retour d'expérience : déploiement de {0} dans une startup.",
+    "{0} va transformer notre façon de travailler. Époque passionnante !",
+]
+
+
+def zipf_cumulative_weights(size, skew):
+    """Poids cumulés d'une loi de Zipf d'exposant `skew` (0 = uniforme)."""
+    return list(accumulate(1.0 / (rank + 1) ** skew for rank in range(size)))
+
+
+def generate_tweets(count, seed=42, vocabulary=len(BASE_HASHTAGS), skew=1.0, users=50,
+                    start="2024-01-01", days=365, french=0.0, noise=0.0):
+    """
+    Génère `count` tweets (générateur) aux horodatages croissants répartis sur
+    `days` jours à partir de `start`.
+    """
+    rng = random.Random(seed)
+    hashtags = BASE_HASHTAGS[:vocabulary] + ["#Tag{0}".format(i)
+                                             for i in range(len(BASE_HASHTAGS), vocabulary)]
+    hashtag_weights = zipf_cumulative_weights(len(hashtags), skew)
+    city_weights = zipf_cumulative_weights(len(CITIES), skew)
+    start_time = datetime.datetime.strptime(start, "%Y-%m-%d")
+    step = days * 86400 / max(1, count)
+    # Les horodatages se répètent souvent d'un tweet au suivant : formatage mémoïsé
+    last_second, last_timestamp = None, None
+
+    for index in range(count):
+        second = int(index * step)
+        if second != last_second:
+            last_second = second
+            last_timestamp = (start_time + datetime.timedelta(seconds=second)).strftime("%Y-%m-%d %H:%M:%S")
+
+        tags = rng.choices(hashtags, cum_weights=hashtag_weights, k=rng.randint(1, 3))
+        templates = TEMPLATES_FR if rng.random() < french else TEMPLATES_EN
+        text = rng.choice(templates).format(tags[0])
+        extra = rng.choices(hashtags, cum_weights=hashtag_weights, k=rng.randint(0, 2))
+        text = text + " " + " ".join(extra)
+
+        city, lat, lon = rng.choices(CITIES, cum_weights=city_weights)[0]
+        if rng.random() < noise:
+            # Coordonnées sans rapport avec la ville déclarée
+            lat, lon = round(rng.uniform(-60.0, 70.0), 4), round(rng.uniform(-180.0, 180.0), 4)
+
+        yield {
+            "user_id": "user_{0}".format(rng.randint(1, users)),
+            "tweet_text": text,
+            "timestamp": last_timestamp,
+            "hashtags": tags,
+            "location": {"city": city, "coordinates": [lat, lon]},
+        }
+
+
+def write_tweets(tweets, path, output_format="jsonl"):
+    """
+    Écrit les tweets en flux : JSONL (un tweet par ligne) ou tableau JSON
+    indenté comme le fichier d'origine. `path` est un chemin (compression
+    gzip s'il finit par .gz) ou un fichier texte ouvert (sys.stdout...).
+    """
+    if not isinstance(path, str):
+        return _write_tweets(tweets, path, output_format)
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as file:
+        return _write_tweets(tweets, file, output_format)
+
+
+def _write_tweets(tweets, file, output_format):
+    count = 0
+    if output_format == "json":
+        file.write("[")
+    for tweet in tweets:
+        if output_format == "json":
+            file.write("\n  " if count == 0 else ",\n  ")
+            file.write(json.dumps(tweet, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+        else:
+            file.write(json.dumps(tweet, ensure_ascii=False))
+            file.write("\n")
+        count += 1
+    if output_format == "json":
+        file.write("\n]" if count else "]")
+    return count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Génère des tweets synthétiques reproductibles")
+    parser.add_argument("--count", type=int, default=10000, help="nombre de tweets")
+    parser.add_argument("--output", default="-", help="fichier de sortie (.gz : gzip ; - : sortie standard)")
+    parser.add_argument("--format", choices=["jsonl", "json"], default="jsonl",
+                        help="JSONL ou tableau JSON indenté")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--vocabulary", type=int, default=len(BASE_HASHTAGS),
+                        help="nombre de hashtags distincts")
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="exposant de Zipf des hashtags et des villes (0 = uniforme)")
+    parser.add_argument("--users", type=int, default=50, help="nombre d'utilisateurs distincts")
+    parser.add_argument("--start", default="2024-01-01", help="date du premier tweet")
+    parser.add_argument("--days", type=int, default=365, help="nombre de jours couverts")
+    parser.add_argument("--french", type=float, default=0.0, help="part de tweets en français")
+    parser.add_argument("--noise", type=float, default=0.0,
+                        help="part de tweets dont les coordonnées contredisent la ville")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    tweets = generate_tweets(args.count, args.seed, args.vocabulary, args.skew, args.users,
+                             args.start, args.days, args.french, args.noise)
+    if args.output == "-":
+        write_tweets(tweets, sys.stdout, args.format)
+        return
+    count = write_tweets(tweets, args.output, args.format)
+    print("{0} tweets écrits dans {1}".format(count, args.output), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,8 +26,19 @@ Write-Host "Copie des scripts MapReduce dans le conteneur..." -ForegroundColor Y
 $scripts = @(
     "mapreduce/hashtag_mapper.py:/hashtag_mapper.py",
     "mapreduce/hashtag_reducer.py:/hashtag_reducer.py", 
+    "mapreduce/hashtag_combiner.py:/hashtag_combiner.py",
     "mapreduce/geo_sentiment_mapper.py:/geo_sentiment_mapper.py",
-    "mapreduce/geo_sentiment_reducer.py:/geo_sentiment_reducer.py"
+    "mapreduce/geo_sentiment_reducer.py:/geo_sentiment_reducer.py",
+    "mapreduce/geo_sentiment_combiner.py:/geo_sentiment_combiner.py",
+    "mapreduce/sentiment_scorer.py:/sentiment_scorer.py",
+    "mapreduce/time_buckets.py:/time_buckets.py",
+    "mapreduce/geo.py:/geo.py",
+    "mapreduce/metrics.py:/metrics.py",
+    "mapreduce/sketches.py:/sketches.py",
+    "mapreduce/topk.py:/topk.py",
+    "mapreduce/lexicon_sentiment.py:/lexicon_sentiment.py",
+    "mapreduce/sentiment_lexicon.bin:/sentiment_lexicon.bin",
+    "mapreduce/tweet_reader.py:/tweet_reader.py"
 )
 
 foreach ($script in $scripts) {
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Substitut local de la commande `hdfs` pour tester l'upload sans conteneur.
+
+Seules les opérations utilisées par prepare_tweets.py sont reconnues :
+    dfs -mkdir -p <dossier>...
+    dfs -put -f - <fichier>      (contenu lu sur l'entrée standard)
+
+Les chemins HDFS sont placés sous le dossier $LOCAL_HDFS_ROOT (défaut : local_hdfs).
+
+    TWEETS_HDFS_COMMAND="python scripts/local_hdfs.py" python scripts/prepare_tweets.py
+"""
+
+import os
+import shutil
+import sys
+
+ROOT_ENV_VAR = "LOCAL_HDFS_ROOT"
+
+
+def local_path(root, hdfs_path):
+    return os.path.join(root, hdfs_path.lstrip("/"))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    root = os.environ.get(ROOT_ENV_VAR, "local_hdfs")
+
+    if argv[:3] == ["dfs", "-mkdir", "-p"]:
+        for directory in argv[3:]:
+            os.makedirs(local_path(root, directory), exist_ok=True)
+        return 0
+
+    if argv[:4] == ["dfs", "-put", "-f", "-"] and len(argv) == 5:
+        target = local_path(root, argv[4])
+        if not os.path.isdir(os.path.dirname(target)):
+            print(f"put: `{argv[4]}': No such file or directory", file=sys.stderr)
+            return 1
+        with open(target, "wb") as file:
+            shutil.copyfileobj(sys.stdin.buffer, file)
+        return 0
+
+    print(f"Commande non prise en charge : {' '.join(argv)}", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,92 +1,652 @@
+import argparse
+import hashlib
 import json
-import datetime
 import os
+import queue
+import shlex
 import subprocess
+import sys
+import threading
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mapreduce"))
+from block_compression import CODECS, DEFAULT_BLOCK_SIZE, EXTENSIONS, BlockWriter, copy_head
+from metrics import peak_rss_mb
+from time_buckets import TimeBucketer
+from tweet_reader import TweetReader
+from tweet_record import TweetBatch
+from tweet_store import write_store
+
+PARTITION_MANIFEST = ".cache/prepared_partitions.json"
+
+# Commande HDFS (remplaçable par un substitut local, cf. scripts/local_hdfs.py)
+HDFS_COMMAND_ENV_VAR = "TWEETS_HDFS_COMMAND"
+DEFAULT_HDFS_COMMAND = "docker exec -i namenode hdfs"
+UPLOAD_WORKERS = 4
+UPLOAD_RETRIES = 3
+# Pipeline en flux : taille des lots et des files entre étapes
+PIPELINE_CHUNK_SIZE = 1000
+PIPELINE_QUEUE_SIZE = 8
+# Un mois est complet dès qu'un tweet daté d'au moins ce nombre de mois plus tard est lu
+SEAL_AFTER_MONTHS = 1
+# Fichiers compressés : tweets sérialisés ensemble entre deux frontières de bloc possibles
+RECORDS_PER_BLOCK_WRITE = 100
 
 def load_tweets(file_path="data/tweets_with_locations.json"):
-    """Charge les tweets depuis un fichier JSON ou JSONL."""
+    """
+    Ouvre un lecteur en flux sur un fichier JSON, JSONL ou gzip.
+    Les tweets sont décodés au fur et à mesure de l'itération.
+    """
     print("Lecture du fichier de tweets...")
-    with open(file_path, 'r', encoding='utf-8') as file:
-        try:
-            tweets = json.load(file)
-        except json.JSONDecodeError:
-            # Fallback pour format JSONL
-            file.seek(0)
-            tweets = [json.loads(line.strip()) for line in file if line.strip()]
-    
-    print(f"Nombre de tweets chargés: {len(tweets)}")
-    return tweets
+    return TweetReader(file_path)
 
 def organize_tweets_by_month(tweets):
-    """Organise les tweets par année/mois."""
+    """
+    Organise les tweets par année/mois. Chaque mois est un lot compact en
+    colonnes (TweetBatch) plutôt qu'une liste de dictionnaires imbriqués.
+    """
     print("Organisation des tweets par mois...")
-    tweets_by_month = defaultdict(list)
+    tweets_by_month = defaultdict(TweetBatch)
+    bucketer = TimeBucketer("month")
     
     for tweet in tweets:
         if "timestamp" not in tweet:
             continue
             
         try:
-            created_at = datetime.datetime.strptime(tweet["timestamp"], "%Y-%m-%d %H:%M:%S")
-            year_month = f"{created_at.year}/{created_at.month:02d}"
+            year_month = bucketer.key(tweet["timestamp"]).replace('-', '/')
             tweets_by_month[year_month].append(tweet)
         except Exception as e:
             print(f"Erreur de parsing de date: {e}")
     
+    if isinstance(tweets, TweetReader):
+        print(f"Nombre de tweets chargés: {tweets.count}")
     return tweets_by_month
 
-def write_tweets_to_local_files(tweets_by_month):
-    """Écrit les tweets dans des fichiers locaux organisés par mois."""
+def load_partition_manifest(path=PARTITION_MANIFEST):
+    """Hash du contenu de chaque mois lors de la dernière préparation ({année/mois: hash})."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def save_partition_manifest(manifest, path=PARTITION_MANIFEST):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+class HashingWriter:
+    """Fichier binaire ouvert en écriture texte : le hash sha256 du contenu est calculé au fil de l'écriture."""
+
+    def __init__(self, file):
+        self.file = file
+        self.digest = hashlib.sha256()
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.digest.update(data)
+        self.file.write(data)
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
+
+def write_tweets_to_local_files(tweets_by_month, incremental=False):
+    """
+    Écrit les tweets dans des fichiers locaux organisés par mois. Chaque mois
+    (TweetBatch ou liste de tweets) est sérialisé directement dans le fichier,
+    sans construire la chaîne complète, et son hash est calculé pendant
+    l'écriture.
+    En mode incrémental, les mois dont le contenu n'a pas changé depuis la
+    dernière préparation ne sont ni remplacés ni renvoyés.
+    Renvoie {année/mois: hash du contenu} pour les mois écrits.
+    """
     print("Écriture des tweets dans des fichiers par mois...")
     os.makedirs("tweets_by_month", exist_ok=True)
+    manifest = load_partition_manifest() if incremental else {}
+    written = {}
     
     for year_month, month_tweets in tweets_by_month.items():
         year, month = year_month.split('/')
         directory = f"tweets_by_month/{year}/{month}"
         os.makedirs(directory, exist_ok=True)
+        path = f"{directory}/tweets.json"
         
-        with open(f"{directory}/tweets.json", 'w', encoding='utf-8') as file:
-            json.dump(month_tweets, file, ensure_ascii=False, indent=2)
+        # Écriture dans un fichier temporaire : le fichier publié n'est
+        # remplacé que si le contenu a changé
+        with open(path + ".part", 'wb') as file:
+            writer = HashingWriter(file)
+            if isinstance(month_tweets, TweetBatch):
+                # Sérialisé depuis les colonnes, par tranches, sans liste de dictionnaires
+                month_tweets.write_json(writer)
+            else:
+                json.dump(month_tweets, writer, ensure_ascii=False, indent=2)
+        content_hash = writer.hexdigest()
+        if incremental and manifest.get(year_month) == content_hash:
+            os.remove(path + ".part")
+            print(f"Inchangé depuis la dernière préparation : {year_month}")
+            continue
+        os.replace(path + ".part", path)
         
+        written[year_month] = content_hash
         print(f"Écrit {len(month_tweets)} tweets pour {year_month}")
-
-def upload_tweets_to_hdfs(tweets_by_month):
-    """Upload les fichiers de tweets dans HDFS."""
-    print("Création du répertoire /tweets dans HDFS...")
-    subprocess.run(["docker", "exec", "namenode", "hdfs", "dfs", "-mkdir", "-p", "/tweets"])
     
-    print("Copie des tweets vers HDFS...")
-    for year_month in tweets_by_month.keys():
-        year, month = year_month.split('/')
-        
-        # Créer la structure de dossiers dans HDFS
-        subprocess.run(["docker", "exec", "namenode", "hdfs", "dfs", "-mkdir", "-p", f"/tweets/{year}/{month}"])
-        
-        # Chemin des fichiers
-        local_path = f"tweets_by_month/{year}/{month}/tweets.json"
-        
-        # Utiliser la méthode directe pour transférer vers HDFS
+    return written
+
+def hdfs_command(command=None):
+    """Préfixe de la commande HDFS : argument, variable d'environnement ou conteneur namenode."""
+    return shlex.split(command or os.environ.get(HDFS_COMMAND_ENV_VAR) or DEFAULT_HDFS_COMMAND)
+
+def put_file(hdfs, local_path, hdfs_path, retries=UPLOAD_RETRIES):
+    """
+    Envoie un fichier vers HDFS en flux (le fichier est passé en entrée
+    standard, sans être chargé en mémoire). Réessaie en cas d'échec.
+    """
+    for attempt in range(1, retries + 1):
         with open(local_path, 'rb') as f:
+            result = subprocess.run(hdfs + ["dfs", "-put", "-f", "-", hdfs_path],
+                                    stdin=f, stderr=subprocess.PIPE)
+        if result.returncode == 0:
+            return attempt
+        if attempt < retries:
+            print(f"Échec de l'envoi de {local_path} (tentative {attempt}/{retries}), nouvel essai...")
+            time.sleep(2 ** (attempt - 1))
+    raise RuntimeError(f"Échec de l'envoi de {local_path} vers {hdfs_path} : "
+                       f"{result.stderr.decode('utf-8', 'replace').strip()}")
+
+def upload_tweets_to_hdfs(tweets_by_month, command=None, workers=UPLOAD_WORKERS, retries=UPLOAD_RETRIES):
+    """
+    Upload les fichiers de tweets dans HDFS.
+    Tous les dossiers sont créés en un seul appel, puis les fichiers sont
+    envoyés en parallèle par `workers` threads (un processus HDFS par fichier).
+    """
+    hdfs = hdfs_command(command)
+    months = [year_month.split('/') for year_month in tweets_by_month.keys()]
+    
+    print("Création des répertoires dans HDFS...")
+    directories = ["/tweets"] + [f"/tweets/{year}/{month}" for year, month in months]
+    subprocess.run(hdfs + ["dfs", "-mkdir", "-p"] + directories, check=True)
+    
+    print(f"Copie des tweets vers HDFS ({workers} envois en parallèle)...")
+    start = time.perf_counter()
+    failures = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for year, month in months:
+            local_path = f"tweets_by_month/{year}/{month}/tweets.json"
             hdfs_path = f"/tweets/{year}/{month}/tweets.json"
-            cmd = ["docker", "exec", "-i", "namenode", "hdfs", "dfs", "-put", "-f", "-", hdfs_path]
-            subprocess.run(cmd, input=f.read())
+            futures[executor.submit(put_file, hdfs, local_path, hdfs_path, retries)] = f"{year}/{month}"
         
-        print(f"Tweets pour {year_month} copiés vers HDFS")
+        for future in as_completed(futures):
+            year_month = futures[future]
+            try:
+                future.result()
+                print(f"Tweets pour {year_month} copiés vers HDFS")
+            except Exception as e:
+                print(f"Erreur : {e}")
+                failures.append(year_month)
+    
+    print(f"Envoi terminé en {time.perf_counter() - start:.2f} s")
+    if failures:
+        raise RuntimeError(f"Mois non envoyés vers HDFS : {', '.join(sorted(failures))}")
+
+class PipelineStopped(Exception):
+    """Une autre étape a échoué : l'étape courante s'arrête."""
+
+class Pipeline:
+    """
+    Étapes exécutées dans des threads et reliées par des files bornées :
+    une étape trop rapide attend que la suivante ait consommé (contre-pression),
+    la mémoire dépend de la taille des files et non du volume de données.
+    La première erreur arrête toutes les étapes et est relancée par `join`.
+    """
+
+    def __init__(self):
+        self.stop = threading.Event()
+        self.threads = []
+        self.errors = []
+        self.waits = defaultdict(float)
+        self.durations = {}
+
+    def _wait(self, operation, *args):
+        start = time.perf_counter()
+        try:
+            while True:
+                if self.stop.is_set():
+                    raise PipelineStopped()
+                try:
+                    return operation(*args, timeout=0.1)
+                except (queue.Full, queue.Empty):
+                    continue
+        finally:
+            self.waits[threading.current_thread().name] += time.perf_counter() - start
+
+    def put(self, channel, item):
+        self._wait(channel.put, item)
+
+    def wait_event(self, event):
+        """Attend qu'une autre étape signale `event`."""
+        start = time.perf_counter()
+        try:
+            while not event.wait(0.1):
+                if self.stop.is_set():
+                    raise PipelineStopped()
+        finally:
+            self.waits[threading.current_thread().name] += time.perf_counter() - start
+
+    def get(self, channel):
+        return self._wait(channel.get)
 
-def main():
+    def start(self, name, target, *args):
+        def run():
+            start = time.perf_counter()
+            try:
+                target(*args)
+            except PipelineStopped:
+                pass
+            except BaseException as e:
+                self.errors.append(e)
+                self.stop.set()
+            finally:
+                self.durations[name] = time.perf_counter() - start
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+def month_index(year_month):
+    year, month = year_month.split('/')
+    return int(year) * 12 + int(month)
+
+class MonthWriter:
+    """
+    Fichier d'un mois écrit au fil de l'eau, octet pour octet identique à
+    json.dumps(tweets, ensure_ascii=False, indent=2), ou compressé par blocs
+    découpables (block_compression.py). Le hash du contenu est calculé
+    pendant l'écriture.
+
+    Un mois est « scellé » (crochet final écrit, fichier fermé) dès qu'il est
+    considéré comme complet ; si un tweet en retard arrive ensuite, le
+    fichier est rouvert : la fin est tronquée et l'écriture reprend. Un
+    fichier déjà publié n'est jamais modifié en place (il peut être en
+    cours d'envoi) : l'écriture reprend dans un nouveau `.part`.
+    """
+
+    def __init__(self, path, compression=None, block_size=DEFAULT_BLOCK_SIZE):
+        self.path = path
+        self.current_path = path + ".part"
+        self.compression = compression
+        self.digest = hashlib.sha256()
+        self.count = 0
+        self.size = 0
+        self.body_size = 0
+        self.sealed = False
+        self._written = 0
+        if compression is None:
+            self.blocks = None
+            self.file = open(self.current_path, 'wb')
+        else:
+            self.blocks = BlockWriter(self.current_path, compression, block_size)
+            self.file = None
+        self._write(b"[")
+
+    @property
+    def written(self):
+        """Octets écrits sur le disque, réécritures comprises."""
+        return self._written if self.blocks is None else self.blocks.written
+
+    def _write(self, data):
+        # Chaque écriture se termine entre deux tweets : frontière de bloc possible
+        self.digest.update(data)
+        if self.blocks is not None:
+            self.blocks.write(data)
+        else:
+            self.file.write(data)
+            self._written += len(data)
+        self.size += len(data)
+
+    def add(self, tweets):
+        """Ajoute une liste de tweets (un appel à json.dumps par lot)."""
+        step = len(tweets) if self.blocks is None else RECORDS_PER_BLOCK_WRITE
+        for start in range(0, len(tweets), step or 1):
+            batch = tweets[start:start + step]
+            # "[\n  t1,\n  t2\n]" sans les crochets : "  t1,\n  t2"
+            text = json.dumps(batch, ensure_ascii=False, indent=2)[2:-2]
+            self._write(((",\n" if self.count else "\n") + text).encode('utf-8'))
+            self.count += len(batch)
+
+    def seal(self):
+        """Termine le fichier ; renvoie le hash du contenu."""
+        tail = b"\n]" if self.count else b"]"
+        digest = self.digest.copy()
+        digest.update(tail)
+        self.body_size = self.size
+        if self.blocks is not None:
+            # Le dernier bloc reste en mémoire : il est réécrit si le mois est rouvert
+            self.blocks.close(tail)
+        else:
+            self.file.write(tail)
+            self._written += len(tail)
+            self.file.close()
+            self.file = None
+        self.sealed = True
+        content_hash = digest.hexdigest()
+        return content_hash if self.compression is None else f"{self.compression}:{content_hash}"
+
+    def reopen(self):
+        published = self.current_path == self.path
+        if published:
+            # Contenu conservé (sans le crochet final ni, compressé, le dernier bloc) recopié
+            self.current_path = self.path + ".part"
+        if self.blocks is not None:
+            self.blocks.reopen(self.current_path)
+        elif published:
+            self.file = open(self.current_path, 'wb')
+            self._written += copy_head(self.path, self.file, self.body_size)
+        else:
+            self.file = open(self.current_path, 'r+b')
+            self.file.seek(self.body_size)
+            self.file.truncate()
+        self.sealed = False
+
+    def publish(self):
+        """Remplace le fichier final (et son index) par le fichier écrit."""
+        if self.current_path == self.path:
+            return
+        if self.blocks is not None:
+            self.blocks.rename(self.path)
+        else:
+            os.replace(self.current_path, self.path)
+        self.current_path = self.path
+
+    def discard(self):
+        """Ferme le fichier ; le supprime s'il n'a pas été publié."""
+        unpublished = self.current_path != self.path
+        if self.blocks is not None:
+            if unpublished:
+                self.blocks.remove()
+            elif self.blocks.file is not None:
+                self.blocks.file.close()
+            return
+        if self.file is not None:
+            self.file.close()
+        if unpublished and os.path.exists(self.current_path):
+            os.remove(self.current_path)
+
+def read_stage(pipeline, tweets, output, chunk_size):
+    """Décodage JSON : lots de `chunk_size` tweets."""
+    chunk = []
+    for tweet in tweets:
+        chunk.append(tweet)
+        if len(chunk) >= chunk_size:
+            pipeline.put(output, chunk)
+            chunk = []
+    if chunk:
+        pipeline.put(output, chunk)
+    pipeline.put(output, None)
+
+def partition_stage(pipeline, source, output, seal_after):
+    """
+    Répartition par mois. Un mois est déclaré complet dès qu'un tweet daté
+    d'au moins `seal_after` mois plus tard est lu (0 : seulement à la fin).
+    """
+    bucketer = TimeBucketer("month")
+    open_months = set()
+    latest = None
+    while True:
+        chunk = pipeline.get(source)
+        if chunk is None:
+            break
+        groups = {}
+        for tweet in chunk:
+            if "timestamp" not in tweet:
+                continue
+            try:
+                year_month = bucketer.key(tweet["timestamp"]).replace('-', '/')
+            except Exception as e:
+                print(f"Erreur de parsing de date: {e}")
+                continue
+            groups.setdefault(year_month, []).append(tweet)
+        pipeline.put(output, ("tweets", groups))
+        open_months.update(groups)
+        if seal_after and groups:
+            latest = max([latest or 0] + [month_index(year_month) for year_month in groups])
+            for year_month in sorted(open_months):
+                if latest - month_index(year_month) >= seal_after:
+                    open_months.discard(year_month)
+                    pipeline.put(output, ("seal", year_month))
+    for year_month in sorted(open_months):
+        pipeline.put(output, ("seal", year_month))
+    pipeline.put(output, None)
+
+def write_stage(pipeline, source, output, state, compression, incremental, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Écriture des fichiers par mois ; chaque mois scellé dont le contenu a
+    changé (ou tous, hors mode incrémental) est transmis à l'envoi HDFS.
+    """
+    manifest = load_partition_manifest() if incremental else {}
+    writers = state["writers"]
+    file_name = "tweets.json" + EXTENSIONS.get(compression, "")
+    try:
+        while True:
+            message = pipeline.get(source)
+            if message is None:
+                break
+            kind, payload = message
+            if kind == "tweets":
+                for year_month, tweets in payload.items():
+                    writer = writers.get(year_month)
+                    if writer is None:
+                        directory = f"tweets_by_month/{year_month}"
+                        os.makedirs(directory, exist_ok=True)
+                        writer = writers[year_month] = MonthWriter(f"{directory}/{file_name}", compression, block_size)
+                    elif writer.sealed:
+                        # Tweets en retard : le mois sera réécrit et renvoyé
+                        writer.reopen()
+                        state["reopened"] += 1
+                    writer.add(tweets)
+                    state["tweets"] += len(tweets)
+                continue
+
+            year_month = payload
+            writer = writers[year_month]
+            content_hash = writer.seal()
+            if content_hash == state["published"].get(year_month, manifest.get(year_month)):
+                print(f"Inchangé depuis la dernière préparation : {year_month}")
+                continue
+            uploads = state.get("uploads")
+            if uploads is not None:
+                # Un mois renvoyé (tweets en retard) ne remplace le fichier
+                # publié qu'une fois son envoi précédent terminé
+                if year_month in uploads:
+                    pipeline.wait_event(uploads[year_month])
+                uploads[year_month] = threading.Event()
+            writer.publish()
+            state["published"][year_month] = content_hash
+            print(f"Écrit {writer.count} tweets pour {year_month}")
+            pipeline.put(output, (year_month, writer.path, f"/tweets/{year_month}/{file_name}"))
+    finally:
+        for writer in writers.values():
+            state["bytes"] += writer.written
+            writer.discard()
+        pipeline.put(output, None)
+
+def upload_stage(pipeline, source, state, command, workers, retries):
+    """
+    Envoi HDFS des mois scellés, `workers` fichiers à la fois. Les dossiers
+    des mois en attente sont créés en un seul appel.
+    """
+    hdfs = hdfs_command(command)
+    created = set()
+    pending = {}
+    failures = state["failures"]
+
+    def wait(year_month):
+        try:
+            pending.pop(year_month).result()
+            print(f"Tweets pour {year_month} copiés vers HDFS")
+        except Exception as e:
+            print(f"Erreur : {e}")
+            failures.add(year_month)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        finished = False
+        while not finished:
+            batch = [pipeline.get(source)]
+            while True:
+                try:
+                    batch.append(source.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                finished = True
+            batch = [item for item in batch if item is not None]
+            directories = sorted({f"/tweets/{year_month}" for year_month, _, _ in batch} - created)
+            if directories:
+                subprocess.run(hdfs + ["dfs", "-mkdir", "-p"] + (["/tweets"] if not created else []) + directories,
+                               check=True)
+                created.update(directories)
+            for year_month, local_path, hdfs_path in batch:
+                # Un mois renvoyé (tweets en retard) attend la fin de son envoi précédent
+                if year_month in pending:
+                    wait(year_month)
+                failures.discard(year_month)
+                pending[year_month] = executor.submit(put_file, hdfs, local_path, hdfs_path, retries)
+                # Signale la fin de l'envoi à l'écriture, qui peut alors republier le mois
+                uploaded = state["uploads"][year_month]
+                pending[year_month].add_done_callback(lambda _, uploaded=uploaded: uploaded.set())
+            for year_month in [year_month for year_month, future in pending.items() if future.done()]:
+                wait(year_month)
+        for year_month in list(pending):
+            wait(year_month)
+
+def run_pipeline(tweets, command=None, workers=UPLOAD_WORKERS, retries=UPLOAD_RETRIES, compression=None,
+                 incremental=False, seal_after=SEAL_AFTER_MONTHS, queue_size=PIPELINE_QUEUE_SIZE,
+                 chunk_size=PIPELINE_CHUNK_SIZE, upload=True, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Lecture, répartition par mois, écriture et envoi HDFS en étapes
+    concurrentes. Renvoie {année/mois: hash du contenu} des mois écrits.
+    """
+    print(f"Préparation en flux (files de {queue_size} lots de {chunk_size} tweets)...")
+    os.makedirs("tweets_by_month", exist_ok=True)
+    state = {"writers": {}, "published": {}, "failures": set(), "tweets": 0, "bytes": 0, "reopened": 0,
+             # Fin de l'envoi en cours de chaque mois publié (sans étape d'envoi : None)
+             "uploads": {} if upload else None}
+    pipeline = Pipeline()
+    parsed = queue.Queue(maxsize=queue_size)
+    partitioned = queue.Queue(maxsize=queue_size)
+    sealed = queue.Queue()
+    start = time.perf_counter()
+    pipeline.start("lecture", read_stage, pipeline, tweets, parsed, chunk_size)
+    pipeline.start("répartition", partition_stage, pipeline, parsed, partitioned, seal_after)
+    pipeline.start("écriture", write_stage, pipeline, partitioned, sealed, state, compression, incremental,
+                   block_size)
+    if upload:
+        pipeline.start("envoi", upload_stage, pipeline, sealed, state, command, workers, retries)
+    pipeline.join()
+    elapsed = time.perf_counter() - start
+
+    if isinstance(tweets, TweetReader):
+        print(f"Nombre de tweets chargés: {tweets.count}")
+    rate = state["tweets"] / elapsed if elapsed else 0.0
+    print(f"Pipeline : {state['tweets']} tweets en {elapsed:.2f} s ({rate:.0f} tweets/s, "
+          f"{state['bytes'] / elapsed / 1e6 if elapsed else 0.0:.1f} Mo/s écrits)")
+    for name, duration in pipeline.durations.items():
+        print(f"  {name} : {duration - pipeline.waits[name]:.2f} s actif, {pipeline.waits[name]:.2f} s en attente")
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"  pic de mémoire : {peak:.0f} Mo")
+    if state["reopened"]:
+        print(f"  {state['reopened']} réouvertures de mois par des tweets en retard "
+              f"(données peu triées : augmenter --seal-after ou mettre 0)")
+    if state["failures"]:
+        raise RuntimeError(f"Mois non envoyés vers HDFS : {', '.join(sorted(state['failures']))}")
+    return state["published"]
+
+def write_tweets_to_parquet(tweets, output_dir, partition_by_city=False):
+    """Écrit les tweets en Parquet partitionné (année/mois, et ville en option)."""
+    print(f"Écriture des tweets au format Parquet dans {output_dir}...")
+    write_store(tweets, output_dir, partition_by_city=partition_by_city)
+    print(f"Écrit {tweets.count} tweets")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prépare les tweets par mois pour HDFS")
+    parser.add_argument("--input", default="data/tweets_with_locations.json",
+                        help="fichier de tweets (JSON, JSONL ou gzip)")
+    parser.add_argument("--format", choices=["json", "parquet"], default="json",
+                        help="json : tweets_by_month/AAAA/MM/tweets.json puis upload HDFS ; "
+                             "parquet : stockage colonnaire partitionné local")
+    parser.add_argument("--output", default="tweets_store",
+                        help="dossier du stockage Parquet")
+    parser.add_argument("--partition-by-city", action="store_true",
+                        help="ajoute la ville aux partitions Parquet")
+    parser.add_argument("--incremental", action="store_true",
+                        help="n'écrit et n'envoie vers HDFS que les mois nouveaux ou modifiés")
+    parser.add_argument("--hdfs-command", default=None,
+                        help="commande HDFS à utiliser (défaut : $TWEETS_HDFS_COMMAND ou "
+                             f"'{DEFAULT_HDFS_COMMAND}')")
+    parser.add_argument("--upload-workers", type=int, default=UPLOAD_WORKERS,
+                        help="nombre d'envois HDFS simultanés")
+    parser.add_argument("--upload-retries", type=int, default=UPLOAD_RETRIES,
+                        help="nombre de tentatives par fichier")
+    parser.add_argument("--sequential", action="store_true",
+                        help="lecture, répartition, écriture puis envoi l'un après l'autre (tout en mémoire)")
+    parser.add_argument("--compress", choices=CODECS, default=None,
+                        help="fichiers mensuels compressés par blocs découpables "
+                             "(tweets.json.gz ou tweets.json.bz2, index des blocs dans <fichier>.idx)")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE,
+                        help="taille d'un bloc compressé avant compression, en octets")
+    parser.add_argument("--queue-size", type=int, default=PIPELINE_QUEUE_SIZE,
+                        help="nombre de lots en attente entre deux étapes du pipeline")
+    parser.add_argument("--chunk-size", type=int, default=PIPELINE_CHUNK_SIZE,
+                        help="nombre de tweets par lot du pipeline")
+    parser.add_argument("--seal-after", type=int, default=SEAL_AFTER_MONTHS,
+                        help="un mois est écrit et envoyé dès qu'un tweet daté d'au moins N mois "
+                             "plus tard est lu (0 : à la fin de la lecture)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Fonction principale pour préparer les tweets pour HDFS."""
+    args = parse_args(argv)
+    
     # Charger les tweets
-    tweets = load_tweets("data/tweets_with_locations.json")
+    tweets = load_tweets(args.input)
     
-    # Organiser par mois
-    tweets_by_month = organize_tweets_by_month(tweets)
+    if args.format == "parquet":
+        write_tweets_to_parquet(tweets, args.output, args.partition_by_city)
+        print("Préparation des données terminée !")
+        print(f"Les analyses peuvent lire ce stockage avec --input {args.output}")
+        return
     
-    # Écrire dans des fichiers locaux
-    write_tweets_to_local_files(tweets_by_month)
+    if args.sequential:
+        if args.compress:
+            sys.exit("--compress n'est disponible qu'avec le pipeline en flux")
+        # Organiser par mois
+        tweets_by_month = organize_tweets_by_month(tweets)
+        
+        # Écrire dans des fichiers locaux (seulement les mois modifiés en mode incrémental)
+        written = write_tweets_to_local_files(tweets_by_month, incremental=args.incremental)
+        
+        # Uploader vers HDFS
+        if written:
+            upload_tweets_to_hdfs(written, args.hdfs_command, args.upload_workers, args.upload_retries)
+    else:
+        # Lecture, répartition, écriture et envoi en parallèle, mémoire bornée par les files
+        written = run_pipeline(tweets, args.hdfs_command, args.upload_workers, args.upload_retries,
+                               args.compress, args.incremental, args.seal_after, args.queue_size,
+                               args.chunk_size, block_size=args.block_size)
     
-    # Uploader vers HDFS
-    upload_tweets_to_hdfs(tweets_by_month)
+    # Le manifeste n'est mis à jour qu'une fois l'envoi terminé
+    if args.incremental:
+        manifest = load_partition_manifest()
+        manifest.update(written)
+        save_partition_manifest(manifest)
     
     print("Préparation des données terminée !")
     print("Vous pouvez maintenant vérifier la structure sur l'interface HDFS: http://localhost:9870")
@@ -1,5 +1,10 @@
 # Script PowerShell pour exécuter les analyses MapReduce dans Hadoop
 
+# Les pipelines échangent de l'UTF-8 avec les conteneurs : sans ces réglages,
+# les noms accentués sont abîmés ("São Paulo" devient "S??o Paulo")
+[Console]::OutputEncoding = [System.Text.Encoding]::UTF8
+$OutputEncoding = [System.Text.Encoding]::UTF8
+
 function Setup-Environment {
     # Vérifier si l'environnement est déjà configuré
     $pythonCheck = docker exec namenode which python3 2>$null
@@ -14,15 +19,24 @@ function Setup-Environment {
     
     # Utiliser des chemins qui fonctionnent avec Docker CP
     $scriptDir = Join-Path $PWD.Path "mapreduce"
-    $utilsDir = Join-Path $PWD.Path "scripts"
     
     # Mapper les fichiers locaux aux chemins dans le conteneur
     $files = @(
         @{src = "$scriptDir/hashtag_mapper.py"; dest = "/hashtag_mapper.py"},
         @{src = "$scriptDir/hashtag_reducer.py"; dest = "/hashtag_reducer.py"},
+        @{src = "$scriptDir/hashtag_combiner.py"; dest = "/hashtag_combiner.py"},
         @{src = "$scriptDir/geo_sentiment_mapper.py"; dest = "/geo_sentiment_mapper.py"},
         @{src = "$scriptDir/geo_sentiment_reducer.py"; dest = "/geo_sentiment_reducer.py"},
-        @{src = "$utilsDir/json_converter.py"; dest = "/json_converter.py"}
+        @{src = "$scriptDir/geo_sentiment_combiner.py"; dest = "/geo_sentiment_combiner.py"},
+        @{src = "$scriptDir/sentiment_scorer.py"; dest = "/sentiment_scorer.py"},
+        @{src = "$scriptDir/time_buckets.py"; dest = "/time_buckets.py"},
+        @{src = "$scriptDir/geo.py"; dest = "/geo.py"},
+        @{src = "$scriptDir/metrics.py"; dest = "/metrics.py"},
+        @{src = "$scriptDir/sketches.py"; dest = "/sketches.py"},
+        @{src = "$scriptDir/topk.py"; dest = "/topk.py"},
+        @{src = "$scriptDir/lexicon_sentiment.py"; dest = "/lexicon_sentiment.py"},
+        @{src = "$scriptDir/sentiment_lexicon.bin"; dest = "/sentiment_lexicon.bin"},
+        @{src = "$scriptDir/tweet_reader.py"; dest = "/tweet_reader.py"}
     )
     
     foreach ($file in $files) {
@@ -38,39 +52,58 @@ function Setup-Environment {
     }
 }
 
-function Run-MapReduce($name, $mapper, $reducer, $outputFile) {
+# Le fichier du mois peut être compressé (tweets.json.gz, tweets.json.bz2...) :
+# on le cherche par motif, sans l'index de blocs (.idx) ni un envoi en cours (.part)
+function Resolve-MonthInput($month) {
+    $candidates = docker exec namenode hdfs dfs -ls -C "/tweets/$month/tweets.json*" 2>$null |
+        Where-Object { $_ -notlike "*.idx" -and $_ -notlike "*.part" }
+    $inputFile = $candidates | Select-Object -First 1
+    if (-not $inputFile) {
+        Write-Host "Aucun fichier tweets.json* dans /tweets/$month sur HDFS. Veuillez d'abord exécuter python scripts/prepare_tweets.py" -ForegroundColor Red
+        exit 1
+    }
+    return $inputFile
+}
+
+# Sur le cluster, le combineur se passe à Hadoop Streaming avec l'option -combiner :
+#   hadoop jar hadoop-streaming.jar -input /tweets -output /out `
+#       -mapper hashtag_mapper.py -combiner hashtag_combiner.py -reducer hashtag_reducer.py
+function Run-MapReduce($name, $mapper, $combiner, $reducer, $outputFile, $inputFile) {
     Write-Host "Exécution de l'analyse $name..."
     
     # Vérifier que les fichiers sont présents dans le conteneur
     Write-Host "Vérification des scripts dans le conteneur..."
-    docker exec namenode ls -l $mapper $reducer /json_converter.py
+    docker exec namenode ls -l $mapper $combiner $reducer /tweet_reader.py /topk.py
     
-    # Afficher les premières lignes des tweets pour vérifier le format
-    Write-Host "Aperçu des données d'entrée:"
-    docker exec namenode hdfs dfs -cat /tweets/2024/04/tweets.json | docker exec -i namenode head -n 5
+    # Afficher les premières lignes des tweets pour vérifier le format (-text décompresse gzip/bz2)
+    Write-Host "Aperçu des données d'entrée ($inputFile):"
+    docker exec namenode hdfs dfs -text $inputFile | docker exec -i namenode head -n 5
     
     # Construction du pipeline MapReduce avec redirection de la sortie
     Write-Host "Exécution du pipeline MapReduce..."
-    $tempOutput = "temp_output_$name.txt"
+    $tempOutput = "/tmp/input_$name"
     
     # Exécuter chaque étape séparément pour un meilleur diagnostic
+    # L'entrée reste dans le conteneur : Get-Content abîmerait un fichier compressé
     Write-Host "Étape 1: Extraction des données depuis HDFS"
-    docker exec namenode hdfs dfs -cat /tweets/2024/04/tweets.json > $tempOutput
-    
-    Write-Host "Étape 2: Conversion du format JSON"
-    Get-Content $tempOutput | docker exec -i namenode python3 /json_converter.py > "converted_$name.txt"
+    docker exec namenode hdfs dfs -get -f $inputFile $tempOutput
     
-    Write-Host "Étape 3: Exécution du mappeur"
-    Get-Content "converted_$name.txt" | docker exec -i namenode python3 $mapper > "mapper_output_$name.txt"
+    # Les mappeurs lisent directement le tableau JSON indenté et détectent gzip/bz2 sur l'entrée standard
+    Write-Host "Étape 2: Exécution du mappeur"
+    docker exec -e PYTHONIOENCODING=utf-8 namenode sh -c "python3 $mapper < $tempOutput" > "mapper_output_$name.txt"
     
-    Write-Host "Étape 4: Tri des résultats"
+    Write-Host "Étape 3: Tri des résultats"
     Get-Content "mapper_output_$name.txt" | docker exec -i namenode sort > "sorted_output_$name.txt"
     
+    Write-Host "Étape 4: Exécution du combineur"
+    Get-Content "sorted_output_$name.txt" | docker exec -i -e PYTHONIOENCODING=utf-8 namenode python3 $combiner > "combined_output_$name.txt"
+    
     Write-Host "Étape 5: Exécution du réducteur"
-    Get-Content "sorted_output_$name.txt" | docker exec -i namenode python3 $reducer > $outputFile
+    Get-Content "combined_output_$name.txt" | docker exec -i -e PYTHONIOENCODING=utf-8 namenode python3 $reducer > $outputFile
     
     # Nettoyage des fichiers temporaires
-    Remove-Item $tempOutput, "mapper_output_$name.txt", "sorted_output_$name.txt" -ErrorAction SilentlyContinue
+    docker exec namenode rm -f $tempOutput
+    Remove-Item "mapper_output_$name.txt", "sorted_output_$name.txt", "combined_output_$name.txt" -ErrorAction SilentlyContinue
     
     Write-Host "Résultats de $name disponibles dans: $outputFile"
 }
@@ -79,13 +112,14 @@ function Run-MapReduce($name, $mapper, $reducer, $outputFile) {
 Setup-Environment
 
 # Exécution des analyses MapReduce
+$inputFile = Resolve-MonthInput "2024/04"
 $analyses = @(
-    @{name="Hashtag"; mapper="/hashtag_mapper.py"; reducer="/hashtag_reducer.py"; output="hashtag_results.txt"},
-    @{name="Sentiment"; mapper="/geo_sentiment_mapper.py"; reducer="/geo_sentiment_reducer.py"; output="geo_sentiment_results.txt"}
+    @{name="Hashtag"; mapper="/hashtag_mapper.py"; combiner="/hashtag_combiner.py"; reducer="/hashtag_reducer.py"; output="hashtag_results.txt"},
+    @{name="Sentiment"; mapper="/geo_sentiment_mapper.py"; combiner="/geo_sentiment_combiner.py"; reducer="/geo_sentiment_reducer.py"; output="geo_sentiment_results.txt"}
 )
 
 foreach ($analysis in $analyses) {
-    Run-MapReduce $analysis.name $analysis.mapper $analysis.reducer $analysis.output
+    Run-MapReduce $analysis.name $analysis.mapper $analysis.combiner $analysis.reducer $analysis.output $inputFile
 }
 
 Write-Host "`nAnalyses terminées ! Pour stocker les résultats dans HDFS, utilisez les commandes suivantes :"
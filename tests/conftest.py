@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules de mapreduce/ s'importent entre eux directement (comme sous Hadoop Streaming)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mapreduce"))
@@ -0,0 +1,107 @@
+"""Résumés fusionnables : sérialisation, et fusion de deux moitiés comparée à un résumé unique."""
+
+import random
+
+import pytest
+
+from sketches import (CountMinSketch, DDSketch, HyperLogLog, Moments, SentimentSummary, dumps,
+                      loads, merge_lines, rollup_key, sketch_line)
+
+rng = random.Random(5)
+POLARITIES = [round(rng.uniform(-1, 1), 3) for _ in range(4000)] + [0.0] * 200
+USERS = ["user_{0}".format(rng.randint(0, 3000)) for _ in range(5000)]
+HASHTAGS = ["tag{0}".format(int(rng.paretovariate(1.2))) for _ in range(20000)]
+
+
+def split(values):
+    middle = len(values) // 3
+    return values[:middle], values[middle:]
+
+
+def build(cls, values, **options):
+    sketch = cls(**options)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+def merged(cls, values, **options):
+    first, second = split(values)
+    return build(cls, first, **options).merge(build(cls, second, **options))
+
+
+def test_ddsketch_merge_equals_single_sketch():
+    single = build(DDSketch, POLARITIES)
+    assert merged(DDSketch, POLARITIES).to_dict() == single.to_dict()
+    ordered = sorted(POLARITIES)
+    for q in (0.1, 0.5, 0.9):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert abs(single.quantile(q) - exact) <= 0.01 * abs(exact) + 1e-6
+
+
+@pytest.mark.parametrize("values", [USERS, USERS[:40]], ids=["dense", "sparse"])
+def test_hyperloglog_merge_equals_single_sketch(values):
+    single = build(HyperLogLog, values)
+    assert merged(HyperLogLog, values).count() == single.count()
+    distinct = len(set(values))
+    if len(values) <= 64:
+        assert single.count() == distinct
+    else:
+        assert abs(single.count() - distinct) <= 0.05 * distinct
+
+
+def test_countmin_merge_equals_single_sketch():
+    single = build(CountMinSketch, HASHTAGS)
+    combined = merged(CountMinSketch, HASHTAGS)
+    assert combined.table == single.table
+    assert combined.total == single.total == len(HASHTAGS)
+    counts = {}
+    for tag in HASHTAGS:
+        counts[tag] = counts.get(tag, 0) + 1
+    for tag, count in counts.items():
+        assert count <= single.estimate(tag) <= count + single.max_error
+    # Les plus fréquents sont candidats des deux moitiés : même top après fusion
+    assert combined.top(5) == single.top(5)
+
+
+def test_moments_merge():
+    single = build(Moments, POLARITIES)
+    combined = merged(Moments, POLARITIES)
+    assert combined.count == single.count
+    assert (combined.minimum, combined.maximum) == (single.minimum, single.maximum)
+    assert combined.mean == pytest.approx(single.mean)
+    assert combined.stddev == pytest.approx(single.stddev)
+
+
+@pytest.mark.parametrize("sketch", [
+    build(DDSketch, POLARITIES),
+    build(HyperLogLog, USERS),
+    build(HyperLogLog, USERS[:10]),
+    build(CountMinSketch, HASHTAGS),
+    build(Moments, POLARITIES),
+    Moments(),
+], ids=["ddsketch", "hll", "hll-sparse", "countmin", "moments", "empty"])
+def test_serialization_round_trip(sketch):
+    text = dumps(sketch)
+    assert "\t" not in text and "\n" not in text
+    assert loads(text).to_dict() == sketch.to_dict()
+
+
+def test_summary_lines_merge_by_key():
+    pairs = list(zip(POLARITIES, USERS))
+    first, second = SentimentSummary(), SentimentSummary()
+    for index, (polarity, user) in enumerate(pairs):
+        (first if index % 2 else second).add(polarity, user)
+    # Les lignes (somme, nombre) sans résumé sont ignorées
+    lines = [sketch_line("Paris", first) + "\n", "Paris\t0.5\t1\n", sketch_line("Paris", second) + "\n"]
+    summary = merge_lines(lines, "month")["Paris"]
+    assert summary.moments.count == len(pairs)
+    assert summary.users.count() == build(HyperLogLog, [user for _, user in pairs]).count()
+
+
+def test_rollup_key():
+    assert rollup_key("2024-05", "quarter") == "2024-T2"
+    assert rollup_key("2024-12", "year") == "2024"
+    assert rollup_key("Paris", "month") == "Paris"
+    with pytest.raises(ValueError):
+        rollup_key("Paris", "quarter")
@@ -0,0 +1,79 @@
+"""Fenêtres glissantes de TrendingEngine comparées à un recomptage direct des événements."""
+
+import random
+
+from trending import TrendingEngine
+
+RESOLUTION = 60
+WINDOWS = (300, 900)
+BASELINE = 1800
+TAGS = ("hadoop", "python", "spark", "data")
+
+
+def brute_force(engine, events, window):
+    """Comptes (fenêtre courante, période de référence) recalculés à partir des événements retenus."""
+    bucket = engine.bucket
+    slots = window // RESOLUTION
+    baseline_slots = BASELINE // RESOLUTION
+    current, previous = {}, {}
+    for tag, event_bucket in events:
+        age = bucket - event_bucket
+        if 0 <= age < slots:
+            current[tag] = current.get(tag, 0) + 1
+        elif slots <= age < slots + baseline_slots:
+            previous[tag] = previous.get(tag, 0) + 1
+    return current, previous
+
+
+def feed(engine, times):
+    """Ajoute un hashtag par instant ; renvoie les (hashtag, tranche) non ignorés car trop anciens."""
+    rng = random.Random(len(times))
+    kept = []
+    for now in times:
+        tag = rng.choice(TAGS)
+        late = engine.late
+        engine.add(tag, now)
+        if engine.late == late:
+            kept.append((tag, int(now // RESOLUTION)))
+    return kept
+
+
+def test_sliding_counts_match_brute_force():
+    rng = random.Random(7)
+    engine = TrendingEngine(WINDOWS, RESOLUTION, BASELINE)
+    events = []
+    now = 0.0
+    for _ in range(40):
+        times = []
+        for _ in range(rng.randint(0, 30)):
+            now += rng.expovariate(1 / 20.0)
+            # Quelques tweets en retard, parfois au-delà de tout l'historique
+            times.append(now - (rng.uniform(0, 3000) if rng.random() < 0.3 else 0))
+        events.extend(feed(engine, times))
+        if engine.bucket is None:
+            continue
+        for window in WINDOWS:
+            current, previous = brute_force(engine, events, window)
+            assert engine.current[window] == current
+            assert engine.previous[window] == previous
+
+
+def test_long_silence_expires_everything():
+    engine = TrendingEngine(WINDOWS, RESOLUTION, BASELINE)
+    events = feed(engine, [0, 30, 61, 130])
+    events += feed(engine, [10000.0])
+    for window in WINDOWS:
+        current, previous = brute_force(engine, events, window)
+        assert engine.current[window] == current
+        assert engine.previous[window] == previous
+        assert sum(current.values()) == 1 and not previous
+
+
+def test_top_counts_follow_window():
+    engine = TrendingEngine(WINDOWS, RESOLUTION, BASELINE)
+    for second in range(0, 600, 10):
+        engine.add("hadoop", second)
+    engine.add("spark", 590)
+    rows = engine.top(k=2, window=300, by="count", min_count=1)
+    # Tranches 5 à 9 (instants 300 à 599) : 30 occurrences de hadoop
+    assert [(tag, count) for tag, count, _, _ in rows] == [("hadoop", 30), ("spark", 1)]
@@ -0,0 +1,40 @@
+"""Listes de numéros de l'index : codage en écarts varint et intersection."""
+
+import random
+
+import pytest
+
+from tweet_index import decode_postings, encode_postings, intersect
+
+
+@pytest.mark.parametrize("ids", [
+    [],
+    [0],
+    [127, 128, 255, 256, 16383, 16384],
+    [0, 1, 2, 3, 2 ** 32 - 1],
+    sorted(random.Random(3).sample(range(10 ** 7), 5000)),
+])
+def test_postings_round_trip(ids):
+    assert list(decode_postings(encode_postings(ids))) == ids
+
+
+def test_small_gaps_take_one_byte():
+    assert len(encode_postings(range(1, 1001))) == 1000
+    assert encode_postings([128]) == bytes([0x80, 0x01])
+
+
+def test_intersect_matches_sets():
+    rng = random.Random(11)
+    for _ in range(50):
+        lists = [sorted(rng.sample(range(5000), rng.randint(0, size)))
+                 for size in (rng.choice((5, 50, 3000)) for _ in range(rng.randint(1, 4)))]
+        expected = sorted(set(lists[0]).intersection(*lists[1:]))
+        assert intersect(lists) == expected
+
+
+def test_intersect_long_list_uses_bisection_path():
+    short = [3, 500, 4999, 7000]
+    long = list(range(0, 5000))
+    assert intersect([long, short]) == [3, 500, 4999]
+    assert intersect([]) == []
+    assert intersect([[1, 2], []]) == []